@@ -15,9 +15,19 @@ contract CraftAnchor {
         bool exists;          // Flag to check if hash exists
     }
     
+    // Structure to store Merkle root details (batched anchoring)
+    struct RootRecord {
+        uint256 leafCount;    // Number of CraftID hashes under this root
+        uint256 timestamp;    // Block timestamp when anchored
+        bool exists;          // Flag to check if root exists
+    }
+    
     // Mapping from hash to anchor record
     mapping(bytes32 => AnchorRecord) public anchors;
     
+    // Mapping from Merkle root to root record
+    mapping(bytes32 => RootRecord) public roots;
+    
     // Event emitted when a new hash is anchored
     event HashAnchored(
         bytes32 indexed hash,
@@ -26,6 +36,14 @@ contract CraftAnchor {
         address indexed anchor
     );
     
+    // Event emitted when a Merkle root of many hashes is anchored
+    event RootAnchored(
+        bytes32 indexed root,
+        uint256 leafCount,
+        uint256 timestamp,
+        address indexed anchor
+    );
+    
     /**
      * @dev Anchors a metadata hash on the blockchain
      * @param h The SHA-256 hash of the craft metadata (32 bytes)
@@ -70,4 +88,103 @@ contract CraftAnchor {
         AnchorRecord memory record = anchors[h];
         return (record.publicId, record.timestamp, record.exists);
     }
+    
+    /**
+     * @dev Anchors many metadata hashes in one transaction. Hashes that are
+     *      already anchored are skipped (no revert), so a retried batch only
+     *      anchors what is still missing.
+     * @param hashes The SHA-256 hashes of the craft metadata
+     * @param publicIds The CraftIDs, one per hash
+     * @return anchored Number of hashes newly anchored by this call
+     */
+    function anchorBatch(bytes32[] calldata hashes, string[] calldata publicIds) external returns (uint256 anchored) {
+        require(hashes.length == publicIds.length, "Length mismatch");
+        require(hashes.length > 0, "Empty batch");
+        
+        for (uint256 i = 0; i < hashes.length; i++) {
+            bytes32 h = hashes[i];
+            if (anchors[h].exists) {
+                continue;
+            }
+            require(bytes(publicIds[i]).length > 0, "Public ID cannot be empty");
+            
+            anchors[h] = AnchorRecord({
+                publicId: publicIds[i],
+                timestamp: block.timestamp,
+                exists: true
+            });
+            
+            emit HashAnchored(h, publicIds[i], block.timestamp, msg.sender);
+            anchored++;
+        }
+    }
+    
+    /**
+     * @dev Checks many hashes at once
+     * @param hashes The hashes to check
+     * @return exists Whether each hash exists on-chain
+     * @return timestamps The block timestamp each was anchored at (0 if not anchored)
+     */
+    function isAnchoredBatch(bytes32[] calldata hashes) external view returns (bool[] memory exists, uint256[] memory timestamps) {
+        exists = new bool[](hashes.length);
+        timestamps = new uint256[](hashes.length);
+        for (uint256 i = 0; i < hashes.length; i++) {
+            AnchorRecord storage record = anchors[hashes[i]];
+            exists[i] = record.exists;
+            timestamps[i] = record.timestamp;
+        }
+    }
+    
+    /**
+     * @dev Gets the full anchor records of many hashes
+     * @param hashes The hashes to look up
+     * @return publicIds The CraftIDs ("" if not anchored)
+     * @return timestamps The anchoring timestamps
+     * @return exists Whether each record exists
+     */
+    function getAnchorRecords(bytes32[] calldata hashes) external view returns (
+        string[] memory publicIds,
+        uint256[] memory timestamps,
+        bool[] memory exists
+    ) {
+        publicIds = new string[](hashes.length);
+        timestamps = new uint256[](hashes.length);
+        exists = new bool[](hashes.length);
+        for (uint256 i = 0; i < hashes.length; i++) {
+            AnchorRecord storage record = anchors[hashes[i]];
+            publicIds[i] = record.publicId;
+            timestamps[i] = record.timestamp;
+            exists[i] = record.exists;
+        }
+    }
+    
+    /**
+     * @dev Anchors the SHA-256 Merkle root of a batch of metadata hashes.
+     *      Individual hashes are proven off-chain with inclusion proofs.
+     * @param root The Merkle root (32 bytes)
+     * @param leafCount Number of hashes committed to by the root
+     */
+    function anchorRoot(bytes32 root, uint256 leafCount) external {
+        require(!roots[root].exists, "Root already anchored");
+        require(leafCount > 0, "Leaf count cannot be zero");
+        
+        roots[root] = RootRecord({
+            leafCount: leafCount,
+            timestamp: block.timestamp,
+            exists: true
+        });
+        
+        emit RootAnchored(root, leafCount, block.timestamp, msg.sender);
+    }
+    
+    /**
+     * @dev Checks if a Merkle root has been anchored
+     * @param root The root to check
+     * @return exists Whether the root exists on-chain
+     * @return timestamp The block timestamp when it was anchored (0 if not anchored)
+     */
+    function isRootAnchored(bytes32 root) external view returns (bool exists, uint256 timestamp) {
+        RootRecord memory record = roots[root];
+        return (record.exists, record.timestamp);
+    }
 }
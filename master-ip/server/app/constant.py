@@ -22,6 +22,20 @@ PINECONE_TEXT_INDEX = os.getenv("PINECONE_TEXT_INDEX", "text")
 # --- Embedders ---
 CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"  # 512-dim
 TEXT_MODEL_NAME = "sentence-transformers/all-MiniLM-L12-v2"
+# Prebuilt safetensors bundle of both models (python -m app.utils.model_bundle build DIR).
+# When set, models load from it with the Hub forced offline, weights memory-mapped (unset = download from the Hub)
+MODEL_BUNDLE_DIR = os.getenv("MODEL_BUNDLE_DIR", "")
+
+# --- Web Server (python -m app.server: preload models, then fork workers) ---
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 1))
+# torch intra-op threads per worker (0 = CPU count / WEB_WORKERS)
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", 0))
+# Load and warm both models in the parent so workers share them copy-on-write (off = each worker loads lazily)
+WEB_PRELOAD_MODELS = os.getenv("WEB_PRELOAD_MODELS", "on").lower() == "on"
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))  # seconds workers get to drain on shutdown
+# A worker dying sooner than this after start is restarted with exponential backoff (up to the max)
+WORKER_MIN_UPTIME_SECONDS = int(os.getenv("WORKER_MIN_UPTIME_SECONDS", 10))
+WORKER_RESTART_BACKOFF_MAX_SECONDS = int(os.getenv("WORKER_RESTART_BACKOFF_MAX_SECONDS", 30))
 
 # --- Search ---
 TOP_K_DEFAULT = 5
@@ -34,6 +48,19 @@ FETCH_HEADERS = {
     "Referer": "https://upload.wikimedia.org/"
 }
 
+# --- Uploads (multipart /create) ---
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
+MAX_METADATA_BYTES = 64 * 1024
+UPLOAD_SPOOL_MAX_MEMORY = 1024 * 1024  # spill to disk beyond 1 MB
+
+# --- QR Codes & Certificates ---
+# Absolute base URL encoded into QR codes (what a phone opens when scanning)
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+BLOB_CACHE_COLL = "blob_cache"
+BLOB_CACHE_MAX_ITEMS = int(os.getenv("BLOB_CACHE_MAX_ITEMS", 2000))
+# GridFS bucket for photos uploaded through /create/upload (streamed in chunks)
+PHOTO_BUCKET = os.getenv("PHOTO_BUCKET", "photos")
+
 # ============================================
 # QUEUE & BATCHER CONFIGURATION
 # ============================================
@@ -43,12 +70,134 @@ ANCHOR_QUEUE_COLL="anchor_queue"
 VISIBILITY_TIMEOUT_SECONDS=300
 MAX_RETRIES=5
 
+# --- Queue Scheduling (chain/queue.py) ---
+# Lanes are leased in strict priority order (interactive, then bulk); within a lane
+# sources share throughput fairly. Items waiting past their lane's max wait are promoted.
+QUEUE_INTERACTIVE_MAX_WAIT_SECONDS = int(os.getenv("QUEUE_INTERACTIVE_MAX_WAIT_SECONDS", 300))
+QUEUE_BULK_MAX_WAIT_SECONDS = int(os.getenv("QUEUE_BULK_MAX_WAIT_SECONDS", 3600))
+# Virtual time one item costs its source (>= per-item anchoring time for fairness to bite)
+QUEUE_FAIR_QUANTUM_SECONDS = float(os.getenv("QUEUE_FAIR_QUANTUM_SECONDS", 5))
+
+# --- Queue Archival (chain/archive.py) ---
+# Terminal items move to anchor_queue_archive: anchored ones right away, failed ones after N days
+QUEUE_ARCHIVE_INTERVAL = int(os.getenv("QUEUE_ARCHIVE_INTERVAL", 300))  # seconds between passes, 0 = off
+QUEUE_ARCHIVE_BATCH_SIZE = int(os.getenv("QUEUE_ARCHIVE_BATCH_SIZE", 500))
+QUEUE_ARCHIVE_FAILED_AFTER_DAYS = int(os.getenv("QUEUE_ARCHIVE_FAILED_AFTER_DAYS", 7))
+# Archived items are deleted by a TTL index after this many days (0 = kept forever)
+QUEUE_ARCHIVE_TTL_DAYS = int(os.getenv("QUEUE_ARCHIVE_TTL_DAYS", 0))
+
+# --- Dead-Letter Queue Tooling (chain/dlq.py) ---
+# Admin routes (/admin/queue/...) require this token in X-Admin-Token; unset = routes disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+DLQ_PAGE_SIZE_MAX = 500
+DLQ_REQUEUE_CHUNK = int(os.getenv("DLQ_REQUEUE_CHUNK", 1000))
+
+# --- Anchoring ETA (chain/eta.py) ---
+# expected_anchor_by = now + depth ahead / recent throughput + recent confirmation latency
+ETA_WINDOW_SECONDS = int(os.getenv("ETA_WINDOW_SECONDS", 900))   # throughput / latency sample window
+ETA_REFRESH_SECONDS = int(os.getenv("ETA_REFRESH_SECONDS", 15))  # window stats cache
+ETA_DEFAULT_LATENCY_SECONDS = int(os.getenv("ETA_DEFAULT_LATENCY_SECONDS", 30))  # nothing anchored in the window
+ETA_SAFETY_FACTOR = float(os.getenv("ETA_SAFETY_FACTOR", 1.2))
+# Retry-After of /status/{public_id} once the ETA has passed
+STATUS_MIN_POLL_SECONDS = int(os.getenv("STATUS_MIN_POLL_SECONDS", 10))
+
 # --- Batcher ---
 BATCH_LIMIT=5
+# Items of one lease processed concurrently by a worker
+BATCHER_CONCURRENCY = int(os.getenv("BATCHER_CONCURRENCY", 4))
+# Seconds a worker keeps finishing its current lease after SIGTERM before cancelling
+BATCHER_DRAIN_TIMEOUT = int(os.getenv("BATCHER_DRAIN_TIMEOUT", 60))
+WORKER_REPORT_INTERVAL = int(os.getenv("WORKER_REPORT_INTERVAL", 60))
+# Prometheus /metrics endpoint of a batcher worker (0 = off; entrypoint.sh gives worker i port + i - 1)
+BATCHER_METRICS_PORT = int(os.getenv("BATCHER_METRICS_PORT", 9102))
+# Seconds between refreshes of the queue gauges (one anchor_queue aggregation; scrapes never query)
+METRICS_REFRESH_INTERVAL = int(os.getenv("METRICS_REFRESH_INTERVAL", 15))
 ACTIVE_POLL_INTERVAL=10
 IDLE_POLL_INTERVAL=300
 IDLE_THRESHOLD_MINUTES=30
+# Batcher wake-up on enqueue: "auto" (change stream + local UDP), "change_stream", "local" or "poll"
+QUEUE_WAKEUP_MODE = os.getenv("QUEUE_WAKEUP_MODE", "auto")
+QUEUE_WAKEUP_PORT = int(os.getenv("QUEUE_WAKEUP_PORT", 8765))
+
+# --- Adaptive Batching ---
+# Adaptive controller (chain/batcher.py): tunes lease size, in-flight txs and the pause between
+# leases (the poll cadence while there is work) from confirmation latency, error rate and queue
+# depth, within these bounds. Empty-queue polls (ACTIVE/IDLE_POLL_INTERVAL) stay fixed.
+ADAPTIVE_BATCHING = os.getenv("ADAPTIVE_BATCHING", "on").lower() == "on"
+BATCH_LIMIT_MIN = int(os.getenv("BATCH_LIMIT_MIN", 1))
+BATCH_LIMIT_MAX = int(os.getenv("BATCH_LIMIT_MAX", 50))
+BATCHER_CONCURRENCY_MIN = int(os.getenv("BATCHER_CONCURRENCY_MIN", 1))
+BATCHER_CONCURRENCY_MAX = int(os.getenv("BATCHER_CONCURRENCY_MAX", 16))
+LEASE_PAUSE_MAX_SECONDS = float(os.getenv("LEASE_PAUSE_MAX_SECONDS", 30))
+# Congested above this median confirmation latency or lease failure rate
+ADAPTIVE_TARGET_LATENCY_SECONDS = float(os.getenv("ADAPTIVE_TARGET_LATENCY_SECONDS", 30))
+ADAPTIVE_MAX_ERROR_RATE = float(os.getenv("ADAPTIVE_MAX_ERROR_RATE", 0.2))
+
+# --- Anchoring Mode ---
+# "single": one anchor() tx per CraftID; "merkle": one anchorRoot() tx per leased batch
+ANCHOR_MODE = os.getenv("ANCHOR_MODE", "single")
+MERKLE_BATCH_SIZE = int(os.getenv("MERKLE_BATCH_SIZE", 64))
+
+# Contract batch functions (anchorBatch / isAnchoredBatch, redeploy required):
+# "auto" probes the deployed contract once, "on" / "off" force it
+ANCHOR_BATCH_FUNCTIONS = os.getenv("ANCHOR_BATCH_FUNCTIONS", "auto").lower()
+# Max hashes per anchorBatch tx / batch view call
+ANCHOR_BATCH_MAX = int(os.getenv("ANCHOR_BATCH_MAX", 50))
 
 # --- Web3 Timeouts ---
 WEB3_GAS_LIMIT=200000
-WEB3_RECEIPT_TIMEOUT=120
\ No newline at end of file
+WEB3_RECEIPT_TIMEOUT=120
+# Gas: estimate_gas x margin, cached per function and calldata size unless state-dependent
+GAS_ESTIMATE_MARGIN = float(os.getenv("GAS_ESTIMATE_MARGIN", 1.2))
+GAS_CACHE_SECONDS = int(os.getenv("GAS_CACHE_SECONDS", 3600))
+# EIP-1559 fee oracle (eth_feeHistory)
+FEE_CACHE_SECONDS = int(os.getenv("FEE_CACHE_SECONDS", 10))
+FEE_HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", 10))
+FEE_PRIORITY_PERCENTILE = int(os.getenv("FEE_PRIORITY_PERCENTILE", 60))
+MIN_PRIORITY_FEE_WEI = int(float(os.getenv("MIN_PRIORITY_FEE_GWEI", 30)) * 10**9)  # Polygon enforces ~25 gwei
+MAX_FEE_PER_GAS_WEI = int(float(os.getenv("MAX_FEE_PER_GAS_GWEI", 0)) * 10**9)     # 0 = no cap
+# Stuck txs: replaced with the same nonce and fees bumped by FEE_BUMP_PERCENT
+STUCK_TX_SECONDS = int(os.getenv("STUCK_TX_SECONDS", 20))
+FEE_BUMP_PERCENT = int(os.getenv("FEE_BUMP_PERCENT", 15))
+MAX_FEE_BUMPS = int(os.getenv("MAX_FEE_BUMPS", 4))
+# Consecutive failed nonce checks after a receipt timeout before the wait gives up on the tx
+RECEIPT_NONCE_CHECK_MAX_FAILURES = int(os.getenv("RECEIPT_NONCE_CHECK_MAX_FAILURES", 5))
+# Transactions one signer may have pending at once (local nonce manager)
+MAX_IN_FLIGHT_TXS = int(os.getenv("MAX_IN_FLIGHT_TXS", 4))
+# Anchorer signer pool (ANCHORER_PRIVATE_KEYS): health check cadence and routing thresholds
+SIGNER_HEALTH_INTERVAL = int(os.getenv("SIGNER_HEALTH_INTERVAL", 60))
+SIGNER_MIN_BALANCE_WEI = int(float(os.getenv("SIGNER_MIN_BALANCE_ETH", 0.05)) * 10**18)
+SIGNER_STUCK_SECONDS = int(os.getenv("SIGNER_STUCK_SECONDS", 300))
+SIGNER_MAX_SEND_ERRORS = int(os.getenv("SIGNER_MAX_SEND_ERRORS", 3))
+# Blocks on top of (and including) the tx's block before it counts as confirmed
+CONFIRMATION_DEPTH = int(os.getenv("CONFIRMATION_DEPTH", 1))
+# Receipt tracker: head check cadence, and max gap between receipt batches when the head stalls
+RECEIPT_POLL_INTERVAL = float(os.getenv("RECEIPT_POLL_INTERVAL", 2))
+RECEIPT_POLL_MAX_INTERVAL = float(os.getenv("RECEIPT_POLL_MAX_INTERVAL", 15))
+# Pooled keep-alive HTTP session for JSON-RPC
+RPC_TIMEOUT_SECONDS = int(os.getenv("RPC_TIMEOUT_SECONDS", 20))
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", 20))
+RPC_KEEPALIVE_SECONDS = int(os.getenv("RPC_KEEPALIVE_SECONDS", 30))
+# RPC endpoint pool (WEB3_RPC_URL preferred for writes, WEB3_RPC_URLS extra): per-endpoint EWMA
+# latency / error rate route reads; an endpoint failing N calls in a row sits out a cooldown
+RPC_EWMA_ALPHA = float(os.getenv("RPC_EWMA_ALPHA", 0.2))
+RPC_MAX_CONSECUTIVE_ERRORS = int(os.getenv("RPC_MAX_CONSECUTIVE_ERRORS", 3))
+RPC_COOLDOWN_SECONDS = int(os.getenv("RPC_COOLDOWN_SECONDS", 30))
+# isAnchored reads are raced on a second endpoint once the first exceeds its p95 latency
+RPC_HEDGING = os.getenv("RPC_HEDGING", "on").lower() == "on"
+RPC_HEDGE_DELAY_SECONDS = float(os.getenv("RPC_HEDGE_DELAY_SECONDS", 1.0))  # until p95 is known
+
+# --- HashAnchored Event Indexer (chain/indexer.py) ---
+# First block to scan (the contract's deployment block); unset = the confirmed head on the first run
+INDEXER_START_BLOCK = int(os.getenv("INDEXER_START_BLOCK") or -1)
+# Blocks per eth_getLogs call (halved automatically when a provider rejects the range)
+INDEXER_BLOCK_RANGE = int(os.getenv("INDEXER_BLOCK_RANGE", 2000))
+INDEXER_POLL_INTERVAL = int(os.getenv("INDEXER_POLL_INTERVAL", 30))
+# Lookups scan the unindexed tail themselves when it is at most this many blocks; else isAnchored is used
+INDEXER_MAX_TAIL_BLOCKS = int(os.getenv("INDEXER_MAX_TAIL_BLOCKS", 500))
+
+# --- Verification Cache ---
+ANCHOR_CACHE_SIZE = int(os.getenv("ANCHOR_CACHE_SIZE", 10000))
+# 0 = never re-query the chain for an already verified anchor
+VERIFY_AUDIT_INTERVAL_SECONDS = int(os.getenv("VERIFY_AUDIT_INTERVAL_SECONDS", 0))
+MAX_BATCH_VERIFY = 100
@@ -1,30 +1,43 @@
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from PIL import Image
 import os
+import json
 import hashlib
 import jwt
 import asyncio
 from datetime import datetime, timedelta
+from typing import List, Optional, Union
 from uuid import uuid4
 
 # Import Schemas
-from app.schemas.craft import OnboardingData, VerificationResponse
+from app.schemas.craft import OnboardingData, OnboardingMetadata, VerificationResponse, BatchVerificationResponse, AnchorStatusResponse
 
 # Import DB and Utils
 from app.db.mongodb import collection, next_sequence, close as mongo_close
 from app.utils.db_utils import ensure_db_ready_or_502
-from app.utils.http_client import decode_base64_to_pil
+from app.utils.http_client import decode_base64_to_pil, decode_image_file
+from app.utils.uploads import CreateUpload
+from app.utils.blob_cache import Blob, get_blob, get_blob_cached
+from app.utils.photo_store import PhotoUpload, hash_photo, store_photo, open_photo, iter_photo
+from app.utils.certificates import (
+    QR_FORMATS, CERTIFICATE_PROJECTION, qr_key, certificate_key, certificate_state, prerender_assets
+)
 
 # Import Config
-from app.constant import SECRET_KEY, ALGORITHM
+from app.constant import SECRET_KEY, ALGORITHM, MAX_BATCH_VERIFY, STATUS_MIN_POLL_SECONDS, PUBLIC_BASE_URL
 
 # Import chain modules
 from chain.hashing import compute_public_hash
 from chain.signer import sign_attestation
-from chain.queue import enqueue_item
-from chain.web3_client import is_anchored
+from chain.queue import enqueue_item, QUEUE_COLL, ARCHIVE_COLL, DEFAULT_LANE
+from chain.eta import estimate_anchor_by
+from chain.anchor_cache import get_anchor_status, get_anchor_statuses
 
 # Import embedding and Pinecone utilities
-from app.utils.embedders import ClipEmbedder, embed_text
+from app.utils.embedders import get_clip_embedder, embed_text
 from app.utils.pinecone import _upsert_image_index, _upsert_text_index
 
 # Import logging
@@ -32,9 +45,61 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-async def create_craftid(data: OnboardingData):
+def photo_key(public_id: str) -> str:
+    """GridFS file id of a photo sent as a multipart upload."""
+    return f"photo/{public_id}"
+
+
+def _read_upload_photo(upload: CreateUpload):
+    """
+    Decodes the spooled photo for embedding and hashes it in chunks for its
+    ETag (runs in a thread). The bytes stay in the spooled file for store_photo.
+    """
+    pil_image = decode_image_file(upload.photo)
+    content_type = upload.photo_content_type
+    if not content_type:
+        upload.photo.seek(0)
+        # Image.open only parses the header here
+        content_type = Image.MIME.get(Image.open(upload.photo).format, "application/octet-stream")
+    etag, size = hash_photo(upload.photo)
+    return pil_image, PhotoUpload(file=upload.photo, content_type=content_type, etag=etag, size=size)
+
+
+async def create_craftid_upload(upload: CreateUpload, lane: str = DEFAULT_LANE, source: Optional[str] = None):
+    """
+    Create a new CraftID from a multipart upload (JSON metadata + binary photo).
+    The photo is decoded once, straight from the spooled buffer, before any DB work;
+    its original bytes are streamed from that buffer into GridFS and served at
+    /photo/{public_id}. The spooled file is closed once the CraftID is created.
+    """
+    try:
+        try:
+            data = OnboardingMetadata(**json.loads(upload.metadata))
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid metadata JSON: {e}")
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
+        pil_image, photo = await asyncio.to_thread(_read_upload_photo, upload)
+        return await create_craftid(data, pil_image=pil_image, photo=photo, lane=lane, source=source)
+    finally:
+        upload.close()
+
+
+async def create_craftid(
+    data: Union[OnboardingData, OnboardingMetadata],
+    pil_image: Optional[Image.Image] = None,
+    photo: Optional[PhotoUpload] = None,
+    lane: str = DEFAULT_LANE,
+    source: Optional[str] = None,
+):
     """
     Create a new CraftID with the provided onboarding data.
+    If `pil_image` is given (multipart upload) it is used instead of decoding `data.art.photo`,
+    and the uploaded `photo` is streamed to GridFS under photo_key(public_id); the CraftID
+    then carries `photo_key` and `art.photo_url` instead of an inline base64 photo.
+    `lane` / `source` schedule its anchoring (bulk importers use lane="bulk"
+    and their own source so live onboarding is not stuck behind them).
     """
     coll = collection("craftids")
 
@@ -93,28 +158,46 @@ async def create_craftid(data: OnboardingData):
     # compute using canonical hashing function (returns hex without 0x)
     public_hash = compute_public_hash(artisan, art, timestamp_iso, salt)
 
+    # ETA from queue depth and recent batcher throughput (None if it cannot be estimated)
+    expected_anchor_by = await estimate_anchor_by(lane)
+
     # build attestation payload and sign it
     att_payload = {
         "public_id": public_id,
         "public_hash": public_hash,
         "timestamp": timestamp_iso,
         "salt": salt,
-        "expected_anchor_by": None  # optional: you can set an ETA here
+        "expected_anchor_by": expected_anchor_by
     }
     attestation = sign_attestation(att_payload)
 
+    onboarding_data = data.dict()
+    photo_url = None
+    if photo is not None:
+        # Stored before the CraftID so a record never points at a missing photo;
+        # photo_url is excluded from the public hash (see _recompute_hash)
+        try:
+            await store_photo(photo_key(public_id), photo)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to store photo: {e}")
+        photo_url = f"{PUBLIC_BASE_URL}/photo/{public_id}"
+        onboarding_data["art"]["photo_url"] = photo_url
+
     doc = {
         "public_id": public_id,
         "private_key": private_key,
         "public_hash": public_hash,
         "art_name_norm": art_name_norm,
-        "original_onboarding_data": data.dict(),
+        "original_onboarding_data": onboarding_data,
         "timestamp": timestamp_iso,
         "salt": salt,
         "status": "queued",
         "attestation": attestation,
+        "expected_anchor_by": expected_anchor_by,
         "created_at": datetime.utcnow().isoformat() + "Z"
     }
+    if photo is not None:
+        doc["photo_key"] = photo_key(public_id)
 
     try:
         await coll.insert_one(doc)
@@ -132,18 +215,19 @@ async def create_craftid(data: OnboardingData):
     try:
         logger.info(f"[create_craftid] Upserting image to Pinecone for {public_id}")
         
-        # Handle both URL and Base64 image formats
-        photo_data = data.art.photo
-        if photo_data.startswith('http://') or photo_data.startswith('https://'):
-            # It's a URL, fetch the image
-            from app.utils.http_client import _fetch_image_from_url
-            pil_image = await _fetch_image_from_url(photo_data)
-        else:
-            # It's Base64, decode it
-            pil_image = decode_base64_to_pil(photo_data)
+        # Handle uploaded, URL and Base64 image formats
+        if pil_image is None:
+            photo_data = data.art.photo
+            if photo_data.startswith('http://') or photo_data.startswith('https://'):
+                # It's a URL, fetch the image
+                from app.utils.http_client import _fetch_image_from_url
+                pil_image = await _fetch_image_from_url(photo_data)
+            else:
+                # It's Base64, decode it
+                pil_image = decode_base64_to_pil(photo_data)
         
         # Embed the image using ClipEmbedder (lazy-loaded singleton)
-        embedder = ClipEmbedder()
+        embedder = get_clip_embedder()
         image_vector = await asyncio.to_thread(embedder.embed_pil, pil_image)
         
         # Prepare Pinecone metadata (minimal info for search results)
@@ -203,11 +287,19 @@ async def create_craftid(data: OnboardingData):
     
     # enqueue for background anchoring (queue is a separate collection/process)
     try:
-        await enqueue_item({"public_id": public_id, "public_hash": public_hash, "timestamp": timestamp_iso})
+        await enqueue_item({"public_id": public_id, "public_hash": public_hash, "timestamp": timestamp_iso,
+                            "expected_anchor_by": expected_anchor_by, "lane": lane, "source": source})
     except Exception as e:
         # if enqueue fails, keep record but inform caller
         raise HTTPException(status_code=500, detail=f"Failed to enqueue for anchoring: {e}")
 
+    # pre-render QR codes + pending certificate so scans are served from cache
+    try:
+        await prerender_assets(doc)
+    except Exception as e:
+        # Non-fatal: assets are rendered lazily on first request
+        logger.warning(f"[create_craftid] Failed to pre-render QR/certificate for {public_id}: {e}")
+
     transaction_id = "tx_" + datetime.utcnow().strftime("%Y%m%d%H%M%S")
 
     response_data = {
@@ -220,8 +312,10 @@ async def create_craftid(data: OnboardingData):
             "private_key": private_key,
             "public_hash": public_hash,
             "attestation": attestation,
+            "expected_anchor_by": expected_anchor_by,
             "verification_url": f"/verify/{public_id}",
-            "qr_code_link": f"/verify/qr/{public_id}"
+            "qr_code_link": f"/verify/qr/{public_id}",
+            "certificate_link": f"/verify/certificate/{public_id}"
         },
         "artisan_info": {
             "name": data.artisan.name,
@@ -229,74 +323,63 @@ async def create_craftid(data: OnboardingData):
         },
         "art_info": {
             "name": data.art.name,
-            "description": data.art.description
+            "description": data.art.description,
+            "photo_url": photo_url
         },
-        "original_onboarding_data": data.dict(),
+        "original_onboarding_data": onboarding_data,
         "links": {
-            "track_status": f"/status/{transaction_id}",
+            "track_status": f"/status/{public_id}",
             "shop_listing": f"/shop/{public_id}"
         }
     }
     return response_data
 
 
-async def verify_craftid(public_id: str):
-    """
-    Verify the integrity and anchoring status of a CraftID.
-    """
-    
-    coll = collection("craftids")
-    
-    # Fetch the craftid record
-    try:
-        doc = await asyncio.wait_for(coll.find_one({"public_id": public_id}), timeout=4)
-    except asyncio.TimeoutError:
-        raise HTTPException(status_code=504, detail="DB read timed out")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"DB read error: {e}")
-    
-    if not doc:
-        raise HTTPException(status_code=404, detail=f"CraftID {public_id} not found")
-    
-    # Extract stored data
-    stored_hash = doc.get("public_hash")
-    timestamp = doc.get("timestamp")
-    salt = doc.get("salt")
-    status = doc.get("status", "pending")
-    tx_hash = doc.get("tx_hash")
-    anchored_at = doc.get("anchored_at")
+# Fields never needed for verification; the base64 photo can be megabytes
+VERIFY_PROJECTION = {
+    "_id": 0,
+    "private_key": 0,
+    "attestation": 0,
+    "original_onboarding_data.art.photo": 0,
+}
+
+
+def _recompute_hash(doc: dict) -> str:
+    """Recompute the public hash from the stored onboarding metadata."""
     original_data = doc.get("original_onboarding_data", {})
-    
-    # Recompute hash from current stored metadata
     artisan = original_data.get("artisan", {})
     art = original_data.get("art", {})
-    
+
     # Exclude photo_url if present (same as creation)
     art_copy = dict(art)
     art_copy.pop("photo_url", None)
-    
-    # Recompute the hash
-    computed_hash = compute_public_hash(artisan, art_copy, timestamp, salt)
-    
+
+    return compute_public_hash(artisan, art_copy, doc.get("timestamp"), doc.get("salt"))
+
+
+def _build_verification(doc: dict, computed_hash: str, chain_status: Optional[dict]) -> VerificationResponse:
+    """
+    Build the VerificationResponse for a craftid doc.
+    `chain_status` is the on-chain lookup result, or None if it was not needed / failed.
+    """
+    public_id = doc.get("public_id")
+    stored_hash = doc.get("public_hash")
+    status = doc.get("status", "pending")
+    tx_hash = doc.get("tx_hash")
+    anchored_at = doc.get("anchored_at")
+
     # Check if metadata has been tampered with
     metadata_tampered = (stored_hash != computed_hash)
-    
+
     # Check blockchain status
     blockchain_anchored = False
     blockchain_timestamp = None
-    blockchain_hash_match = False
-    
-    if status == "anchored" and tx_hash:
-        # Query blockchain to verify
-        try:
-            anchored, ts = await asyncio.to_thread(is_anchored, stored_hash)
-            blockchain_anchored = anchored
-            blockchain_timestamp = ts
-            blockchain_hash_match = anchored
-        except Exception as e:
-            blockchain_anchored = False
-            blockchain_timestamp = None
-    
+    blockchain_block_number = None
+    if chain_status:
+        blockchain_anchored = chain_status["anchored"]
+        blockchain_timestamp = chain_status["timestamp"]
+        blockchain_block_number = chain_status.get("block_number")
+
     # Determine final status and tamper detection
     if metadata_tampered:
         final_status = "tampered"
@@ -312,8 +395,12 @@ async def verify_craftid(public_id: str):
         verification_details = {
             "metadata_tampered": False,
             "blockchain_verified": True,
-            "blockchain_timestamp": blockchain_timestamp
+            "blockchain_timestamp": blockchain_timestamp,
+            "blockchain_block_number": blockchain_block_number
         }
+        if chain_status.get("merkle_root"):
+            verification_details["anchor_mode"] = "merkle"
+            verification_details["merkle_root"] = chain_status["merkle_root"]
     elif status == "queued" or status == "pending":
         final_status = "pending"
         is_tampered = False
@@ -331,7 +418,9 @@ async def verify_craftid(public_id: str):
             "blockchain_verified": False,
             "reason": "Blockchain verification failed or pending confirmation"
         }
-    
+        if chain_status and chain_status.get("proof_valid") is False:
+            verification_details["reason"] = "Merkle inclusion proof does not match the anchored root"
+
     return VerificationResponse(
         public_id=public_id,
         status=final_status,
@@ -343,4 +432,233 @@ async def verify_craftid(public_id: str):
         anchored_at=anchored_at,
         blockchain_timestamp=blockchain_timestamp,
         verification_details=verification_details
-    )
\ No newline at end of file
+    )
+
+
+def _needs_chain_check(doc: dict) -> bool:
+    return doc.get("status") == "anchored" and bool(doc.get("tx_hash"))
+
+
+async def verify_craftid(public_id: str):
+    """
+    Verify the integrity and anchoring status of a CraftID.
+    """
+    
+    coll = collection("craftids")
+    
+    # Fetch the craftid record
+    try:
+        doc = await asyncio.wait_for(coll.find_one({"public_id": public_id}, VERIFY_PROJECTION), timeout=4)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="DB read timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB read error: {e}")
+    
+    if not doc:
+        raise HTTPException(status_code=404, detail=f"CraftID {public_id} not found")
+    
+    computed_hash = _recompute_hash(doc)
+    
+    chain_status = None
+    if _needs_chain_check(doc):
+        # Anchoring is immutable: served from the LRU / persisted chain_status after the first check
+        try:
+            chain_status = await get_anchor_status(doc)
+        except Exception as e:
+            logger.warning(f"[verify_craftid] Chain lookup failed for {public_id}: {e}")
+            chain_status = None
+    
+    return _build_verification(doc, computed_hash, chain_status)
+
+
+async def verify_craftids_batch(public_ids: List[str]):
+    """
+    Verify many CraftIDs at once: one $in query, one pass of hash recomputation,
+    and a single JSON-RPC batch for the records that need an on-chain check.
+    """
+    # de-duplicate while keeping request order
+    ids = list(dict.fromkeys(public_ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="public_ids must not be empty")
+    if len(ids) > MAX_BATCH_VERIFY:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_VERIFY} public_ids per batch")
+
+    coll = collection("craftids")
+    try:
+        cursor = coll.find({"public_id": {"$in": ids}}, VERIFY_PROJECTION)
+        docs = await asyncio.wait_for(cursor.to_list(length=len(ids)), timeout=8)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="DB read timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB read error: {e}")
+
+    by_id = {d["public_id"]: d for d in docs}
+    computed = {pid: _recompute_hash(d) for pid, d in by_id.items()}
+
+    chain_statuses = {}
+    to_check = [d for d in by_id.values() if _needs_chain_check(d)]
+    if to_check:
+        try:
+            chain_statuses = await get_anchor_statuses(to_check)
+        except Exception as e:
+            # Same semantics as /verify: an RPC failure means "not verified", not an error
+            logger.warning(f"[verify_craftids_batch] Batched chain lookup failed: {e}")
+
+    results = []
+    not_found = []
+    for pid in ids:
+        doc = by_id.get(pid)
+        if doc is None:
+            not_found.append(pid)
+            continue
+        results.append(_build_verification(doc, computed[pid], chain_statuses.get(pid)))
+
+    return BatchVerificationResponse(count=len(results), results=results, not_found=not_found)
+
+
+# --- Anchoring status (cheap polling) ---
+
+STATUS_PROJECTION = {"_id": 0, "public_id": 1, "status": 1, "expected_anchor_by": 1, "tx_hash": 1, "anchored_at": 1, "last_error": 1}
+QUEUE_STATUS_PROJECTION = {"_id": 0, "status": 1, "tries": 1, "expected_anchor_by": 1, "last_error": 1}
+
+
+def _retry_after(status: str, expected_anchor_by: Optional[str]) -> Optional[int]:
+    """Seconds until the ETA (at least STATUS_MIN_POLL_SECONDS) while pending; None once final."""
+    if status in ("anchored", "failed"):
+        return None
+    try:
+        eta = datetime.fromisoformat(expected_anchor_by)
+        remaining = (eta - datetime.now(eta.tzinfo)).total_seconds()
+    except (TypeError, ValueError):
+        remaining = 0
+    return max(int(remaining), STATUS_MIN_POLL_SECONDS)
+
+
+async def get_anchor_status_view(public_id: str, response: Response) -> AnchorStatusResponse:
+    """
+    Anchoring progress from projected reads only (no hash recomputation, no RPC):
+    the craftid, plus its queue item (live queue, then archive) until anchored.
+    Pending responses carry Retry-After, so clients poll again at the ETA.
+    """
+    try:
+        doc = await asyncio.wait_for(collection("craftids").find_one({"public_id": public_id}, STATUS_PROJECTION), timeout=4)
+        item = None
+        if doc and doc.get("status") != "anchored":
+            item = await asyncio.wait_for(collection(QUEUE_COLL).find_one({"public_id": public_id}, QUEUE_STATUS_PROJECTION), timeout=4)
+            if item is None:
+                item = await asyncio.wait_for(collection(ARCHIVE_COLL).find_one({"public_id": public_id}, QUEUE_STATUS_PROJECTION), timeout=4)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="DB read timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB read error: {e}")
+
+    if not doc:
+        raise HTTPException(status_code=404, detail=f"CraftID {public_id} not found")
+
+    item = item or {}
+    # The queue item is ahead of the craftid while processing, and may be anchored first (reconciled later)
+    status = item.get("status") or doc.get("status", "queued")
+    if doc.get("status") in ("anchored", "failed"):
+        status = doc["status"]
+    expected_anchor_by = doc.get("expected_anchor_by") or item.get("expected_anchor_by")
+    retry_after = _retry_after(status, expected_anchor_by)
+
+    response.headers["Cache-Control"] = "no-cache"
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return AnchorStatusResponse(
+        public_id=public_id,
+        status=status,
+        expected_anchor_by=expected_anchor_by,
+        retry_after_seconds=retry_after,
+        tries=item.get("tries"),
+        tx_hash=doc.get("tx_hash"),
+        anchored_at=doc.get("anchored_at"),
+        last_error=(item.get("last_error") or doc.get("last_error")) if status == "failed" else None,
+    )
+
+
+# --- QR codes & certificates ---
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _blob_response(blob: Blob, if_none_match: Optional[str]) -> Response:
+    """Serve a cached blob with a strong ETag; 304 when the client already has it."""
+    headers = {
+        "ETag": blob.etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if blob.immutable else "no-cache",
+    }
+    if if_none_match and blob.etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=blob.content, media_type=blob.content_type, headers=headers)
+
+
+async def _load_for_render(public_id: str) -> dict:
+    """Cache miss fallback: one projected read, 404 if the CraftID does not exist."""
+    try:
+        doc = await asyncio.wait_for(
+            collection("craftids").find_one({"public_id": public_id}, CERTIFICATE_PROJECTION), timeout=4
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="DB read timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"DB read error: {e}")
+    if not doc:
+        raise HTTPException(status_code=404, detail=f"CraftID {public_id} not found")
+    return doc
+
+
+async def get_qr_code(public_id: str, fmt: str, if_none_match: Optional[str] = None) -> Response:
+    """
+    QR code pointing at /verify/{public_id}. Rendered once (at creation) and
+    stored in Mongo (`blob_cache`); served from the process's LRU when it has
+    the key, else from Mongo, re-rendered only if both miss. Immutable because
+    its content never changes, so a client or CDN never asks twice.
+    """
+    if fmt not in QR_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}' (use png or svg)")
+
+    key = qr_key(public_id, fmt)
+    blob = await get_blob(key)
+    if blob is None:
+        doc = await _load_for_render(public_id)
+        blobs = await prerender_assets(doc)
+        blob = blobs[key]
+    return _blob_response(blob, if_none_match)
+
+
+async def get_photo(public_id: str, if_none_match: Optional[str] = None) -> Response:
+    """
+    Original photo of a CraftID created through /create/upload, streamed from
+    GridFS chunk by chunk (photos are up to MAX_UPLOAD_BYTES). Immutable, with
+    the ETag computed at upload. CraftIDs created through JSON /create keep
+    their photo in `art.photo`.
+    """
+    grid_out = await open_photo(photo_key(public_id))
+    if grid_out is None:
+        raise HTTPException(status_code=404, detail=f"No uploaded photo for CraftID {public_id}")
+    metadata = grid_out.metadata or {}
+    headers = {"ETag": metadata.get("etag", ""), "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if if_none_match and headers["ETag"] in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    headers["Content-Length"] = str(grid_out.length)
+    return StreamingResponse(
+        iter_photo(grid_out), media_type=metadata.get("content_type", "application/octet-stream"), headers=headers
+    )
+
+
+async def get_certificate(public_id: str, if_none_match: Optional[str] = None) -> Response:
+    """
+    Verification certificate card (SVG), looked up like get_qr_code. The
+    anchored card is final and cached immutably; the pending card is
+    revalidated (ETag) until the batcher anchors the item.
+    """
+    anchored_key = certificate_key(public_id, "anchored")
+    blob = get_blob_cached(anchored_key) or await get_blob(anchored_key)
+    if blob is None:
+        blob = await get_blob(certificate_key(public_id, "pending"))
+    if blob is None:
+        doc = await _load_for_render(public_id)
+        blobs = await prerender_assets(doc, include_qr=False)
+        blob = blobs[certificate_key(public_id, certificate_state(doc))]
+    return _blob_response(blob, if_none_match)
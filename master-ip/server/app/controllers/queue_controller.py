@@ -0,0 +1,79 @@
+from fastapi import HTTPException
+import asyncio
+import hmac
+import logging
+from typing import Optional
+
+# Import schemas
+from app.schemas.queue import FailedItemsFilter, RequeueRequest, RequeueResponse
+
+# Import queue helpers
+from chain.queue import queue_summary
+from chain.dlq import failed_filter, list_failed, summarize_failed, requeue_failed
+
+# Import config
+from app.constant import ADMIN_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# --- Anchor Queue Controller Logic ---
+
+async def get_queue_summary():
+    """
+    Anchor queue health: depth and oldest item per status, tries distribution,
+    create->anchor latency and gas per item (one aggregation pipeline).
+    """
+    try:
+        return await asyncio.wait_for(queue_summary(), timeout=8)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Queue aggregation timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Queue aggregation error: {e}")
+
+
+# --- Dead-Letter Admin Logic ---
+
+def require_admin(x_admin_token: Optional[str]):
+    """Admin routes need ADMIN_TOKEN (X-Admin-Token header); disabled when it is unset."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="Admin routes disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _filters(f: FailedItemsFilter) -> dict:
+    try:
+        return failed_filter(**f.dict(include=set(FailedItemsFilter.__fields__)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def get_failed_items(f: FailedItemsFilter, limit: int, cursor: Optional[str], source: str):
+    """One keyset page of failed items (live queue or archive)."""
+    try:
+        return await list_failed(_filters(f), limit, cursor, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def get_failed_summary(f: FailedItemsFilter, source: str):
+    try:
+        return await summarize_failed(_filters(f), source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def requeue_failed_items(req: RequeueRequest) -> RequeueResponse:
+    """Bulk requeue of matching failed items, released at most release_per_second items/s."""
+    if req.release_per_second < 0 or (req.max_items is not None and req.max_items < 0):
+        raise HTTPException(status_code=400, detail="release_per_second and max_items must not be negative")
+    filters = _filters(req)
+    result = await requeue_failed(
+        filters,
+        max_items=req.max_items,
+        release_per_second=req.release_per_second,
+        include_archived=req.include_archived,
+        dry_run=req.dry_run,
+    )
+    logger.info(f"[requeue_failed_items] {result}")
+    return RequeueResponse(**result)
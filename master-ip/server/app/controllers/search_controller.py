@@ -12,7 +12,7 @@ from app.schemas.search import QuerySchema, QueryArtisan, QueryArt
 from app.db.mongodb import collection
 
 # Import embedders
-from app.utils.embedders import ClipEmbedder, embed_text
+from app.utils.embedders import get_clip_embedder, embed_text
 
 # Import utils
 from app.utils.http_client import _fetch_image_from_url
@@ -29,15 +29,10 @@ from app.constant import (  # Fixed: app.constant -> app.constants
 
 # --- Image Search Controller Logic ---
 
-# Single embedder instance (lazy)
-_embedder: Optional[ClipEmbedder] = None
-
 def _ensure_embedder():
-    """Local helper to lazy-load the ClipEmbedder."""
-    global _embedder
-    if _embedder is None:
-        _embedder = ClipEmbedder()
-    return _embedder
+    """Local helper to lazy-load the shared ClipEmbedder."""
+    return get_clip_embedder()
+
 
 async def _embed_image(pil_img: Image.Image) -> list:
     """Local helper to embed a PIL image asynchronously."""
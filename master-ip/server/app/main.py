@@ -4,10 +4,12 @@ from fastapi.middleware.cors import CORSMiddleware
 import logging # For logging startup/shutdown
 
 # Import new routers
-from app.routes import craft, search
+from app.routes import craft, search, queue
 
 # Import DB connect/close functions
 from app.db.mongodb import connect_db, close_db
+from chain.web3_client import get_rpc_pool, close_chain_client
+from chain.signer import check_signer_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,11 +19,15 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Code to run on startup
     logger.info("Application startup...")
+    # Chain / signer settings are checked here rather than at import time
+    check_signer_config()
+    get_rpc_pool()
     await connect_db()
     yield # Application runs here
     # Code to run on shutdown
     logger.info("Application shutdown...")
     await close_db()
+    await close_chain_client()
 
 # Create FastAPI app instance with lifespan manager
 app = FastAPI(
@@ -42,6 +48,7 @@ app.add_middleware(
 # --- Include Routers ---
 app.include_router(craft.router)
 app.include_router(search.router)
+app.include_router(queue.router)
 
 # --- Root Endpoint ---
 @app.get("/")
@@ -1,19 +1,98 @@
-from fastapi import APIRouter
-from app.schemas.craft import OnboardingData, VerificationResponse
+from fastapi import APIRouter, Header, Query, Request, Response
+from typing import Optional
+from app.schemas.craft import OnboardingData, VerificationResponse, BatchVerificationRequest, BatchVerificationResponse, AnchorStatusResponse
 
 # Import the controller functions
-from app.controllers.craft_controllers import create_craftid, verify_craftid
+from app.controllers.craft_controllers import (
+    create_craftid, create_craftid_upload, verify_craftid, verify_craftids_batch,
+    get_qr_code, get_certificate, get_photo, get_anchor_status_view
+)
+from app.utils.uploads import read_create_upload
 
 router = APIRouter(
     tags=["CraftID"]
 )
 
+LANE_PATTERN = "^(interactive|bulk)$"
+
+
 @router.post("/create")
-async def create_craftid_route(data: OnboardingData):
+async def create_craftid_route(
+    data: OnboardingData,
+    lane: str = Query("interactive", pattern=LANE_PATTERN),
+    source: Optional[str] = Query(None, max_length=64)
+):
     """
     API endpoint to create a new CraftID and queue it for anchoring.
+    Bulk imports should pass lane=bulk and a source name so they are fair-shared
+    instead of delaying live onboarding.
+    """
+    return await create_craftid(data, lane=lane, source=source)
+
+
+@router.post("/create/upload")
+async def create_craftid_upload_route(
+    request: Request,
+    lane: str = Query("interactive", pattern=LANE_PATTERN),
+    source: Optional[str] = Query(None, max_length=64)
+):
+    """
+    Multipart variant of /create: a JSON `metadata` part (artisan + art name/description)
+    and a binary `photo` part, streamed to a spooled temp file with size limits enforced.
+    """
+    upload = await read_create_upload(request)
+    return await create_craftid_upload(upload, lane=lane, source=source)
+
+
+@router.post("/verify/batch", response_model=BatchVerificationResponse)
+async def verify_craftids_batch_route(payload: BatchVerificationRequest):
+    """
+    Verify up to MAX_BATCH_VERIFY CraftIDs in one call (same per-id semantics as /verify).
+    """
+    return await verify_craftids_batch(payload.public_ids)
+
+
+@router.get("/verify/qr/{public_id}")
+async def verify_qr_route(
+    public_id: str,
+    format: str = "png",
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Pre-rendered QR code (png or svg) linking to the verification page.
+    """
+    return await get_qr_code(public_id, format, if_none_match)
+
+
+@router.get("/verify/certificate/{public_id}")
+async def verify_certificate_route(
+    public_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Pre-rendered verification certificate card (SVG) with embedded QR code.
+    """
+    return await get_certificate(public_id, if_none_match)
+
+
+@router.get("/photo/{public_id}")
+async def photo_route(
+    public_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Photo uploaded with /create/upload (the CraftID's art.photo_url).
+    """
+    return await get_photo(public_id, if_none_match)
+
+
+@router.get("/status/{public_id}", response_model=AnchorStatusResponse)
+async def anchor_status_route(public_id: str, response: Response):
+    """
+    Cheap anchoring progress for polling clients: status and expected_anchor_by,
+    with Retry-After set to the ETA while the CraftID is pending.
     """
-    return await create_craftid(data)
+    return await get_anchor_status_view(public_id, response)
 
 
 @router.get("/verify/{public_id}", response_model=VerificationResponse)
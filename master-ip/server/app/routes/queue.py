@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, Header, Query
+from typing import Optional
+
+# Import schemas
+from app.schemas.queue import FailedItemsFilter, RequeueRequest, RequeueResponse
+from app.constant import DLQ_PAGE_SIZE_MAX
+
+# Import controllers
+from app.controllers.queue_controller import (
+    get_queue_summary, require_admin,
+    get_failed_items, get_failed_summary, requeue_failed_items
+)
+
+router = APIRouter(
+    tags=["Queue"]
+)
+
+async def admin_only(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+
+
+@router.get("/queue/summary")
+async def queue_summary_route():
+    """
+    Anchor queue telemetry summary (per-worker Prometheus metrics are served by each batcher).
+    """
+    return await get_queue_summary()
+
+
+# --- Dead-letter admin routes (X-Admin-Token) ---
+
+@router.get("/admin/queue/failed", dependencies=[Depends(admin_only)])
+async def failed_items_route(
+    f: FailedItemsFilter = Depends(),
+    limit: int = Query(50, ge=1, le=DLQ_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    source: str = Query("live", pattern="^(live|archive)$"),
+):
+    """
+    Page through failed items (most recent first) filtered by error class, error text,
+    age of the last try and tries. Pass `next_cursor` back as `cursor` for the next page.
+    """
+    return await get_failed_items(f, limit, cursor, source)
+
+
+@router.get("/admin/queue/failed/summary", dependencies=[Depends(admin_only)])
+async def failed_summary_route(f: FailedItemsFilter = Depends(), source: str = Query("live", pattern="^(live|archive)$")):
+    """
+    Counts of matching failed items per error class and tries.
+    """
+    return await get_failed_summary(f, source)
+
+
+@router.post("/admin/queue/failed/requeue", response_model=RequeueResponse, dependencies=[Depends(admin_only)])
+async def requeue_failed_route(payload: RequeueRequest):
+    """
+    Requeue matching failed items in bulk (tries and leases reset), released at most
+    `release_per_second` items per second. `dry_run` only counts the matches.
+    """
+    return await requeue_failed_items(payload)
@@ -1,6 +1,6 @@
 # app/schemas/craft.py
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 
 class Artisan(BaseModel):
     name: str
@@ -9,15 +9,22 @@ class Artisan(BaseModel):
     email: EmailStr
     aadhaar_number: str
 
-class Art(BaseModel):
+class ArtMetadata(BaseModel):
     name: str
     description: str
+
+class Art(ArtMetadata):
     photo: str  # base64
 
 class OnboardingData(BaseModel):
     artisan: Artisan
     art: Art
 
+class OnboardingMetadata(BaseModel):
+    """Metadata part of a multipart /create upload (photo sent as a binary part)."""
+    artisan: Artisan
+    art: ArtMetadata
+
 class VerificationResponse(BaseModel):
     public_id: str
     status: str  # "pending", "anchored", "tampered"
@@ -29,3 +36,21 @@ class VerificationResponse(BaseModel):
     anchored_at: Optional[str] = None
     blockchain_timestamp: Optional[int] = None
     verification_details: dict
+
+class AnchorStatusResponse(BaseModel):
+    public_id: str
+    status: str  # "queued", "processing", "anchored", "failed"
+    expected_anchor_by: Optional[str] = None
+    retry_after_seconds: Optional[int] = None  # None once anchored / failed
+    tries: Optional[int] = None
+    tx_hash: Optional[str] = None
+    anchored_at: Optional[str] = None
+    last_error: Optional[str] = None
+
+class BatchVerificationRequest(BaseModel):
+    public_ids: List[str]
+
+class BatchVerificationResponse(BaseModel):
+    count: int
+    results: List[VerificationResponse]
+    not_found: List[str]
@@ -0,0 +1,24 @@
+# app/schemas/queue.py
+from pydantic import BaseModel
+from typing import Optional
+
+class FailedItemsFilter(BaseModel):
+    """Dead-letter filters shared by the list / summary / requeue admin routes."""
+    error_class: Optional[str] = None  # "permanent", "timeout", "unhandled" or "temporary"
+    error: Optional[str] = None  # substring of last_error
+    older_than_hours: Optional[float] = None
+    newer_than_hours: Optional[float] = None
+    min_tries: Optional[int] = None
+    max_tries: Optional[int] = None
+
+class RequeueRequest(FailedItemsFilter):
+    max_items: Optional[int] = None
+    release_per_second: int = 0  # 0 = release everything at once
+    include_archived: bool = False
+    dry_run: bool = False
+
+class RequeueResponse(BaseModel):
+    matched: int
+    requeued: int
+    release_window_seconds: int
+    dry_run: bool
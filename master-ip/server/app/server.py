@@ -0,0 +1,210 @@
+# app/server.py
+"""
+Preload-then-fork launcher for the API.
+
+    python -m app.server --host 0.0.0.0 --port 8000 --workers 4
+
+The parent imports the app, loads CLIP and the text model and runs one
+warm-up embedding through each, binds the listening socket, then forks
+WEB_WORKERS uvicorn workers that all accept on that socket. Workers inherit
+the loaded weights copy-on-write (inference never writes them), so N workers
+cost one copy of the models, not N; with MODEL_BUNDLE_DIR the weights are
+file-backed mmaps and are shared even across restarts.
+
+  * The parent runs torch single-threaded: forking a process whose OpenMP
+    pool is running can deadlock the children. Each worker then gets
+    WORKER_TORCH_THREADS intra-op threads (default: CPU count / workers).
+  * Nothing with sockets or an event loop (Mongo, aiohttp, the RPC pool) is
+    created before the fork; each worker's lifespan hook builds its own.
+  * The parent supervises: a worker that dies is restarted, with exponential
+    backoff if it keeps dying within WORKER_MIN_UPTIME_SECONDS. A worker that
+    fails startup (exit code 3, e.g. missing settings) stops the launcher.
+  * SIGTERM / SIGINT: workers get SIGTERM and WEB_GRACEFUL_TIMEOUT seconds to
+    drain, then SIGKILL.
+
+CUDA cannot be initialised before a fork, so on GPU hosts the models are not
+preloaded and each worker loads its own copy on first use.
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import sys
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+from app.constant import (
+    WEB_WORKERS, WORKER_TORCH_THREADS, WEB_PRELOAD_MODELS, WEB_GRACEFUL_TIMEOUT,
+    WORKER_MIN_UPTIME_SECONDS, WORKER_RESTART_BACKOFF_MAX_SECONDS,
+)
+
+logger = logging.getLogger("app.server")
+
+STARTUP_FAILURE = 3   # uvicorn's exit code when startup / lifespan fails
+POLL_SECONDS = 0.5
+
+
+def preload_models() -> bool:
+    """Loads and warms both models in this (parent) process; False if skipped or failed."""
+    try:
+        import torch
+        from PIL import Image
+        from app.utils.embedders import get_clip_embedder, embed_text
+
+        if torch.cuda.is_available():
+            logger.warning("CUDA available: not preloading models (CUDA cannot be forked); workers load their own.")
+            return False
+        torch.set_num_threads(1)
+        start = time.monotonic()
+        get_clip_embedder().embed_pil(Image.new("RGB", (224, 224)))
+        embed_text("warm up")
+        logger.info(f"Models loaded and warmed in {time.monotonic() - start:.1f}s.")
+        return True
+    except Exception as e:
+        logger.warning(f"Model preload failed ({e}); workers will load the models on first use.")
+        return False
+
+
+def _torch_threads(workers: int) -> int:
+    return WORKER_TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(workers, 1))
+
+
+def _run_worker(config: uvicorn.Config, sock, threads: int) -> int:
+    """Body of a forked worker; returns its exit code."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    random.seed()  # don't share the parent's PRNG state across workers
+    # Picked up if torch is first imported here (models not preloaded)
+    os.environ["OMP_NUM_THREADS"] = os.environ["MKL_NUM_THREADS"] = str(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    return 0 if server.started else STARTUP_FAILURE
+
+
+class Launcher:
+    """Forks and supervises the uvicorn workers sharing one listening socket."""
+
+    def __init__(self, config: uvicorn.Config, workers: int):
+        self.config = config
+        self.workers = max(workers, 1)
+        self.threads = _torch_threads(self.workers)
+        self.sock = None
+        self.children: Dict[int, tuple] = {}          # pid -> (worker index, started at)
+        self.restart_at: Dict[int, float] = {}        # worker index -> monotonic time
+        self.backoff: Dict[int, float] = {}
+        self.stopping = False
+        self.exit_code = 0
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _run_worker(self.config, self.sock, self.threads)
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+            finally:
+                os._exit(code)
+        self.children[pid] = (index, time.monotonic())
+        logger.info(f"Worker {index} started (pid {pid}, {self.threads} torch thread(s)).")
+
+    def _on_signal(self, signum, frame) -> None:
+        logger.info(f"Received {signal.Signals(signum).name}; stopping workers...")
+        self.stopping = True
+
+    def _reap(self) -> None:
+        for pid in list(self.children):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if not done:
+                continue
+            index, started = self.children.pop(pid)
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            if code == STARTUP_FAILURE:
+                logger.error(f"Worker {index} (pid {pid}) failed to start; shutting down.")
+                self.stopping = True
+                self.exit_code = STARTUP_FAILURE
+                continue
+            uptime = time.monotonic() - started
+            if uptime < WORKER_MIN_UPTIME_SECONDS:
+                self.backoff[index] = min(max(1.0, self.backoff.get(index, 0) * 2), WORKER_RESTART_BACKOFF_MAX_SECONDS)
+            else:
+                self.backoff[index] = 0
+            logger.warning(
+                f"Worker {index} (pid {pid}) exited with code {code} after {uptime:.0f}s; "
+                f"restarting in {self.backoff[index]:.0f}s."
+            )
+            self.restart_at[index] = time.monotonic() + self.backoff[index]
+
+    def _stop_children(self) -> None:
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + WEB_GRACEFUL_TIMEOUT
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(POLL_SECONDS / 5)
+        for pid in list(self.children):
+            logger.warning(f"Worker pid {pid} did not exit within {WEB_GRACEFUL_TIMEOUT}s; killing it.")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+
+    def run(self) -> int:
+        self.sock = self.config.bind_socket()
+        # Keep the workers' GC from touching (and so copying) the objects preloaded here
+        gc.collect()
+        gc.freeze()
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        logger.info(f"Serving on {self.config.host}:{self.config.port} with {self.workers} worker(s).")
+        for i in range(self.workers):
+            self.spawn(i)
+        while not self.stopping:
+            self._reap()
+            now = time.monotonic()
+            for index, when in list(self.restart_at.items()):
+                if when <= now and not self.stopping:
+                    del self.restart_at[index]
+                    self.spawn(index)
+            time.sleep(POLL_SECONDS)
+        self._stop_children()
+        self.sock.close()
+        logger.info("All workers stopped.")
+        return self.exit_code
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Preload the models, then fork uvicorn workers.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    args = parser.parse_args(argv)
+
+    # Fast tokenizers must not start their thread pool before the fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    from app.main import app   # imported once here; workers inherit it
+
+    if WEB_PRELOAD_MODELS:
+        preload_models()
+    config = uvicorn.Config(app, host=args.host, port=args.port, lifespan="on")
+    return Launcher(config, args.workers).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
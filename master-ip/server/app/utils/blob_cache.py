@@ -0,0 +1,103 @@
+# app/utils/blob_cache.py
+"""
+Rendered assets (QR codes, certificate cards) by key: a per-process LRU in
+front of the `blob_cache` Mongo collection, which is the backing store shared
+by every process. A process serves a key from memory only after rendering or
+reading it once, so the first request per process still reads Mongo. Clients
+and CDNs then keep immutable blobs for a year (see _blob_response in
+app/controllers/craft_controllers.py) and revalidate with the ETag.
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.db.mongodb import collection
+from app.constant import BLOB_CACHE_COLL, BLOB_CACHE_MAX_ITEMS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Blob:
+    content: bytes
+    content_type: str
+    etag: str          # strong ETag, quoted
+    immutable: bool    # safe to serve with Cache-Control: immutable
+
+
+# In-process LRU in front of the Mongo collection (most recently used last)
+_mem: "OrderedDict[str, Blob]" = OrderedDict()
+
+
+def _remember(key: str, blob: Blob) -> None:
+    _mem[key] = blob
+    _mem.move_to_end(key)
+    while len(_mem) > BLOB_CACHE_MAX_ITEMS:
+        _mem.popitem(last=False)
+
+
+def make_blob(content: bytes, content_type: str, immutable: bool = True) -> Blob:
+    etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+    return Blob(content=content, content_type=content_type, etag=etag, immutable=immutable)
+
+
+def get_blob_cached(key: str) -> Optional[Blob]:
+    """Memory-only lookup (no I/O)."""
+    blob = _mem.get(key)
+    if blob is not None:
+        _mem.move_to_end(key)
+    return blob
+
+
+async def get_blob(key: str, remember: bool = True) -> Optional[Blob]:
+    """
+    Memory first, then the shared Mongo collection (populates memory on hit
+    unless `remember` is False, e.g. for multi-megabyte photos).
+    """
+    blob = get_blob_cached(key)
+    if blob is not None:
+        return blob
+    doc = await collection(BLOB_CACHE_COLL).find_one({"_id": key})
+    if not doc:
+        return None
+    blob = Blob(
+        content=bytes(doc["content"]),
+        content_type=doc["content_type"],
+        etag=doc["etag"],
+        immutable=bool(doc.get("immutable", True)),
+    )
+    if remember:
+        _remember(key, blob)
+    return blob
+
+
+async def put_blob(key: str, blob: Blob, remember: bool = True, required: bool = False) -> Blob:
+    """
+    Stores a rendered blob in memory and in Mongo (shared with other processes).
+    `remember=False` skips the in-process LRU; `required=True` raises when the
+    Mongo write fails instead of logging it (for blobs that cannot be re-rendered).
+    """
+    if remember:
+        _remember(key, blob)
+    try:
+        await collection(BLOB_CACHE_COLL).replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "content": blob.content,
+                "content_type": blob.content_type,
+                "etag": blob.etag,
+                "immutable": blob.immutable,
+                "created_at": datetime.utcnow().isoformat() + "Z",
+            },
+            upsert=True,
+        )
+    except Exception as e:
+        if required:
+            raise
+        # Non-fatal: the blob can always be re-rendered on a miss
+        logger.warning(f"[blob_cache] Failed to persist {key}: {e}")
+    return blob
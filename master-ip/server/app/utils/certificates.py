@@ -0,0 +1,151 @@
+# app/utils/certificates.py
+import asyncio
+import base64
+from io import BytesIO
+from typing import Dict
+from xml.sax.saxutils import escape
+
+import qrcode
+from qrcode.image.svg import SvgPathImage
+
+from app.db.mongodb import collection
+from app.utils.blob_cache import Blob, make_blob, put_blob
+from app.constant import PUBLIC_BASE_URL
+
+QR_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+# Only what the certificate card shows
+CERTIFICATE_PROJECTION = {
+    "_id": 0,
+    "public_id": 1,
+    "public_hash": 1,
+    "timestamp": 1,
+    "status": 1,
+    "tx_hash": 1,
+    "anchored_at": 1,
+    "original_onboarding_data.artisan.name": 1,
+    "original_onboarding_data.artisan.location": 1,
+    "original_onboarding_data.art.name": 1,
+}
+
+
+# --- Cache keys ---
+
+def qr_key(public_id: str, fmt: str) -> str:
+    return f"qr/{public_id}.{fmt}"
+
+
+def certificate_key(public_id: str, state: str) -> str:
+    return f"cert/{public_id}/{state}.svg"
+
+
+def certificate_state(doc: Dict) -> str:
+    """'anchored' once the batcher stored a tx hash, else 'pending'."""
+    return "anchored" if doc.get("status") == "anchored" and doc.get("tx_hash") else "pending"
+
+
+def qr_target_url(public_id: str) -> str:
+    """What a phone opens when the QR is scanned."""
+    return f"{PUBLIC_BASE_URL}/verify/{public_id}"
+
+
+# --- Rendering (CPU-bound; run in a thread) ---
+
+def _make_qr(data: str) -> qrcode.QRCode:
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=8, border=2)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_qr_png(data: str) -> bytes:
+    buf = BytesIO()
+    _make_qr(data).make_image(fill_color="black", back_color="white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def render_qr_svg(data: str) -> bytes:
+    buf = BytesIO()
+    _make_qr(data).make_image(image_factory=SvgPathImage).save(buf)
+    return buf.getvalue()
+
+
+def render_certificate_svg(doc: Dict, qr_png: bytes) -> bytes:
+    """
+    Compact verification card: CraftID, artwork, artisan, hash and anchoring
+    status, with the QR embedded so the card is self-contained.
+    """
+    data = doc.get("original_onboarding_data", {})
+    artisan = data.get("artisan", {})
+    art = data.get("art", {})
+    state = certificate_state(doc)
+    public_hash = doc.get("public_hash") or ""
+
+    if state == "anchored":
+        status_line = f"Anchored on-chain {doc.get('anchored_at') or ''}".strip()
+        tx_line = f"tx {doc.get('tx_hash')}"
+    else:
+        status_line = "Queued for on-chain anchoring"
+        tx_line = ""
+
+    lines = [
+        (34, 22, "bold", f"CraftID {doc.get('public_id', '')}"),
+        (70, 16, "normal", art.get("name", "")),
+        (94, 14, "normal", f"by {artisan.get('name', '')}, {artisan.get('location', '')}"),
+        (130, 11, "normal", f"sha256 {public_hash[:32]}"),
+        (146, 11, "normal", f"       {public_hash[32:]}"),
+        (172, 13, "bold", status_line),
+        (190, 10, "normal", tx_line),
+        (220, 10, "normal", f"Created {doc.get('timestamp', '')}"),
+        (236, 10, "normal", f"Verify: {qr_target_url(doc.get('public_id', ''))}"),
+    ]
+    text = "".join(
+        f'<text x="24" y="{y}" font-size="{size}" font-weight="{weight}">{escape(str(value))}</text>'
+        for y, size, weight, value in lines if value
+    )
+    qr_uri = "data:image/png;base64," + base64.b64encode(qr_png).decode("ascii")
+    svg = (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="640" height="260" viewBox="0 0 640 260" '
+        'font-family="Helvetica, Arial, sans-serif">'
+        '<rect x="1" y="1" width="638" height="258" rx="12" fill="#fffdf7" stroke="#8a5a2b" stroke-width="2"/>'
+        f'{text}'
+        f'<image x="430" y="30" width="190" height="190" href="{qr_uri}"/>'
+        '</svg>'
+    )
+    return svg.encode("utf-8")
+
+
+# --- Pre-rendering ---
+
+def _render_all(doc: Dict, need_qr: bool) -> Dict[str, Blob]:
+    public_id = doc["public_id"]
+    url = qr_target_url(public_id)
+    qr_png = render_qr_png(url)
+    out: Dict[str, Blob] = {}
+    if need_qr:
+        out[qr_key(public_id, "png")] = make_blob(qr_png, QR_FORMATS["png"])
+        out[qr_key(public_id, "svg")] = make_blob(render_qr_svg(url), QR_FORMATS["svg"])
+    state = certificate_state(doc)
+    # A pending card is superseded once anchored, so only the anchored card is immutable
+    out[certificate_key(public_id, state)] = make_blob(
+        render_certificate_svg(doc, qr_png), "image/svg+xml", immutable=(state == "anchored")
+    )
+    return out
+
+
+async def prerender_assets(doc: Dict, include_qr: bool = True) -> Dict[str, Blob]:
+    """
+    Renders the QR codes (PNG + SVG) and the certificate card for the doc's
+    current state once, and stores them in the blob cache.
+    """
+    blobs = await asyncio.to_thread(_render_all, doc, include_qr)
+    for key, blob in blobs.items():
+        await put_blob(key, blob)
+    return blobs
+
+
+async def render_anchored_certificate(public_id: str) -> None:
+    """Called by the batcher once an item is anchored: renders the final card."""
+    doc = await collection("craftids").find_one({"public_id": public_id}, CERTIFICATE_PROJECTION)
+    if doc and certificate_state(doc) == "anchored":
+        await prerender_assets(doc, include_qr=False)
@@ -1,22 +1,34 @@
 # app/utils/embedders.py
+# torch / transformers / sentence_transformers are imported on first use, not
+# at module import: importing the API (or anything that pulls in the
+# controllers) must not pay for the ML stack until an embedding is needed.
 from PIL import Image
-import torch
-from transformers import CLIPProcessor, CLIPModel
-import numpy as np
-from sentence_transformers import SentenceTransformer
 
 # Import config from constants
-from app.constant import CLIP_MODEL_NAME, TEXT_MODEL_NAME
+from app.constant import CLIP_MODEL_NAME, TEXT_MODEL_NAME, MODEL_BUNDLE_DIR
+from app.utils import model_bundle
 
 # --- CLIP Image Embedder ---
 
 class ClipEmbedder:
     def __init__(self, device=None):
+        if MODEL_BUNDLE_DIR:
+            # Offline bundle (app/utils/model_bundle.py); must precede the transformers import
+            model_bundle.force_offline()
+        import torch
+
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        if MODEL_BUNDLE_DIR:
+            self.model, self.proc = model_bundle.load_clip(self.device)
+            return
+        from transformers import CLIPProcessor, CLIPModel
+
         self.model = CLIPModel.from_pretrained(CLIP_MODEL_NAME).to(self.device)
         self.proc = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
 
     def embed_pil(self, pil_image):
+        import torch
+
         inputs = self.proc(images=pil_image, return_tensors="pt").to(self.device)
         with torch.no_grad():
             feats = self.model.get_image_features(**inputs)    # (1, dim)
@@ -36,6 +48,15 @@ class ClipEmbedder:
             vecs.append(self.embed_pil(img))
         return vecs
 
+_clip_embedder = None
+
+def get_clip_embedder() -> ClipEmbedder:
+    """Process-wide ClipEmbedder, loaded on first use (or preloaded by app/server.py before forking)."""
+    global _clip_embedder
+    if _clip_embedder is None:
+        _clip_embedder = ClipEmbedder()
+    return _clip_embedder
+
 # --- SentenceTransformer Text Embedder ---
 
 _model = None
@@ -43,10 +64,16 @@ _model = None
 def get_model(name: str = TEXT_MODEL_NAME):
     global _model
     if _model is None:
+        if MODEL_BUNDLE_DIR and name == TEXT_MODEL_NAME:
+            _model = model_bundle.load_text_model()
+            return _model
+        from sentence_transformers import SentenceTransformer
         _model = SentenceTransformer(name)
     return _model
 
 def embed_text(text: str):
+    import numpy as np
+
     m = get_model()
     vec = m.encode([text], show_progress_bar=False)[0]
     norm = np.linalg.norm(vec)
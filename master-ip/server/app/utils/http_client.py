@@ -83,23 +83,18 @@ def decode_base64_to_pil(base64_string: str) -> Image.Image:
         HTTPException(400) if decoding fails
     """
     import base64
-    import re
     
     try:
-        # Strip data URI prefix if present (e.g., "data:image/jpeg;base64,")
+        # Strip data URI prefix if present (e.g., "data:image/jpeg;base64,").
+        # Decode from an offset instead of slicing the (large) string.
+        start = 0
         if base64_string.startswith('data:'):
-            # Extract just the base64 part after the comma
-            match = re.match(r'data:image/[^;]+;base64,(.+)', base64_string)
-            if match:
-                base64_string = match.group(1)
-            else:
-                # Fallback: try to split by comma
-                parts = base64_string.split(',', 1)
-                if len(parts) == 2:
-                    base64_string = parts[1]
+            comma = base64_string.find(',')
+            if comma != -1:
+                start = comma + 1
         
         # Decode base64 to bytes
-        image_bytes = base64.b64decode(base64_string)
+        image_bytes = base64.b64decode(memoryview(base64_string.encode("ascii"))[start:])
         
         # Convert to PIL Image
         img = Image.open(BytesIO(image_bytes)).convert("RGB")
@@ -109,4 +104,27 @@ def decode_base64_to_pil(base64_string: str) -> Image.Image:
         raise HTTPException(
             status_code=400, 
             detail=f"Failed to decode Base64 image: {e}"
-        )
\ No newline at end of file
+        )
+
+def decode_image_file(fileobj) -> Image.Image:
+    """
+    Decode an image straight from a (spooled) file object to a PIL Image.
+
+    Args:
+        fileobj: Binary file-like object positioned at the start of the image.
+
+    Returns:
+        PIL.Image in RGB mode
+
+    Raises:
+        HTTPException(400) if decoding fails
+    """
+    try:
+        # PIL reads from the buffer directly; no intermediate bytes copy
+        img = Image.open(fileobj).convert("RGB")
+        return img
+    except Exception as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to decode uploaded image: {e}"
+        )
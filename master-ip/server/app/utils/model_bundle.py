@@ -0,0 +1,247 @@
+# app/utils/model_bundle.py
+"""
+Offline model bundle: CLIP and the sentence-transformers text model baked
+into one directory as safetensors, so a cold start neither downloads from
+the Hugging Face Hub nor needs network at all.
+
+    MODEL_BUNDLE_DIR/
+        manifest.json     model names + sha256 of every weight file
+        clip/             CLIPModel + CLIPProcessor (save_pretrained)
+        text/             SentenceTransformer.save()
+
+Build it once (needs network; the Dockerfile does this in its builder stage):
+
+    python -m app.utils.model_bundle build /code/models
+    python -m app.utils.model_bundle verify /code/models
+
+With MODEL_BUNDLE_DIR set, the loaders below force offline mode and then
+swap every weight for a tensor backed by a copy-on-write mmap of the
+.safetensors file. Those pages live in the page cache, so all uvicorn
+workers on a host (forked or not) share one physical copy of the weights
+instead of each holding a private one; a worker only gets private pages for
+a tensor it writes to, which inference never does.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.constant import CLIP_MODEL_NAME, TEXT_MODEL_NAME, MODEL_BUNDLE_DIR
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+CLIP_SUBDIR = "clip"
+TEXT_SUBDIR = "text"
+
+OFFLINE_ENV = {"HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1", "HF_DATASETS_OFFLINE": "1"}
+
+# safetensors dtype tag -> torch dtype name
+_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+# Open mappings; tensors reference them, kept here so they are never unmapped under a live model
+_mappings: List[mmap.mmap] = []
+
+
+class ModelBundleError(RuntimeError):
+    pass
+
+
+def force_offline() -> None:
+    """
+    Hub offline mode. huggingface_hub reads these when it is first imported,
+    so call this before importing transformers / sentence_transformers.
+    """
+    for k, v in OFFLINE_ENV.items():
+        os.environ[k] = v
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _weight_files(model_dir: str) -> List[str]:
+    return sorted(f for f in os.listdir(model_dir) if f.endswith(".safetensors"))
+
+
+def read_manifest(bundle_dir: str = MODEL_BUNDLE_DIR) -> Dict:
+    path = os.path.join(bundle_dir, MANIFEST)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ModelBundleError(f"No model bundle at {bundle_dir} (build it: python -m app.utils.model_bundle build {bundle_dir})")
+
+
+def _model_dir(kind: str, expected_name: str, bundle_dir: str = MODEL_BUNDLE_DIR) -> str:
+    """Bundle subdirectory for `kind`, checked against the configured model name."""
+    entry = read_manifest(bundle_dir).get(kind) or {}
+    if entry.get("name") != expected_name:
+        raise ModelBundleError(
+            f"Model bundle at {bundle_dir} has {kind} model {entry.get('name')!r}, expected {expected_name!r}; rebuild it."
+        )
+    return os.path.join(bundle_dir, entry["dir"])
+
+
+# --- Memory-mapped safetensors ---
+
+def mmap_safetensors(path: str) -> Dict:
+    """
+    {name: tensor} for a .safetensors file, every tensor a view into one
+    copy-on-write mapping of the file (no read, no copy).
+
+    Format: 8-byte little-endian header size, JSON header
+    {name: {dtype, shape, data_offsets: [begin, end]}}, then the raw data.
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    _mappings.append(mapping)
+
+    base = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = getattr(torch, _DTYPES[info["dtype"]])
+        begin, end = info["data_offsets"]
+        shape = info["shape"]
+        if end == begin:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+        count = (end - begin) // torch.tensor([], dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(mapping, dtype=dtype, count=count, offset=base + begin).view(shape)
+    return tensors
+
+
+def share_weights(module, model_dir: str) -> Tuple[int, int]:
+    """
+    Replaces `module`'s parameters and buffers with mmap-backed tensors from
+    the .safetensors files in `model_dir` (load_state_dict(assign=True)); the
+    privately loaded copies are freed. Returns (tensors mapped, keys missing).
+    """
+    state: Dict = {}
+    for fname in _weight_files(model_dir):
+        state.update(mmap_safetensors(os.path.join(model_dir, fname)))
+    if not state:
+        raise ModelBundleError(f"No .safetensors weights in {model_dir}")
+    result = module.load_state_dict(state, strict=False, assign=True)
+    if result.missing_keys:
+        # e.g. tied weights saved once: they keep the copy from_pretrained loaded
+        logger.info(f"{len(result.missing_keys)} tensors of {model_dir} not memory-mapped: {result.missing_keys[:5]}")
+    return len(state) - len(result.unexpected_keys), len(result.missing_keys)
+
+
+# --- Loaders (used by app/utils/embedders.py) ---
+
+def load_clip(device: str):
+    """(CLIPModel, CLIPProcessor) from the bundle, offline, weights memory-mapped on CPU."""
+    model_dir = _model_dir("clip", CLIP_MODEL_NAME)
+    force_offline()
+    from transformers import CLIPModel, CLIPProcessor
+
+    model = CLIPModel.from_pretrained(model_dir, local_files_only=True, use_safetensors=True)
+    if device == "cpu":
+        mapped, _ = share_weights(model, model_dir)
+        logger.info(f"CLIP loaded from {model_dir} ({mapped} tensors memory-mapped).")
+    model.eval()
+    return model.to(device), CLIPProcessor.from_pretrained(model_dir, local_files_only=True)
+
+
+def load_text_model(device: Optional[str] = None):
+    """SentenceTransformer from the bundle, offline, transformer weights memory-mapped on CPU."""
+    model_dir = _model_dir("text", TEXT_MODEL_NAME)
+    force_offline()
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_dir, device=device)
+    if model.device.type == "cpu":
+        mapped, _ = share_weights(model[0].auto_model, model_dir)
+        logger.info(f"Text model loaded from {model_dir} ({mapped} tensors memory-mapped).")
+    model.eval()
+    return model
+
+
+# --- Build / verify ---
+
+def _describe(bundle_dir: str, subdir: str, name: str) -> Dict:
+    model_dir = os.path.join(bundle_dir, subdir)
+    files = _weight_files(model_dir)
+    if not files:
+        raise ModelBundleError(f"{name} was not saved as safetensors in {model_dir}")
+    return {"name": name, "dir": subdir, "files": {f: _sha256(os.path.join(model_dir, f)) for f in files}}
+
+
+def build(bundle_dir: str) -> Dict:
+    """Downloads both models and saves them as safetensors under `bundle_dir`; returns the manifest."""
+    from transformers import CLIPModel, CLIPProcessor
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    clip_dir = os.path.join(bundle_dir, CLIP_SUBDIR)
+    CLIPModel.from_pretrained(CLIP_MODEL_NAME).save_pretrained(clip_dir, safe_serialization=True)
+    CLIPProcessor.from_pretrained(CLIP_MODEL_NAME).save_pretrained(clip_dir)
+    SentenceTransformer(TEXT_MODEL_NAME, device="cpu").save(os.path.join(bundle_dir, TEXT_SUBDIR), safe_serialization=True)
+
+    manifest = {
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "clip": _describe(bundle_dir, CLIP_SUBDIR, CLIP_MODEL_NAME),
+        "text": _describe(bundle_dir, TEXT_SUBDIR, TEXT_MODEL_NAME),
+    }
+    with open(os.path.join(bundle_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify(bundle_dir: str) -> List[str]:
+    """Checks names and weight checksums against the manifest; returns the problems found."""
+    manifest = read_manifest(bundle_dir)
+    problems = []
+    for kind, name in (("clip", CLIP_MODEL_NAME), ("text", TEXT_MODEL_NAME)):
+        entry = manifest.get(kind) or {}
+        if entry.get("name") != name:
+            problems.append(f"{kind}: bundle has {entry.get('name')!r}, expected {name!r}")
+            continue
+        for fname, digest in entry.get("files", {}).items():
+            path = os.path.join(bundle_dir, entry["dir"], fname)
+            if not os.path.exists(path):
+                problems.append(f"{kind}: missing {fname}")
+            elif _sha256(path) != digest:
+                problems.append(f"{kind}: checksum mismatch for {fname}")
+    return problems
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 2 or argv[0] not in ("build", "verify"):
+        print("usage: python -m app.utils.model_bundle build|verify DIR", file=sys.stderr)
+        return 2
+    command, bundle_dir = argv
+    if command == "build":
+        manifest = build(bundle_dir)
+        for kind in ("clip", "text"):
+            print(f"{kind}: {manifest[kind]['name']} -> {os.path.join(bundle_dir, manifest[kind]['dir'])}")
+    problems = verify(bundle_dir)
+    for p in problems:
+        print(f"FAIL {p}", file=sys.stderr)
+    if not problems:
+        print(f"Model bundle at {bundle_dir} OK.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,67 @@
+# app/utils/photo_store.py
+import hashlib
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Optional, Tuple
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket, AsyncIOMotorGridOut
+
+from app.db.mongodb import get_db
+from app.constant import PHOTO_BUCKET
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass
+class PhotoUpload:
+    """An uploaded photo still in its spooled temp file, ready to be streamed to GridFS."""
+    file: BinaryIO
+    content_type: str
+    etag: str          # strong ETag (sha256 of the bytes), quoted
+    size: int
+
+
+def hash_photo(file: BinaryIO) -> Tuple[str, int]:
+    """(etag, size) of a file, read in chunks and rewound (blocking: run in a thread)."""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_BYTES), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return '"' + digest.hexdigest()[:32] + '"', size
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(get_db(), bucket_name=PHOTO_BUCKET)
+
+
+async def store_photo(key: str, photo: PhotoUpload) -> None:
+    """
+    Streams the spooled file into GridFS under `key` (255 KB chunks, so photos
+    of any allowed size stay far from the 16 MB document limit). The file is
+    read in Motor's worker thread, never held in memory as a whole.
+    """
+    photo.file.seek(0)
+    await _bucket().upload_from_stream_with_id(
+        key, key, photo.file,
+        metadata={"content_type": photo.content_type, "etag": photo.etag},
+    )
+
+
+async def open_photo(key: str) -> Optional[AsyncIOMotorGridOut]:
+    """The stored photo as a GridFS stream (length / metadata read already), or None."""
+    try:
+        return await _bucket().open_download_stream(key)
+    except NoFile:
+        return None
+
+
+async def iter_photo(grid_out: AsyncIOMotorGridOut) -> AsyncIterator[bytes]:
+    """Yields the photo one GridFS chunk at a time."""
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        yield chunk
@@ -1,4 +1,3 @@
-from pinecone import Pinecone
 from fastapi import HTTPException
 import asyncio
 
@@ -10,6 +9,17 @@ from app.constant import (
     PINECONE_TEXT_INDEX
 )
 
+_client = None
+
+def _get_client():
+    """One Pinecone client per process, created (and the SDK imported) on first use."""
+    global _client
+    if _client is None:
+        from pinecone import Pinecone
+        _client = Pinecone(api_key=PINECONE_API_KEY)
+    return _client
+
+
 def _get_image_index():
     """
     Return a Pinecone Index client connected to the IMAGE index (INDEX_HOST).
@@ -18,7 +28,7 @@ def _get_image_index():
     if not PINECONE_API_KEY or not INDEX_HOST:
         raise HTTPException(status_code=500, detail="Pinecone (Image) not configured (set PINECONE_API_KEY and INDEX_HOST)")
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
+        pc = _get_client()
         idx = pc.Index(host=INDEX_HOST)
         return idx
     except Exception as e:
@@ -71,7 +81,7 @@ def _get_text_index():
     if not PINECONE_API_KEY or not PINECONE_ENV or not PINECONE_TEXT_INDEX:
         raise HTTPException(status_code=500, detail="Pinecone (Text) not configured (set PINECONE_API_KEY, PINECONE_ENV, and PINECONE_TEXT_INDEX)")
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
+        pc = _get_client()
         idx = pc.Index(name=PINECONE_TEXT_INDEX)
         return idx
     except Exception as e:
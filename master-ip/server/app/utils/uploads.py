@@ -0,0 +1,155 @@
+# app/utils/uploads.py
+import asyncio
+from dataclasses import dataclass
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+try:
+    # python-multipart >= 0.0.13 ships as `python_multipart`
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    # Fallback to older import path
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Import config from constants
+from app.constant import MAX_UPLOAD_BYTES, MAX_METADATA_BYTES, UPLOAD_SPOOL_MAX_MEMORY
+
+METADATA_FIELD = "metadata"
+PHOTO_FIELD = "photo"
+
+
+@dataclass
+class CreateUpload:
+    """Parsed multipart /create body: raw JSON metadata + spooled image file."""
+    metadata: bytes
+    photo: SpooledTemporaryFile
+    photo_content_type: str = ""
+    photo_size: int = 0
+
+    def close(self):
+        self.photo.close()
+
+
+async def read_create_upload(request: Request) -> CreateUpload:
+    """
+    Stream a multipart/form-data body with a JSON `metadata` part and a binary
+    `photo` part. The photo is written to a spooled temp file as it arrives and
+    size limits are enforced per chunk, so oversized uploads are rejected
+    without ever being held in memory.
+    Raises HTTPException(400/413/415) on malformed or oversized bodies.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data":
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Missing multipart boundary")
+
+    # Reject early when the client announces a body that cannot fit
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES + MAX_METADATA_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    # Parser callbacks are synchronous; collect events and apply them after each write
+    events = []
+    header_field = bytearray()
+    header_value = bytearray()
+    part_headers = {}
+
+    def on_part_begin():
+        part_headers.clear()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        part_headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("begin", dict(part_headers)))
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    photo = SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY)
+    metadata = bytearray()
+    photo_content_type = ""
+    photo_size = 0
+    seen_photo = False
+    current: Optional[str] = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, payload in events:
+                if kind == "begin":
+                    _, disp = parse_options_header(payload.get(b"content-disposition", b""))
+                    current = disp.get(b"name", b"").decode("latin-1")
+                    if current == PHOTO_FIELD:
+                        if seen_photo:
+                            raise HTTPException(status_code=400, detail="Only one photo part is allowed")
+                        seen_photo = True
+                        photo_content_type = payload.get(b"content-type", b"").decode("latin-1")
+                elif kind == "data":
+                    if current == METADATA_FIELD:
+                        metadata.extend(payload)
+                        if len(metadata) > MAX_METADATA_BYTES:
+                            raise HTTPException(status_code=413, detail=f"Metadata exceeds {MAX_METADATA_BYTES} bytes")
+                    elif current == PHOTO_FIELD:
+                        photo_size += len(payload)
+                        if photo_size > MAX_UPLOAD_BYTES:
+                            raise HTTPException(status_code=413, detail=f"Photo exceeds {MAX_UPLOAD_BYTES} bytes")
+                        if photo_size > UPLOAD_SPOOL_MAX_MEMORY:
+                            # This write spills (or already spilled) to disk: keep file I/O off the event loop
+                            await asyncio.to_thread(photo.write, payload)
+                        else:
+                            photo.write(payload)
+                    # parts with unknown names are ignored
+                else:
+                    current = None
+            events.clear()
+        parser.finalize()
+    except HTTPException:
+        photo.close()
+        raise
+    except Exception as e:
+        photo.close()
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+
+    if not metadata:
+        photo.close()
+        raise HTTPException(status_code=400, detail=f"Missing '{METADATA_FIELD}' part")
+    if not photo_size:
+        photo.close()
+        raise HTTPException(status_code=400, detail=f"Missing '{PHOTO_FIELD}' part")
+    if photo_content_type and not photo_content_type.startswith("image/"):
+        photo.close()
+        raise HTTPException(status_code=415, detail=f"Photo part is not an image (content-type={photo_content_type})")
+
+    photo.seek(0)
+    return CreateUpload(
+        metadata=bytes(metadata),
+        photo=photo,
+        photo_content_type=photo_content_type,
+        photo_size=photo_size,
+    )
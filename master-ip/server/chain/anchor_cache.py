@@ -0,0 +1,227 @@
+# master-ip/server/chain/anchor_cache.py
+"""
+Verification cache for on-chain anchoring status.
+
+Once a hash is anchored it can never be un-anchored, so the first successful
+on-chain check is persisted on the craftid (`chain_status`) and kept in a
+bounded in-process LRU. Repeat verifications are then pure memory/Mongo hits;
+the chain is only re-queried when VERIFY_AUDIT_INTERVAL_SECONDS is set.
+Misses are answered from the HashAnchored event index (chain/indexer.py)
+before falling back to isAnchored calls.
+Merkle-anchored items are proven locally; their shared root is checked once.
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+
+from chain.utils import get_logger, utc_now_iso
+from chain.merkle import verify_proof
+from chain.web3_client import lookup_anchors_batch, get_tx_block_numbers
+from chain.indexer import indexed_anchors, normalize_hash
+from app.db.mongodb import collection
+from app.constant import ANCHOR_CACHE_SIZE, VERIFY_AUDIT_INTERVAL_SECONDS
+
+logger = get_logger("chain.anchor_cache")
+
+# public_id -> chain_status dict, "root:<hex>" -> root status (most recently used last)
+_lru: "OrderedDict[str, Dict]" = OrderedDict()
+ROOT_KEY_PREFIX = "root:"
+
+
+def _lru_get(public_id: str) -> Optional[Dict]:
+    entry = _lru.get(public_id)
+    if entry is not None:
+        _lru.move_to_end(public_id)
+    return entry
+
+
+def _lru_put(public_id: str, status: Dict) -> None:
+    _lru[public_id] = status
+    _lru.move_to_end(public_id)
+    while len(_lru) > ANCHOR_CACHE_SIZE:
+        _lru.popitem(last=False)
+
+
+def invalidate(public_id: str) -> None:
+    """Drops a cached entry (e.g. after an audit disagreed with the cache)."""
+    _lru.pop(public_id, None)
+
+
+def _audit_due(status: Dict) -> bool:
+    """True if periodic audit mode is on and this entry is older than the interval."""
+    if VERIFY_AUDIT_INTERVAL_SECONDS <= 0:
+        return False
+    try:
+        checked = datetime.fromisoformat(status["checked_at"])
+    except (KeyError, TypeError, ValueError):
+        return True
+    age = (datetime.now(timezone.utc) - checked).total_seconds()
+    return age > VERIFY_AUDIT_INTERVAL_SECONDS
+
+
+def _usable(status: Optional[Dict], public_hash: str) -> bool:
+    return bool(status) and status.get("anchored") and status.get("public_hash") == public_hash and not _audit_due(status)
+
+
+def cached_anchor_status(doc: Dict) -> Optional[Dict]:
+    """LRU -> persisted chain_status lookup; never touches the chain. None on miss."""
+    public_id = doc["public_id"]
+    public_hash = doc.get("public_hash")
+
+    # 1. Hot ids: in-process LRU
+    cached = _lru_get(public_id)
+    if _usable(cached, public_hash):
+        return cached
+
+    # 2. Persisted on the craftid by an earlier check
+    persisted = doc.get("chain_status")
+    if _usable(persisted, public_hash):
+        _lru_put(public_id, persisted)
+        return persisted
+    return None
+
+
+def _build_status(doc: Dict, anchored: bool, ts: int, block_number: Optional[int], merkle_root: Optional[str] = None) -> Dict:
+    if not anchored:
+        return {"anchored": False, "timestamp": None, "block_number": None, "public_hash": doc.get("public_hash")}
+    status = {
+        "anchored": True,
+        "timestamp": int(ts),
+        "block_number": block_number,
+        "public_hash": doc.get("public_hash"),
+        "checked_at": utc_now_iso(),
+    }
+    if merkle_root:
+        status["merkle_root"] = merkle_root
+    return status
+
+
+def _had_cached(doc: Dict) -> bool:
+    return doc["public_id"] in _lru or bool((doc.get("chain_status") or {}).get("anchored"))
+
+
+async def _record_statuses(pairs: List[Tuple[Dict, Dict]]) -> None:
+    """
+    Persists fresh on-chain results for (doc, status) pairs in one bulk_write.
+    Anchored results are cached; an audit that no longer finds a cached anchor drops it.
+    """
+    ops = []
+    for doc, status in pairs:
+        public_id = doc["public_id"]
+        if status["anchored"]:
+            _lru_put(public_id, status)
+            ops.append(UpdateOne({"public_id": public_id}, {"$set": {"chain_status": status}}))
+        elif _had_cached(doc):
+            # Audit found the cache out of sync with the chain (e.g. reorg); forget it
+            logger.warning(f"Audit: {public_id} cached as anchored but not found on-chain. Dropping cache.")
+            invalidate(public_id)
+            ops.append(UpdateOne({"public_id": public_id}, {"$unset": {"chain_status": ""}}))
+    if not ops:
+        return
+    try:
+        await collection("craftids").bulk_write(ops, ordered=False)
+    except Exception as e:
+        # Non-fatal: the LRU still saves the next round trip on this instance
+        logger.warning(f"Failed to persist chain_status for {len(ops)} craftids: {e}")
+
+
+def _cached_root(root: str) -> Optional[Dict]:
+    """Merkle roots are shared by a whole batch, so they get their own LRU entries."""
+    entry = _lru_get(ROOT_KEY_PREFIX + root)
+    if entry and not _audit_due(entry):
+        return entry
+    return None
+
+
+async def get_anchor_status(doc: Dict) -> Dict:
+    """
+    Returns {"anchored", "timestamp", "block_number", "checked_at", "public_hash"}
+    (+ "merkle_root" for Merkle-anchored items) for an anchored craftid doc,
+    using LRU -> persisted chain_status -> chain.
+    Raises on RPC errors (callers treat that as "not verified").
+    """
+    return (await get_anchor_statuses([doc]))[doc["public_id"]]
+
+
+async def get_anchor_statuses(docs: List[Dict]) -> Dict[str, Dict]:
+    """
+    Batched get_anchor_status. Merkle-anchored items are proven locally against
+    their stored root, so only distinct roots are checked on-chain. Cache misses
+    are resolved with one JSON-RPC batch of isAnchored/isRootAnchored calls (plus
+    one batch of receipts for block numbers) and persisted with a single
+    bulk_write. Returns {public_id: status}.
+    """
+    out: Dict[str, Dict] = {}
+    plain: List[Dict] = []
+    merkle_docs: List[Dict] = []
+    root_results: Dict[str, Tuple[bool, int]] = {}
+    pairs: List[Tuple[Dict, Dict]] = []
+
+    for doc in docs:
+        cached = cached_anchor_status(doc)
+        if cached:
+            out[doc["public_id"]] = cached
+            continue
+        merkle = doc.get("merkle")
+        if not merkle:
+            plain.append(doc)
+        elif not verify_proof(doc.get("public_hash") or "", merkle.get("proof") or [], merkle.get("root") or ""):
+            # The stored proof does not lead to the stored root: never anchored as claimed
+            status = _build_status(doc, False, 0, None)
+            status["proof_valid"] = False
+            out[doc["public_id"]] = status
+            pairs.append((doc, status))
+        else:
+            merkle_docs.append(doc)
+            root_entry = _cached_root(merkle["root"])
+            if root_entry:
+                root_results[merkle["root"]] = (True, root_entry["timestamp"])
+
+    indexed: Dict[str, Dict] = {}
+    if plain and not VERIFY_AUDIT_INTERVAL_SECONDS:
+        try:
+            indexed = await indexed_anchors([d.get("public_hash") for d in plain])
+        except Exception as e:
+            logger.warning(f"Anchor index lookup failed: {e}")
+    unindexed = []
+    for doc in plain:
+        event = indexed.get(normalize_hash(doc.get("public_hash")))
+        if event is None:
+            unindexed.append(doc)
+            continue
+        status = _build_status(doc, True, event["timestamp"], event.get("block_number"))
+        out[doc["public_id"]] = status
+        pairs.append((doc, status))
+    plain = unindexed
+
+    roots = list(dict.fromkeys(d["merkle"]["root"] for d in merkle_docs if d["merkle"]["root"] not in root_results))
+    if plain or roots:
+        hash_results, fresh_roots = await lookup_anchors_batch([d.get("public_hash") for d in plain], roots)
+        for root, (anchored, ts) in zip(roots, fresh_roots):
+            root_results[root] = (anchored, ts)
+            if anchored:
+                _lru_put(ROOT_KEY_PREFIX + root, {"timestamp": int(ts), "checked_at": utc_now_iso()})
+    else:
+        hash_results = []
+
+    resolved = list(zip(plain, hash_results)) + [(d, root_results[d["merkle"]["root"]]) for d in merkle_docs]
+    need_block = [d for d, (anchored, _) in resolved if anchored and d.get("tx_hash")]
+    blocks: Dict[str, Optional[int]] = {}
+    if need_block:
+        try:
+            numbers = await get_tx_block_numbers([d["tx_hash"] for d in need_block])
+            blocks = {d["public_id"]: n for d, n in zip(need_block, numbers)}
+        except Exception as e:
+            # Block numbers are informational; anchoring status is already known
+            logger.warning(f"Failed to batch-fetch receipts for block numbers: {e}")
+
+    for doc, (anchored, ts) in resolved:
+        merkle_root = (doc.get("merkle") or {}).get("root")
+        status = _build_status(doc, anchored, ts, blocks.get(doc["public_id"]), merkle_root)
+        out[doc["public_id"]] = status
+        pairs.append((doc, status))
+
+    if pairs:
+        await _record_statuses(pairs)
+    return out
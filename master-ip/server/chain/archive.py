@@ -0,0 +1,135 @@
+# master-ip/server/chain/archive.py
+"""
+Keeps anchor_queue bounded to in-flight work.
+
+Terminal items are moved to `anchor_queue_archive` in batches of
+QUEUE_ARCHIVE_BATCH_SIZE: anchored items on the next pass, failed (DLQ) items
+once their last try is QUEUE_ARCHIVE_FAILED_AFTER_DAYS old. Each batch is
+copied (idempotent upserts, stamped with `archived_at`) before it is deleted
+from the live collection, so a crash in between only leaves a duplicate that
+the next pass resolves; nothing is lost. With QUEUE_ARCHIVE_TTL_DAYS set, a
+TTL index on `archived_at` lets MongoDB expire old archive entries.
+
+Runs inside the batcher (every QUEUE_ARCHIVE_INTERVAL seconds) or on its own:
+
+    python -m chain.archive
+"""
+import asyncio
+from datetime import datetime, timezone, timedelta
+from typing import Dict
+
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+from chain.utils import get_logger
+from chain.queue import QUEUE_COLL, ARCHIVE_COLL
+from app.db.mongodb import collection, get_db, connect_db, close_db
+from app.constant import (
+    QUEUE_ARCHIVE_INTERVAL, QUEUE_ARCHIVE_BATCH_SIZE,
+    QUEUE_ARCHIVE_FAILED_AFTER_DAYS, QUEUE_ARCHIVE_TTL_DAYS,
+)
+
+logger = get_logger("chain.archive")
+
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def _terminal_filter(now: datetime) -> Dict:
+    failed_before = (now - timedelta(days=QUEUE_ARCHIVE_FAILED_AFTER_DAYS)).isoformat()
+    return {
+        "$or": [
+            {"status": "anchored"},
+            {"status": "failed", "last_try": {"$lt": failed_before}},
+        ]
+    }
+
+
+async def ensure_archive_indexes() -> None:
+    """Lookup indexes on the archive, plus the optional TTL index on archived_at."""
+    archive = collection(ARCHIVE_COLL)
+    await archive.create_index("public_id")
+    await archive.create_index([("status", 1), ("last_try", -1)])
+    await archive.create_index([("status", 1), ("anchored_at", -1)])  # /queue/summary latency sample
+    if QUEUE_ARCHIVE_TTL_DAYS <= 0:
+        return
+    ttl = QUEUE_ARCHIVE_TTL_DAYS * 86400
+    try:
+        await archive.create_index("archived_at", expireAfterSeconds=ttl)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        # The TTL changed since the index was created: update it in place
+        await get_db().command("collMod", ARCHIVE_COLL, index={"keyPattern": {"archived_at": 1}, "expireAfterSeconds": ttl})
+        logger.info(f"Archive TTL updated to {QUEUE_ARCHIVE_TTL_DAYS} days.")
+
+
+async def archive_batch(batch_size: int = QUEUE_ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Moves up to `batch_size` terminal items to the archive: one bulk_write of
+    upserts, then one guarded delete_many. Items that stopped being terminal in
+    between (e.g. a DLQ item re-queued) stay live and their copy is dropped.
+    Returns the number of items moved.
+    """
+    live = collection(QUEUE_COLL)
+    archive = collection(ARCHIVE_COLL)
+    now = datetime.now(timezone.utc)
+    terminal = _terminal_filter(now)
+
+    docs = await live.find(terminal).limit(batch_size).to_list(length=batch_size)
+    if not docs:
+        return 0
+    ids = [d["_id"] for d in docs]
+    # archived_at is a BSON date so the TTL index can expire it
+    await archive.bulk_write(
+        [ReplaceOne({"_id": d["_id"]}, {**d, "archived_at": now}, upsert=True) for d in docs],
+        ordered=False,
+    )
+    result = await live.delete_many({"$and": [{"_id": {"$in": ids}}, terminal]})
+
+    if result.deleted_count < len(ids):
+        still_live = [d["_id"] async for d in live.find({"_id": {"$in": ids}}, {"_id": 1})]
+        if still_live:
+            await archive.delete_many({"_id": {"$in": still_live}})
+    return result.deleted_count
+
+
+async def compact(batch_size: int = QUEUE_ARCHIVE_BATCH_SIZE) -> int:
+    """Archives batches until no terminal items are left; returns the total moved."""
+    total = 0
+    while True:
+        moved = await archive_batch(batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+    if total:
+        logger.info(f"Archived {total} terminal items from {QUEUE_COLL} to {ARCHIVE_COLL}.")
+    return total
+
+
+async def run(interval: int = QUEUE_ARCHIVE_INTERVAL) -> None:
+    """Compacts every `interval` seconds until cancelled; errors are logged and retried."""
+    try:
+        await ensure_archive_indexes()
+    except Exception as e:
+        logger.warning(f"Failed to ensure archive indexes: {e}")
+    while True:
+        try:
+            await compact()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Queue compaction failed: {e}. Retrying in {interval}s.")
+        await asyncio.sleep(interval)
+
+
+async def main():
+    await connect_db()
+    try:
+        await ensure_archive_indexes()
+        await compact()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
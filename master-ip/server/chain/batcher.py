@@ -3,16 +3,38 @@ import os
 import signal # For shutdown
 from datetime import datetime, timezone
 import time # For timing
+from typing import Optional, Tuple
 
 from chain.utils import get_logger, utc_now_iso, sleep
-from chain.queue import fetch_one_and_lock, mark_done, mark_failed
-from chain.web3_client import anchor_hash_on_chain, is_anchored
+from chain.queue import (
+    QUEUE_COLL, ensure_queue_indexes, count_claimable, lease_batch, extend_lease, release_lease, complete_many, fail_many,
+    record_merkle_pending, record_merkle_tx, queue_summary,
+)
+from chain.wakeup import QueueWakeup
+from chain.worker import WORKER_ID, WorkerStats
+from chain.indexer import get_indexer, ensure_indexes, normalize_hash
+from chain import archive
+from chain.metrics import (
+    start_metrics_server, refresh_every, observe_gas, ITEM_TRIES, CREATE_TO_ANCHOR, QUEUE_DEPTH, QUEUE_OLDEST_AGE,
+    BATCHER_LEASE_SIZE, BATCHER_IN_FLIGHT_LIMIT, BATCHER_LEASE_PAUSE, ADAPTIVE_DECISIONS,
+)
+from chain.web3_client import (
+    submit_anchor, submit_anchor_root, confirm_tx, mined_tx_hash, is_anchored, get_receipt_tracker, get_rpc_pool, get_signer_pool, close_chain_client,
+    anchor_batch_on_chain, anchored_in_receipt, has_batch_functions, is_anchored_many, receipt_gas_used,
+    is_root_anchored, lookup_anchors_batch,
+)
+from chain.merkle import build_tree
 # --- FIX: Import connect_db and close_db ---
-from app.db.mongodb import collection, connect_db, close_db
+from app.db.mongodb import connect_db, close_db
 # --- END FIX ---
 from app.constant import ( # Make sure to import from constants (plural)
     BATCH_LIMIT, MAX_RETRIES,
-    ACTIVE_POLL_INTERVAL, IDLE_POLL_INTERVAL, IDLE_THRESHOLD_MINUTES
+    ACTIVE_POLL_INTERVAL, IDLE_POLL_INTERVAL, IDLE_THRESHOLD_MINUTES,
+    ANCHOR_MODE, MERKLE_BATCH_SIZE,
+    BATCHER_CONCURRENCY, BATCHER_DRAIN_TIMEOUT, VISIBILITY_TIMEOUT_SECONDS, ANCHOR_BATCH_MAX,
+    BATCHER_METRICS_PORT, METRICS_REFRESH_INTERVAL, QUEUE_ARCHIVE_INTERVAL, MAX_IN_FLIGHT_TXS,
+    ADAPTIVE_BATCHING, BATCH_LIMIT_MIN, BATCH_LIMIT_MAX, BATCHER_CONCURRENCY_MIN, BATCHER_CONCURRENCY_MAX,
+    LEASE_PAUSE_MAX_SECONDS, ADAPTIVE_TARGET_LATENCY_SECONDS, ADAPTIVE_MAX_ERROR_RATE,
 )
 
 logger = get_logger("chain.batcher")
@@ -20,96 +42,642 @@ logger = get_logger("chain.batcher")
 # --- Global flag for graceful shutdown ---
 shutdown_requested = False
 main_task = None
+wakeup = None
+
+stats = WorkerStats()
+
+
+# --- Adaptive lease size, in-flight txs and poll cadence ---
+
+class AdjustableSlots:
+    """Semaphore whose limit can change at runtime; shrinking lets current holders finish."""
+
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self.active = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    async def resize(self, limit: int) -> None:
+        async with self._cond:
+            self.limit = max(limit, 1)
+            self._cond.notify_all()
+
+
+# Bounds how many anchoring txs of a lease (per-item anchor() or anchorBatch chunks) are in flight at once
+_item_slots = AdjustableSlots(BATCHER_CONCURRENCY)
+
+LATENCY_SAMPLE = 20       # confirmations the latency signal is the median of
+ERROR_EWMA_ALPHA = 0.3    # weight of the latest lease in the failure rate
+
+
+def _clamp(value, low, high):
+    return max(low, min(value, high))
+
+
+class AdaptiveController:
+    """
+    AIMD on three knobs, re-evaluated after every single-mode lease:
+      * congested (median confirmation latency of the last LATENCY_SAMPLE txs
+        above ADAPTIVE_TARGET_LATENCY_SECONDS, or the lease failure rate above
+        ADAPTIVE_MAX_ERROR_RATE): halve lease size and in-flight txs, double
+        the pause between leases;
+      * healthy with a backlog (more claimable items than one lease): lease
+        size +25% (at least +1), one more tx in flight, pause halved;
+      * otherwise: a pause raised by congestion is halved back towards 1s.
+    Everything stays within the BATCH_LIMIT_* / BATCHER_CONCURRENCY_* /
+    LEASE_PAUSE_MAX_SECONDS bounds; in-flight txs are also capped by what
+    the signer pool can hold (signers x MAX_IN_FLIGHT_TXS). Every change is
+    logged with the signals behind it. With ADAPTIVE_BATCHING=off the static
+    BATCH_LIMIT / BATCHER_CONCURRENCY are used.
+
+    The pause is the poll cadence while there is work. The empty-queue polls
+    (ACTIVE_POLL_INTERVAL / IDLE_POLL_INTERVAL) stay fixed on purpose: with
+    nothing leased there is no latency or error signal to adapt to, and queue
+    wakeups already cut those sleeps short when an item arrives.
+    """
+
+    def __init__(self, enabled: bool = ADAPTIVE_BATCHING):
+        self.enabled = enabled
+        self.lease_size = _clamp(BATCH_LIMIT, BATCH_LIMIT_MIN, BATCH_LIMIT_MAX) if enabled else BATCH_LIMIT
+        self.in_flight = BATCHER_CONCURRENCY
+        self.pause = 1.0
+        self.error_rate = 0.0
+        self._publish()
+
+    def _max_in_flight(self) -> int:
+        return max(min(BATCHER_CONCURRENCY_MAX, len(get_signer_pool().signers) * MAX_IN_FLIGHT_TXS), BATCHER_CONCURRENCY_MIN)
+
+    def _publish(self) -> None:
+        BATCHER_LEASE_SIZE.set(self.lease_size)
+        BATCHER_IN_FLIGHT_LIMIT.set(self.in_flight)
+        BATCHER_LEASE_PAUSE.set(self.pause)
+
+    def _latency(self) -> Optional[float]:
+        recent = list(get_receipt_tracker().latencies)[-LATENCY_SAMPLE:]
+        return sorted(recent)[len(recent) // 2] if recent else None
+
+    async def update(self, leased: int, failed: int) -> None:
+        """Feeds one lease's outcome and applies the resulting decision."""
+        if not self.enabled or leased == 0:
+            return
+        self.error_rate = ERROR_EWMA_ALPHA * (failed / leased) + (1 - ERROR_EWMA_ALPHA) * self.error_rate
+        latency = self._latency()
+        try:
+            # Capped count: only "more than a lease" matters
+            depth = await count_claimable(limit=BATCH_LIMIT_MAX * 10)
+        except Exception as e:
+            logger.warning(f"Adaptive controller could not read queue depth: {e}")
+            depth = None
+
+        congested = []
+        if latency is not None and latency > ADAPTIVE_TARGET_LATENCY_SECONDS:
+            congested.append(f"latency p50 {latency:.1f}s > {ADAPTIVE_TARGET_LATENCY_SECONDS:g}s")
+        if self.error_rate > ADAPTIVE_MAX_ERROR_RATE:
+            congested.append(f"error rate {self.error_rate:.0%} > {ADAPTIVE_MAX_ERROR_RATE:.0%}")
+
+        lease_size, in_flight, pause = self.lease_size, self.in_flight, self.pause
+        if congested:
+            action, reason = "decrease", "; ".join(congested)
+            lease_size = lease_size // 2
+            in_flight = in_flight // 2
+            pause = max(pause * 2, 1.0)
+        elif depth is not None and depth > lease_size:
+            action, reason = "increase", f"backlog {depth} > lease {lease_size}"
+            lease_size = lease_size + max(1, lease_size // 4)
+            in_flight = in_flight + 1
+            pause = pause / 2 if pause >= 0.2 else 0.0
+        elif pause > 1.0:
+            action, reason = "relax", "healthy, no backlog"
+            pause = max(pause / 2, 1.0)
+        else:
+            action, reason = "hold", "healthy, no backlog"
+        lease_size = _clamp(lease_size, BATCH_LIMIT_MIN, BATCH_LIMIT_MAX)
+        in_flight = _clamp(in_flight, BATCHER_CONCURRENCY_MIN, self._max_in_flight())
+        pause = _clamp(pause, 0.0, LEASE_PAUSE_MAX_SECONDS)
+        ADAPTIVE_DECISIONS.inc(action=action)
+
+        if (lease_size, in_flight, pause) == (self.lease_size, self.in_flight, self.pause):
+            return
+        logger.info(
+            f"Adaptive {action} ({reason}): lease {self.lease_size}->{lease_size}, "
+            f"in-flight {self.in_flight}->{in_flight}, pause {self.pause:.1f}s->{pause:.1f}s | "
+            f"latency p50 {'n/a' if latency is None else f'{latency:.1f}s'}, "
+            f"error rate {self.error_rate:.0%}, depth {'n/a' if depth is None else depth}"
+        )
+        self.lease_size, self.in_flight, self.pause = lease_size, in_flight, pause
+        await _item_slots.resize(in_flight)
+        self._publish()
 
-async def process_item(it: dict):
-    """Processes a single locked queue item."""
+
+controller: Optional[AdaptiveController] = None
+
+async def process_item(it: dict, anchored: Optional[dict] = None) -> dict:
+    """
+    Processes a single leased queue item and returns its outcome without
+    writing it: {"done": {...}} for complete_many, {"failed": {...}} for
+    fail_many, or {"lost": public_id} if the lease expired before broadcast.
+    The batch records all outcomes in bulk.
+
+    `anchored` is the lease's lookup in the HashAnchored index
+    ({public_hash: record}); None if the index was unavailable, in which case
+    the item falls back to its own isAnchored call.
+    """
     public_id = it["public_id"]
     public_hash = it["public_hash"]
-    attempt = it.get("tries", 0) # fetch_one_and_lock already incremented
+    attempt = it.get("tries", 0) # lease_batch already incremented
     logger.info(f"[Attempt {attempt}/{MAX_RETRIES}] Processing item {public_id}...")
 
     try:
-        # --- 1. Idempotency Check ---
-        already_anchored, anchor_ts = await asyncio.to_thread(is_anchored, public_hash)
+        # --- 1. Idempotency Check (local event index, per-item RPC only as fallback) ---
+        if anchored is not None:
+            record = anchored.get(normalize_hash(public_hash))
+            already_anchored = record is not None
+            anchor_ts = record["timestamp"] if record else 0
+        else:
+            record = None
+            already_anchored, anchor_ts = await is_anchored(public_hash)
         if already_anchored:
-            logger.warning(f"Item {public_id} (hash {public_hash[:10]}...) already anchored. Marking done.")
-            anchor_time_iso = datetime.fromtimestamp(anchor_ts, timezone.utc).isoformat() if anchor_ts > 0 else utc_now_iso()
-            await mark_done(public_id, "N/A (already anchored)", anchor_time_iso)
-            await collection("craftids").update_one(
-                 {"public_id": public_id, "status": {"$ne": "anchored"}},
-                 {"$set": {"status": "anchored", "tx_hash": "N/A (already anchored)", "anchored_at": anchor_time_iso}}
-            )
-            return
+            return _already_anchored(it, anchor_ts, (record or {}).get("tx_hash"))
 
-        # --- 2. Anchor Transaction ---
+        # --- 2. Re-assert lease ownership right before broadcasting ---
+        # Another worker can only lease the item after our lease expires; renewing
+        # it atomically here guarantees nobody else anchors this hash meanwhile.
+        if not await extend_lease(it["lease_token"], public_id):
+            logger.warning(f"Lease on {public_id} lost before broadcast; leaving it to its new owner.")
+            return {"lost": public_id}
+
+        # --- 2b. Broadcast (nonce from the local nonce manager; returns immediately) ---
         logger.info(f"Anchoring hash {public_hash[:10]}... for {public_id} on-chain...")
-        tx_hash = await asyncio.to_thread(anchor_hash_on_chain, public_hash, public_id, True)
-        anchored_at = utc_now_iso()
-
-        # --- 3. Mark as Done ---
-        await mark_done(public_id, tx_hash, anchored_at)
-        await collection("craftids").update_one(
-            {"public_id": public_id},
-            {"$set": {"status": "anchored", "tx_hash": tx_hash, "anchored_at": anchored_at}}
-        )
+        tx_hash = await submit_anchor(public_hash, public_id)
+
+        # --- 2c. Confirm (other items of the lease are broadcast meanwhile) ---
+        receipt = await confirm_tx(tx_hash)
+        tx_hash = mined_tx_hash(receipt, tx_hash)
         logger.info(f"✅ Anchored {public_id} | tx: {tx_hash[:10]}...")
+        return {"done": {"public_id": public_id, "tx_hash": tx_hash, "anchored_at": utc_now_iso(), "gas_used": _gas_share(receipt, 1, "single")}}
 
-    # --- 4. Specific Error Handling ---
+    # --- 3. Specific Error Handling ---
     except ValueError as ve:
+         # e.g. the gas estimate reverted with "Hash already anchored": another tx won since the lookup
+         try:
+             already_anchored, anchor_ts = await is_anchored(public_hash)
+         except Exception:
+             already_anchored, anchor_ts = False, 0
+         if already_anchored:
+             return _already_anchored(it, anchor_ts)
          logger.error(f"❌ Permanent failure for {public_id}: {ve}. Moving to 'failed' state.")
-         await mark_failed(public_id, f"Permanent failure: {ve}", is_permanent=True)
-         await collection("craftids").update_one(
-             {"public_id": public_id},
-             {"$set": {"status": "failed", "last_error": f"Permanent failure: {ve}"}}
-         )
+         return {"failed": {"public_id": public_id, "reason": f"Permanent failure: {ve}", "is_permanent": True}}
     except TimeoutError as te:
          logger.error(f"❌ Receipt timeout for {public_id}: {te}. Will retry.")
-         await mark_failed(public_id, f"Receipt timeout: {te}")
+         return {"failed": {"public_id": public_id, "reason": f"Receipt timeout: {te}"}}
     except Exception as e:
          logger.error(f"❌ Temporary failure for {public_id}: {e}. Will retry.")
-         await mark_failed(public_id, str(e))
+         return {"failed": {"public_id": public_id, "reason": str(e)}}
 
 
-async def process_batch(limit=BATCH_LIMIT):
-    """Fetches and processes items up to the limit."""
-    processed_count = 0
-    for _ in range(limit):
-        if shutdown_requested:
-             logger.info("Shutdown requested, stopping batch processing.")
-             break
+def _gas_share(receipt, items: int, mode: str) -> Optional[int]:
+    """
+    Records the tx's gas metrics and returns each item's share of its gasUsed
+    (stored on the queue item for /queue/summary).
+    """
+    gas_used = receipt_gas_used(receipt)
+    observe_gas(gas_used, items, mode)
+    return round(gas_used / max(items, 1)) if gas_used is not None else None
 
-        item = await fetch_one_and_lock()
 
-        if not item:
-            break
+def _already_anchored(it: dict, anchor_ts: int, tx_hash: Optional[str] = None) -> dict:
+    logger.warning(f"Item {it['public_id']} (hash {it['public_hash'][:10]}...) already anchored. Marking done.")
+    anchor_time_iso = datetime.fromtimestamp(anchor_ts, timezone.utc).isoformat() if anchor_ts > 0 else utc_now_iso()
+    return {"done": {"public_id": it["public_id"], "tx_hash": tx_hash or "N/A (already anchored)", "anchored_at": anchor_time_iso}}
+
+
+async def _anchor_chunk(chunk: list) -> list:
+    """One anchorBatch tx for up to ANCHOR_BATCH_MAX items; returns their outcomes."""
+    try:
+        tx_hash, receipt = await anchor_batch_on_chain([it["public_hash"] for it in chunk], [it["public_id"] for it in chunk])
+    except ValueError as ve:
+        logger.error(f"❌ Permanent failure anchoring batch of {len(chunk)}: {ve}. Moving to 'failed' state.")
+        return [{"failed": {"public_id": it["public_id"], "reason": f"Permanent failure: {ve}", "is_permanent": True}} for it in chunk]
+    except TimeoutError as te:
+        logger.error(f"❌ Receipt timeout for batch of {len(chunk)}: {te}. Will retry.")
+        return [{"failed": {"public_id": it["public_id"], "reason": f"Receipt timeout: {te}"}} for it in chunk]
+    except Exception as e:
+        logger.error(f"❌ Temporary failure for batch of {len(chunk)}: {e}. Will retry.")
+        return [{"failed": {"public_id": it["public_id"], "reason": str(e)}} for it in chunk]
+
+    ours = set(anchored_in_receipt(receipt))
+    gas_used = _gas_share(receipt, len(ours), "batch")
+    anchored_at = utc_now_iso()
+    outcomes = []
+    for it in chunk:
+        if normalize_hash(it["public_hash"]) in ours:
+            outcomes.append({"done": {"public_id": it["public_id"], "tx_hash": tx_hash, "anchored_at": anchored_at, "gas_used": gas_used}})
+        else:
+            # Skipped by the contract: anchored by another tx since the index lookup
+            outcomes.append(_already_anchored(it, 0))
+    logger.info(f"✅ Anchored {len(ours)}/{len(chunk)} items in one anchorBatch | tx: {tx_hash[:10]}...")
+    return outcomes
+
 
+async def _anchor_chunk_bounded(chunk: list) -> list:
+    async with _item_slots:
+        return await _anchor_chunk(chunk)
+
+
+async def process_anchor_batch(items: list, anchored: Optional[dict]) -> list:
+    """
+    Single mode with the contract's batch functions: the lease's items that are
+    not on-chain yet go out as anchorBatch txs of up to ANCHOR_BATCH_MAX hashes
+    (sent concurrently) instead of one anchor() tx each. Returns one outcome
+    per item, in process_item's format.
+    """
+    if anchored is None:
+        # Index unavailable: one per-lease lookup still beats an isAnchored per item
+        hashes = [it["public_hash"] for it in items]
+        anchored = {
+            normalize_hash(h): {"timestamp": ts}
+            for h, (ok, ts) in zip(hashes, await is_anchored_many(hashes)) if ok
+        }
+
+    outcomes = {}
+    to_anchor = []
+    for it in items:
+        record = anchored.get(normalize_hash(it.get("public_hash")))
+        if record is not None:
+            outcomes[it["public_id"]] = _already_anchored(it, record.get("timestamp") or 0, record.get("tx_hash"))
+        elif not _is_valid_leaf(it.get("public_hash")):
+            reason = "Permanent failure: invalid public_hash"
+            logger.error(f"❌ {reason} ({it['public_id']}). Moving to 'failed' state.")
+            outcomes[it["public_id"]] = {"failed": {"public_id": it["public_id"], "reason": reason, "is_permanent": True}}
+        else:
+            to_anchor.append(it)
+
+    if to_anchor:
+        # Re-assert ownership of the whole lease before broadcasting
+        lease_token = items[0].get("lease_token")
+        if await extend_lease(lease_token) < len(items):
+            logger.warning(f"Lease {lease_token} partially lost before broadcast; leaving its items to their new owner.")
+            for it in to_anchor:
+                outcomes[it["public_id"]] = {"lost": it["public_id"]}
+        else:
+            chunks = [to_anchor[i:i + ANCHOR_BATCH_MAX] for i in range(0, len(to_anchor), ANCHOR_BATCH_MAX)]
+            logger.info(f"Anchoring {len(to_anchor)} items in {len(chunks)} anchorBatch tx(s)...")
+            for chunk, chunk_outcomes in zip(chunks, await asyncio.gather(*(_anchor_chunk_bounded(c) for c in chunks))):
+                for it, outcome in zip(chunk, chunk_outcomes):
+                    outcomes[it["public_id"]] = outcome
+    return [outcomes[it["public_id"]] for it in items]
+
+
+async def lease_items(limit: int) -> list:
+    """Leases up to `limit` queue items for this batcher in one lease."""
+    if shutdown_requested:
+        logger.info("Shutdown requested, not leasing.")
+        return []
+    return await lease_batch(limit, worker_id=WORKER_ID)
+
+
+async def _keep_lease_alive(lease_token: str) -> None:
+    """Heartbeat: extends the lease while its items are still being confirmed."""
+    while True:
+        await asyncio.sleep(max(VISIBILITY_TIMEOUT_SECONDS / 3, 1))
         try:
-             await process_item(item)
-             processed_count += 1
+            await extend_lease(lease_token)
         except Exception as e:
-             public_id = item.get("public_id", "UNKNOWN")
-             logger.error(f"CRITICAL: Unhandled exception during process_item for {public_id}: {e}")
-             try:
-                 await mark_failed(public_id, f"Unhandled exception: {e}", is_permanent=True)
-             except Exception as mark_e:
-                 logger.error(f"Failed to even mark {public_id} as failed: {mark_e}")
+            logger.warning(f"Failed to extend lease {lease_token}: {e}")
+
+
+async def _process_item_bounded(it: dict, anchored: Optional[dict]) -> dict:
+    async with _item_slots:
+        return await process_item(it, anchored)
+
+
+async def _use_batch_calls() -> bool:
+    try:
+        return await has_batch_functions()
+    except Exception as e:
+        logger.warning(f"Could not probe the contract for batch functions ({e}); anchoring per item.")
+        return False
+
+
+async def lookup_anchored(items: list) -> Optional[dict]:
+    """Which of the lease's hashes are already on-chain, from the event index. None if unavailable."""
+    try:
+        return await get_indexer().lookup([it.get("public_hash") for it in items])
+    except Exception as e:
+        logger.warning(f"Anchor index lookup failed ({e}); checking items individually.")
+        return None
+
+
+def _observe_anchored(items: list, done: list) -> None:
+    """Tries and enqueue->anchor latency of the lease's anchored items."""
+    by_id = {it["public_id"]: it for it in items}
+    now = datetime.now(timezone.utc)
+    for d in done:
+        it = by_id.get(d["public_id"])
+        if not it:
+            continue
+        ITEM_TRIES.observe(it.get("tries") or 1)
+        try:
+            CREATE_TO_ANCHOR.observe((now - datetime.fromisoformat(it["created_at"])).total_seconds())
+        except (KeyError, TypeError, ValueError):
+            pass
+
+
+async def record_outcomes(lease_token, done: list, failed: list, items: Optional[list] = None) -> None:
+    """Writes a lease's outcomes (one bulk_write per collection), then renders the final certificates."""
+    # Imported here: certificates pull in PIL and qrcode, which the batcher only needs once something is anchored
+    from app.utils.certificates import render_anchored_certificate
+
+    await fail_many(lease_token, failed)
+    await complete_many(lease_token, done)
+    stats.record(len(done) + len(failed), len(done), len(failed))
+    if items:
+        _observe_anchored(items, done)
+    for d in done:
+        try:
+            await render_anchored_certificate(d["public_id"])
+        except Exception as e:
+            logger.warning(f"Failed to render certificate for {d['public_id']}: {e}")
+
+
+async def process_batch(limit: Optional[int] = None):
+    """
+    Leases up to `limit` items (default: the adaptive controller's lease size)
+    and processes up to its in-flight limit of them at once: broadcasts go out
+    back to back (bounded by MAX_IN_FLIGHT_TXS) while earlier ones confirm.
+    Leases of several items go out as anchorBatch txs instead when the
+    contract has the batch functions. The lease is kept alive until all are
+    recorded; its outcome then feeds the controller.
+    """
+    items = await lease_items(limit or (controller.lease_size if controller else BATCH_LIMIT))
+    if not items:
+        return 0
+    lease_token = items[0].get("lease_token")
+
+    heartbeat = asyncio.create_task(_keep_lease_alive(lease_token))
+    try:
+        anchored = await lookup_anchored(items)
+        if len(items) > 1 and await _use_batch_calls():
+            try:
+                results = await process_anchor_batch(items, anchored)
+            except Exception as e:
+                logger.error(f"❌ Temporary failure for lease {lease_token}: {e}. Will retry.")
+                results = [{"failed": {"public_id": it["public_id"], "reason": str(e)}} for it in items]
+        else:
+            results = await asyncio.gather(*(_process_item_bounded(it, anchored) for it in items), return_exceptions=True)
+    finally:
+        heartbeat.cancel()
+    done, failed = [], []
+    for it, res in zip(items, results):
+        if isinstance(res, BaseException):
+            public_id = it.get("public_id", "UNKNOWN")
+            logger.error(f"CRITICAL: Unhandled exception during process_item for {public_id}: {res}")
+            failed.append({"public_id": public_id, "reason": f"Unhandled exception: {res}", "is_permanent": True})
+        elif "done" in res:
+            done.append(res["done"])
+        elif "failed" in res:
+            failed.append(res["failed"])
+
+    try:
+        await record_outcomes(lease_token, done, failed, items)
+    except Exception as e:
+        # Items stay leased; they become eligible again once the visibility timeout expires
+        logger.error(f"CRITICAL: Failed to record outcomes of lease {lease_token}: {e}")
+    _log_confirmation_latency()
+    if controller:
+        await controller.update(len(items), len(failed))
+    return len(items)
+
+
+def _log_confirmation_latency():
+    stats = get_receipt_tracker().latency_stats()
+    if stats["count"]:
+        logger.info(
+            f"Confirmation latency over last {stats['count']} txs: "
+            f"p50 {stats['p50']:.1f}s | p95 {stats['p95']:.1f}s | max {stats['max']:.1f}s"
+        )
+
+def _is_valid_leaf(public_hash) -> bool:
+    try:
+        h = public_hash[2:] if public_hash.startswith("0x") else public_hash
+        return len(bytes.fromhex(h)) == 32
+    except (AttributeError, ValueError):
+        return False
+
+
+ALREADY_ANCHORED = "N/A (already anchored)"
+
+
+def _merkle_done(it: dict, merkle: dict, tx_hash: Optional[str], anchored_at: str, gas_used=None) -> dict:
+    position = {k: merkle[k] for k in ("root", "proof", "leaf_index", "leaf_count")}
+    return {
+        "public_id": it["public_id"],
+        "tx_hash": tx_hash or merkle.get("tx_hash") or ALREADY_ANCHORED,
+        "anchored_at": anchored_at,
+        "gas_used": gas_used,
+        "craftid": {"anchor_mode": "merkle", "merkle": position},
+    }
+
+
+async def _recover_merkle(items: list) -> Tuple[list, list]:
+    """
+    Items re-leased after their root was broadcast carry that root's position
+    (record_merkle_pending). Returns (done entries for items whose root is
+    on-chain, items that still need a root).
+    """
+    roots = sorted({it["merkle"]["root"] for it in items if (it.get("merkle") or {}).get("root")})
+    if not roots:
+        return [], items
+    try:
+        _, results = await lookup_anchors_batch([], roots)
+    except Exception as e:
+        logger.warning(f"Could not check previously broadcast roots ({e}); rebuilding them.")
+        return [], items
+    anchored_roots = {r for r, (anchored, _) in zip(roots, results) if anchored}
+    anchored_at = utc_now_iso()
+    done, rest = [], []
+    for it in items:
+        merkle = it.get("merkle") or {}
+        if merkle.get("root") in anchored_roots:
+            done.append(_merkle_done(it, merkle, None, anchored_at))
+        else:
+            rest.append(it)
+    if done:
+        logger.info(f"Recovered {len(done)} items whose Merkle root was anchored by an earlier attempt.")
+    return done, rest
+
+
+async def _root_on_chain(root: str) -> bool:
+    try:
+        anchored, _ = await is_root_anchored(root)
+        return anchored
+    except Exception as e:
+        logger.warning(f"isRootAnchored({root[:10]}...) failed: {e}")
+        return False
+
+
+async def process_merkle_batch(limit=MERKLE_BATCH_SIZE):
+    """
+    Merkle mode: leases up to `limit` items, anchors only the SHA-256 Merkle root
+    of their hashes in a single anchorRoot() tx and stores each item's inclusion
+    proof on its craftid. No per-item isAnchored check is needed: re-including an
+    already anchored hash in a later root is harmless.
+    Each leaf's position is stored on its queue item before the broadcast, and
+    the root is checked with isRootAnchored before sending (and again if the
+    send reverts), so a re-lease after a receipt timeout records the proofs of
+    a root that did make it on-chain instead of failing on "already anchored".
+    """
+    items = await lease_items(limit)
+    if not items:
+        return 0
+    lease_token = items[0].get("lease_token")
+
+    recovered, pending = await _recover_merkle(items)
+    leaves = []
+    invalid = []
+    for it in pending:
+        if _is_valid_leaf(it.get("public_hash")):
+            leaves.append(it)
+        else:
+            reason = "Permanent failure: invalid public_hash for Merkle leaf"
+            logger.error(f"❌ {reason} ({it['public_id']}). Moving to 'failed' state.")
+            invalid.append({"public_id": it["public_id"], "reason": reason, "is_permanent": True})
+    if not leaves:
+        await record_outcomes(lease_token, recovered, invalid, items)
+        return len(items)
+
+    root, proofs = build_tree([it["public_hash"] for it in leaves])
+    positions = [
+        {"root": root, "proof": proof, "leaf_index": idx, "leaf_count": len(leaves)}
+        for idx, proof in enumerate(proofs)
+    ]
+
+    # Re-assert ownership of the whole lease before broadcasting the root
+    if await extend_lease(lease_token) < len(items):
+        released = await release_lease(lease_token)
+        logger.warning(f"Lease {lease_token} partially lost before broadcast; released {released} items still held.")
+        return 0
+
+    anchored_at = utc_now_iso()
+    if await _root_on_chain(root):
+        logger.info(f"Merkle root {root[:10]}... is already anchored; recording {len(leaves)} items.")
+        done = [_merkle_done(it, pos, None, anchored_at) for it, pos in zip(leaves, positions)]
+        await record_outcomes(lease_token, recovered + done, invalid, items)
+        return len(items)
+
+    await record_merkle_pending(lease_token, [{"public_id": it["public_id"], "merkle": pos} for it, pos in zip(leaves, positions)])
+    logger.info(f"Anchoring Merkle root {root[:10]}... for {len(leaves)} items on-chain...")
+
+    heartbeat = asyncio.create_task(_keep_lease_alive(lease_token))
+    try:
+        tx_hash = await submit_anchor_root(root, len(leaves))
+        try:
+            await record_merkle_tx(lease_token, root, tx_hash)
+        except Exception as e:
+            logger.warning(f"Failed to record tx {tx_hash[:10]}... for root {root[:10]}...: {e}")
+        receipt = await confirm_tx(tx_hash)
+        tx_hash = mined_tx_hash(receipt, tx_hash)
+    except ValueError as ve:
+        if await _root_on_chain(root):
+            # e.g. "Root already anchored": an earlier broadcast of the same root was mined
+            logger.info(f"Merkle root {root[:10]}... anchored by an earlier tx ({ve}); recording {len(leaves)} items.")
+            done = [_merkle_done(it, pos, None, anchored_at) for it, pos in zip(leaves, positions)]
+            await record_outcomes(lease_token, recovered + done, invalid, items)
+            return len(items)
+        logger.error(f"❌ Permanent failure anchoring root {root[:10]}...: {ve}. Moving batch to 'failed' state.")
+        failed = [{"public_id": it["public_id"], "reason": f"Permanent failure: {ve}", "is_permanent": True} for it in leaves]
+        await record_outcomes(lease_token, recovered, invalid + failed, items)
+        return len(items)
+    except TimeoutError as te:
+        logger.error(f"❌ Receipt timeout for root {root[:10]}...: {te}. Will retry batch.")
+        failed = [{"public_id": it["public_id"], "reason": f"Receipt timeout: {te}"} for it in leaves]
+        await record_outcomes(lease_token, recovered, invalid + failed, items)
+        return len(items)
+    except Exception as e:
+        logger.error(f"❌ Temporary failure for root {root[:10]}...: {e}. Will retry batch.")
+        failed = [{"public_id": it["public_id"], "reason": str(e)} for it in leaves]
+        await record_outcomes(lease_token, recovered, invalid + failed, items)
+        return len(items)
+    finally:
+        heartbeat.cancel()
+
+    gas_used = _gas_share(receipt, len(leaves), "merkle")
+    anchored_at = utc_now_iso()
+    done = [_merkle_done(it, pos, tx_hash, anchored_at, gas_used) for it, pos in zip(leaves, positions)]
+    await record_outcomes(lease_token, recovered + done, invalid, items)
+
+    logger.info(f"✅ Anchored Merkle root {root[:10]}... ({len(leaves)} items) | tx: {tx_hash[:10]}...")
+    _log_confirmation_latency()
+    return len(items)
+
+
+async def refresh_queue_gauges() -> None:
+    """Queue depth / oldest queued age gauges, from the same aggregation as /queue/summary."""
+    summary = await queue_summary()
+    QUEUE_DEPTH.clear()
+    for status, row in summary["by_status"].items():
+        QUEUE_DEPTH.set(row["count"], status=status)
+    QUEUE_OLDEST_AGE.set((summary["by_status"].get("queued") or {}).get("oldest_age_seconds") or 0)
 
-    return processed_count
 
 async def run_loop():
-    """Main batcher loop with variable polling and graceful shutdown."""
+    """
+    Main batcher loop with graceful shutdown. Sleeps between empty polls are cut
+    short by a queue wakeup (change stream or local enqueue trigger); the
+    variable polling interval remains as a fallback.
+    """
     # --- FIX: Connection handled by main() ---
     # No connection logic needed here anymore
     # --- END FIX ---
+    global wakeup, controller
 
     last_processed_time = time.monotonic()
     current_poll_interval = ACTIVE_POLL_INTERVAL
     is_idle = False
     logger.info(f"Watching queue. Active poll: {ACTIVE_POLL_INTERVAL}s, Idle poll: {IDLE_POLL_INTERVAL}s after {IDLE_THRESHOLD_MINUTES}min inactivity.")
+    logger.info(f"Anchor mode: {ANCHOR_MODE}" + (f" (up to {MERKLE_BATCH_SIZE} items per root)" if ANCHOR_MODE == "merkle" else ""))
+    controller = AdaptiveController()
+    if controller.enabled and ANCHOR_MODE != "merkle":
+        logger.info(
+            f"Worker {WORKER_ID}: adaptive leases of {BATCH_LIMIT_MIN}-{BATCH_LIMIT_MAX} items, "
+            f"{BATCHER_CONCURRENCY_MIN}-{controller._max_in_flight()} txs in flight (starting at {controller.lease_size} / {controller.in_flight})."
+        )
+    else:
+        logger.info(f"Worker {WORKER_ID}: up to {BATCHER_CONCURRENCY} items in flight per lease.")
+    logger.info(f"Anchoring with {len(get_signer_pool().signers)} signer(s).")
+
+    wakeup = QueueWakeup(QUEUE_COLL)
+    await wakeup.start()
+    try:
+        await ensure_indexes()
+        await ensure_queue_indexes()
+    except Exception as e:
+        logger.warning(f"Failed to ensure queue indexes: {e}")
+    background = [asyncio.create_task(get_indexer().run())]
+    if QUEUE_ARCHIVE_INTERVAL > 0:
+        # Moves anchored / old failed items to the archive so leasing scans stay small
+        background.append(asyncio.create_task(archive.run(QUEUE_ARCHIVE_INTERVAL)))
+    metrics_server = await start_metrics_server(BATCHER_METRICS_PORT)
+    if metrics_server:
+        # Scrapes render cached gauges; the queue aggregation runs on this timer only
+        background.append(asyncio.create_task(refresh_every(refresh_queue_gauges, METRICS_REFRESH_INTERVAL)))
 
     while not shutdown_requested:
         try:
-            processed = await process_batch()
+            if ANCHOR_MODE == "merkle":
+                processed = await process_merkle_batch()
+            else:
+                processed = await process_batch()
 
             if processed > 0:
                 last_processed_time = time.monotonic()
@@ -117,7 +685,9 @@ async def run_loop():
                     logger.info("Processed items, switching to active polling.")
                     is_idle = False
                 current_poll_interval = ACTIVE_POLL_INTERVAL
-                await sleep(1)
+                await stats.report()
+                if not shutdown_requested and controller.pause > 0:
+                    await sleep(controller.pause)
 
             else:
                 time_since_last = time.monotonic() - last_processed_time
@@ -126,8 +696,9 @@ async def run_loop():
                     current_poll_interval = IDLE_POLL_INTERVAL
                     is_idle = True
 
-                logger.info(f"Queue empty. Sleeping for {current_poll_interval}s.")
-                await sleep(current_poll_interval)
+                logger.info(f"Queue empty. Sleeping for up to {current_poll_interval}s (or until woken).")
+                if await wakeup.wait(current_poll_interval):
+                    logger.info("Woken by new queue item.")
 
         except asyncio.CancelledError:
             logger.info("Main loop cancelled.")
@@ -137,23 +708,40 @@ async def run_loop():
             if not shutdown_requested:
                 await sleep(ACTIVE_POLL_INTERVAL)
 
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    if metrics_server:
+        metrics_server.close()
+    await wakeup.stop()
+    await stats.report(force=True)
     logger.info("Batcher loop finished.")
 
 def shutdown_handler(signum, frame):
-    """Signal handler for SIGTERM/SIGINT."""
+    """
+    Signal handler for SIGTERM/SIGINT. The first signal drains: no new leases,
+    the current lease is finished and recorded (up to BATCHER_DRAIN_TIMEOUT
+    seconds). A second signal, or the timeout, cancels immediately; unrecorded
+    items are re-leased by another worker once their visibility timeout expires.
+    """
     global shutdown_requested, main_task
     if not shutdown_requested:
-        logger.info(f"Received signal {signum}. Initiating graceful shutdown...")
+        logger.info(f"Received signal {signum}. Draining current lease (up to {BATCHER_DRAIN_TIMEOUT}s)...")
         shutdown_requested = True
+        if wakeup:
+            wakeup.notify("shutdown")
         if main_task:
-            main_task.cancel()
+            asyncio.get_running_loop().call_later(BATCHER_DRAIN_TIMEOUT, main_task.cancel)
     else:
-        logger.warning("Shutdown already requested.")
+        logger.warning("Shutdown already requested. Cancelling now.")
+        if main_task:
+            main_task.cancel()
 
 async def main():
     """Sets up signal handlers, DB connection, and runs the main loop."""
     global main_task
     logger.info("Batcher starting...")
+    get_rpc_pool()  # fails fast on missing chain settings
 
     # --- FIX: Connect to DB on startup ---
     try:
@@ -178,6 +766,7 @@ async def main():
          logger.info("Closing MongoDB connection...")
          await close_db()
          # --- END FIX ---
+         await close_chain_client()
          logger.info("Batcher shut down gracefully.")
 
 
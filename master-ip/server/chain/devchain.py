@@ -0,0 +1,120 @@
+# master-ip/server/chain/devchain.py
+"""
+Local end-to-end harness on an in-process eth-tester chain.
+
+    pip install -r chain/requirements-dev.txt
+    python -m chain.devchain
+
+Compiles contract/CraftAnchor.sol with py-solc-x, deploys it to an
+EthereumTesterProvider (WEB3_RPC_URL=eth-tester://) and runs the single and
+Merkle anchoring round trips (plus an anchorBatch one) through chain.web3_client, the same functions the
+batcher and /verify use. Must run before anything else imports web3_client.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from chain.utils import get_logger
+from chain.merkle import build_tree, verify_proof
+
+logger = get_logger("chain.devchain")
+
+CONTRACT_PATH = Path(__file__).resolve().parents[2] / "contract" / "CraftAnchor.sol"
+SOLC_VERSION = os.getenv("SOLC_VERSION", "0.8.19")
+
+
+def _prepare_env() -> str:
+    """Points web3_client at the in-process chain; returns the (empty) key file path."""
+    key_file = tempfile.NamedTemporaryFile("w", suffix=".key", delete=False)
+    key_file.close()
+    os.environ["WEB3_RPC_URL"] = "eth-tester://"
+    os.environ["ANCHOR_CONTRACT_ADDRESS"] = "0x" + "0" * 40  # replaced after deploy
+    os.environ["ANCHORER_PRIVATE_KEY"] = key_file.name
+    return key_file.name
+
+
+def ensure_solc() -> None:
+    """Downloads solc SOLC_VERSION unless it is already installed (so reruns work offline)."""
+    import solcx
+    if SOLC_VERSION not in {str(v) for v in solcx.get_installed_solc_versions()}:
+        solcx.install_solc(SOLC_VERSION)
+
+
+def compile_contract():
+    """Returns (abi, bytecode) for CraftAnchor."""
+    import solcx
+    ensure_solc()
+    out = solcx.compile_files([str(CONTRACT_PATH)], output_values=["abi", "bin"], solc_version=SOLC_VERSION)
+    iface = next(v for k, v in out.items() if k.endswith(":CraftAnchor"))
+    return iface["abi"], iface["bin"]
+
+
+async def deploy():
+    """Deploys CraftAnchor on eth-tester and wires web3_client to it. Returns the module."""
+    key_path = _prepare_env()
+    from chain import web3_client as wc
+
+    w3 = wc.WEB3
+    tester = w3.provider.ethereum_tester
+    # eth-tester's default accounts are pre-funded; the first one doubles as anchorer
+    with open(key_path, "w") as f:
+        f.write(tester.backend.account_keys[0].to_hex())
+    wc.CHAIN_ID = await w3.eth.chain_id
+
+    abi, bytecode = compile_contract()
+    factory = w3.eth.contract(abi=abi, bytecode=bytecode)
+    tx_hash = await factory.constructor().transact({"from": tester.get_accounts()[0]})
+    receipt = await w3.eth.wait_for_transaction_receipt(tx_hash)
+    wc.CONTRACT_ADDR = receipt.contractAddress
+    logger.info(f"CraftAnchor deployed on eth-tester at {wc.CONTRACT_ADDR}")
+    return wc
+
+
+async def run_roundtrip(n: int = 7) -> None:
+    """
+    Anchors one hash directly and the rest under a Merkle root, then verifies
+    both paths, then anchors a batch with anchorBatch (re-including the single
+    hash, which the contract must skip) and checks the batch views and logs.
+    """
+    wc = await deploy()
+    leaves = [hashlib.sha256(f"devchain-{i}".encode()).hexdigest() for i in range(n)]
+
+    # Single-item path
+    await wc.anchor_hash_on_chain(leaves[0], "CID-DEV-0")
+    assert (await wc.is_anchored(leaves[0]))[0], "single anchor not found on-chain"
+
+    # Merkle path: only the root goes on-chain, proofs are checked locally
+    batch = leaves[1:]
+    root, proofs = build_tree(batch)
+    tx_hash = await wc.anchor_root_on_chain(root, len(batch))
+    for leaf, proof in zip(batch, proofs):
+        assert verify_proof(leaf, proof, root), f"proof failed for {leaf[:10]}"
+    assert not verify_proof(batch[0], proofs[-1], root), "foreign proof must not verify"
+
+    hash_results, root_results = await wc.lookup_anchors_batch(leaves, [root])
+    assert hash_results[0][0], "batched isAnchored missed the single anchor"
+    assert not any(anchored for anchored, _ in hash_results[1:]), "Merkle leaves must not be anchored individually"
+    assert root_results[0][0], "Merkle root not anchored"
+    assert (await wc.get_tx_block_numbers([tx_hash]))[0] is not None, "root tx has no block number"
+
+    # anchorBatch path: already anchored hashes are skipped, not reverted
+    assert await wc.has_batch_functions(), "contract batch functions not detected"
+    fresh = [hashlib.sha256(f"devchain-batch-{i}".encode()).hexdigest() for i in range(3)]
+    batch_ids = [f"CID-DEV-B{i}" for i in range(len(fresh))]
+    tx_hash, receipt = await wc.anchor_batch_on_chain([leaves[0]] + fresh, ["CID-DEV-0"] + batch_ids)
+    assert wc.anchored_in_receipt(receipt) == fresh, "anchorBatch must anchor exactly the new hashes"
+    assert all(anchored for anchored, _ in await wc.is_anchored_many(fresh + [leaves[0]])), "isAnchoredBatch missed a hash"
+    records = await wc.get_anchor_records(fresh + [leaves[1]])
+    assert [r["public_id"] for r in records[:-1]] == batch_ids, "getAnchorRecords returned wrong ids"
+    assert not records[-1]["exists"], "Merkle leaf must have no anchor record"
+    logs = await wc.get_anchor_logs(0)
+    assert [e["public_hash"] for e in logs] == [leaves[0]] + fresh, "HashAnchored logs do not match"
+
+    await wc.close_chain_client()
+    logger.info(f"✅ eth-tester round trip OK: 1 single anchor + {len(batch)} leaves under root {root[:10]}... + {len(fresh)} via anchorBatch")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_roundtrip())
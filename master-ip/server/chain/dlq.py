@@ -0,0 +1,326 @@
+# master-ip/server/chain/dlq.py
+"""
+Dead-letter (status "failed") inspection and bulk requeue for the anchor queue.
+
+    python -m chain.dlq summary  [filters]
+    python -m chain.dlq list     [filters] [--limit N] [--cursor C] [--archive]
+    python -m chain.dlq requeue  [filters] [--rate N] [--max N] [--include-archived] [--dry-run]
+
+Filters: --error-class {permanent,timeout,unhandled,temporary}, --error TEXT
+(substring of last_error), --older-than-hours H / --newer-than-hours H (age of
+the last try), --min-tries N / --max-tries N.
+
+Requeue resets tries and leases with one update_many per chunk. With --rate N
+the chunks are released N items per second: each chunk gets a locked_until one
+second after the previous one, which lease_batch honours for queued items, so
+a recovered RPC endpoint is not hit by the whole backlog at once. Failed items
+already archived (chain/archive.py) are moved back to the live queue.
+The same functions back the /admin/queue routes.
+"""
+import argparse
+import asyncio
+import json
+import re
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReplaceOne
+
+from chain.utils import get_logger
+from chain.queue import QUEUE_COLL, ARCHIVE_COLL, lane_deadline
+from chain.wakeup import notify_local_wakeup
+from app.db.mongodb import collection, connect_db, close_db
+from app.constant import DLQ_PAGE_SIZE_MAX, DLQ_REQUEUE_CHUNK
+
+logger = get_logger("chain.dlq")
+
+# last_error prefixes written by the batcher (see chain/batcher.py)
+ERROR_CLASSES = {
+    "permanent": "^Permanent failure",
+    "timeout": "^Receipt timeout",
+    "unhandled": "^Unhandled exception",
+}
+SOURCES = {"live": QUEUE_COLL, "archive": ARCHIVE_COLL}
+
+
+def failed_filter(
+    error_class: Optional[str] = None,
+    error: Optional[str] = None,
+    older_than_hours: Optional[float] = None,
+    newer_than_hours: Optional[float] = None,
+    min_tries: Optional[int] = None,
+    max_tries: Optional[int] = None,
+) -> Dict:
+    """Mongo filter for failed items; raises ValueError on an unknown error class."""
+    query: Dict = {"status": "failed"}
+    clauses: List[Dict] = []
+    if error_class:
+        if error_class == "temporary":
+            clauses.append({"last_error": {"$not": re.compile("|".join(ERROR_CLASSES.values()))}})
+        elif error_class in ERROR_CLASSES:
+            clauses.append({"last_error": {"$regex": ERROR_CLASSES[error_class]}})
+        else:
+            raise ValueError(f"error_class must be one of {sorted(ERROR_CLASSES) + ['temporary']}")
+    if error:
+        clauses.append({"last_error": {"$regex": re.escape(error), "$options": "i"}})
+
+    now = datetime.now(timezone.utc)
+    last_try: Dict = {}
+    if older_than_hours is not None:
+        last_try["$lt"] = (now - timedelta(hours=older_than_hours)).isoformat()
+    if newer_than_hours is not None:
+        last_try["$gte"] = (now - timedelta(hours=newer_than_hours)).isoformat()
+    if last_try:
+        query["last_try"] = last_try
+
+    tries: Dict = {}
+    if min_tries is not None:
+        tries["$gte"] = min_tries
+    if max_tries is not None:
+        tries["$lte"] = max_tries
+    if tries:
+        query["tries"] = tries
+
+    if clauses:
+        query["$and"] = clauses
+    return query
+
+
+def _coll(source: str):
+    if source not in SOURCES:
+        raise ValueError(f"source must be one of {sorted(SOURCES)}")
+    return collection(SOURCES[source])
+
+
+def _encode_cursor(doc: Dict) -> str:
+    return f"{doc.get('last_try') or ''}|{doc['_id']}"
+
+
+def _decode_cursor(cursor: str) -> Dict:
+    """Keyset condition for the page after `cursor` (sorted by last_try desc, _id desc)."""
+    try:
+        last_try, oid = cursor.rsplit("|", 1)
+        oid = ObjectId(oid)
+    except (ValueError, InvalidId):
+        raise ValueError("invalid cursor")
+    return {"$or": [
+        {"last_try": {"$lt": last_try}},
+        {"last_try": last_try, "_id": {"$lt": oid}},
+    ]}
+
+
+def _public(doc: Dict) -> Dict:
+    out = dict(doc)
+    out["_id"] = str(out["_id"])
+    for key in ("locked_until", "archived_at"):
+        if isinstance(out.get(key), datetime):
+            out[key] = out[key].isoformat()
+    return out
+
+
+async def list_failed(filters: Dict, limit: int = 50, cursor: Optional[str] = None, source: str = "live") -> Dict:
+    """
+    One page of failed items, most recently tried first.
+    Returns {"items", "next_cursor"}; pass next_cursor back for the next page (None = last page).
+    """
+    limit = max(1, min(limit, DLQ_PAGE_SIZE_MAX))
+    query = dict(filters)
+    if cursor:
+        query = {"$and": [query, _decode_cursor(cursor)]}
+    docs = await _coll(source).find(query).sort([("last_try", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+    next_cursor = _encode_cursor(docs[-1]) if len(docs) == limit else None
+    return {"items": [_public(d) for d in docs], "next_cursor": next_cursor}
+
+
+async def summarize_failed(filters: Dict, source: str = "live") -> Dict:
+    """Counts of matching failed items per error class, tries and oldest/newest last try (one aggregation)."""
+    branches = [
+        {"case": {"$regexMatch": {"input": {"$ifNull": ["$last_error", ""]}, "regex": pattern}}, "then": name}
+        for name, pattern in ERROR_CLASSES.items()
+    ]
+    pipeline = [
+        {"$match": filters},
+        {"$facet": {
+            "by_class": [
+                {"$group": {"_id": {"$switch": {"branches": branches, "default": "temporary"}}, "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}},
+            ],
+            "by_tries": [
+                {"$group": {"_id": "$tries", "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "range": [
+                {"$group": {"_id": None, "total": {"$sum": 1},
+                            "oldest_last_try": {"$min": "$last_try"}, "newest_last_try": {"$max": "$last_try"}}},
+            ],
+        }},
+    ]
+    result = await _coll(source).aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {"by_class": [], "by_tries": [], "range": []}
+    rng = facets["range"][0] if facets["range"] else {}
+    return {
+        "source": source,
+        "total": rng.get("total", 0),
+        "by_error_class": {row["_id"]: row["count"] for row in facets["by_class"]},
+        "by_tries": {str(row["_id"]): row["count"] for row in facets["by_tries"]},
+        "oldest_last_try": rng.get("oldest_last_try"),
+        "newest_last_try": rng.get("newest_last_try"),
+    }
+
+
+def _requeue_fields(now: datetime, release_at: datetime) -> Dict:
+    """
+    Reset tries and any lease; held back (locked_until) until its release slot.
+    Requeued items go to the bulk lane with a fresh deadline, so a mass requeue
+    neither jumps ahead of live onboarding nor gets promoted all at once.
+    """
+    return {
+        "status": "queued",
+        "tries": 0,
+        "lease_token": None,
+        "leased_by": None,
+        "locked_until": release_at if release_at > now else None,
+        "lane": "bulk",
+        "deadline": lane_deadline("bulk", max(release_at, now)),
+        "requeued_at": now.isoformat(),
+    }
+
+
+async def requeue_failed(
+    filters: Dict,
+    max_items: Optional[int] = None,
+    release_per_second: int = 0,
+    include_archived: bool = False,
+    dry_run: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict:
+    """
+    Requeues matching failed items in chunks (one update_many each; archived
+    ones are moved back with one bulk upsert + delete per chunk). With
+    release_per_second > 0 chunks hold that many items and become leasable one
+    second apart. `progress(done, total)` is called after every chunk.
+    Returns {"matched", "requeued", "release_window_seconds", "dry_run"}.
+    """
+    live = collection(QUEUE_COLL)
+    archive = collection(ARCHIVE_COLL)
+    matched = await live.count_documents(filters)
+    if include_archived:
+        matched += await archive.count_documents(filters)
+    total = min(matched, max_items) if max_items is not None else matched
+    if dry_run or total == 0:
+        return {"matched": matched, "requeued": 0, "release_window_seconds": 0, "dry_run": dry_run}
+
+    chunk_size = release_per_second if release_per_second > 0 else DLQ_REQUEUE_CHUNK
+    now = datetime.now(timezone.utc)
+    requeued = 0
+    slot = 0
+    sources = [live] + ([archive] if include_archived else [])
+    for source in sources:
+        while requeued < total:
+            size = min(chunk_size, total - requeued)
+            # Requeued items stop matching, so the next chunk is always the first page
+            docs = await source.find(filters).sort("_id", 1).limit(size).to_list(length=size)
+            if not docs:
+                break
+            ids = [d["_id"] for d in docs]
+            fields = _requeue_fields(now, now + timedelta(seconds=slot if release_per_second > 0 else 0))
+            if source is live:
+                result = await live.update_many(
+                    {"$and": [{"_id": {"$in": ids}}, filters]},
+                    {"$set": fields, "$inc": {"requeue_count": 1}},
+                )
+                moved = result.modified_count
+            else:
+                restored = []
+                for d in docs:
+                    d = {k: v for k, v in d.items() if k != "archived_at"}
+                    d.update(fields)
+                    d["requeue_count"] = d.get("requeue_count", 0) + 1
+                    restored.append(d)
+                # Upserts: a copy left in the live queue by an interrupted archive pass is simply replaced
+                await live.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in restored], ordered=False)
+                await archive.delete_many({"_id": {"$in": ids}})
+                moved = len(restored)
+            # Permanent failures also marked the craftid failed; it is pending anchoring again
+            await collection("craftids").update_many(
+                {"public_id": {"$in": [d["public_id"] for d in docs if d.get("public_id")]}, "status": "failed"},
+                {"$set": {"status": "queued"}, "$unset": {"last_error": ""}},
+            )
+            requeued += moved
+            slot += 1
+            if progress:
+                progress(requeued, total)
+            logger.info(f"Requeued {requeued}/{total} failed items.")
+
+    notify_local_wakeup()
+    window = slot - 1 if release_per_second > 0 else 0
+    return {"matched": matched, "requeued": requeued, "release_window_seconds": max(window, 0), "dry_run": False}
+
+
+# --- CLI ---
+
+def _filters_from_args(args) -> Dict:
+    return failed_filter(
+        error_class=args.error_class, error=args.error,
+        older_than_hours=args.older_than_hours, newer_than_hours=args.newer_than_hours,
+        min_tries=args.min_tries, max_tries=args.max_tries,
+    )
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m chain.dlq", description="Inspect and requeue failed anchor queue items.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument("--error-class", choices=sorted(ERROR_CLASSES) + ["temporary"])
+    filters.add_argument("--error", help="substring of last_error (case-insensitive)")
+    filters.add_argument("--older-than-hours", type=float)
+    filters.add_argument("--newer-than-hours", type=float)
+    filters.add_argument("--min-tries", type=int)
+    filters.add_argument("--max-tries", type=int)
+
+    p_summary = sub.add_parser("summary", parents=[filters], help="counts per error class and tries")
+    p_summary.add_argument("--archive", action="store_true", help="summarize the archive instead of the live queue")
+
+    p_list = sub.add_parser("list", parents=[filters], help="page through failed items")
+    p_list.add_argument("--limit", type=int, default=50)
+    p_list.add_argument("--cursor")
+    p_list.add_argument("--archive", action="store_true", help="list archived failures")
+
+    p_requeue = sub.add_parser("requeue", parents=[filters], help="requeue matching items")
+    p_requeue.add_argument("--rate", type=int, default=0, help="release at most N items per second (0 = all at once)")
+    p_requeue.add_argument("--max", type=int, dest="max_items")
+    p_requeue.add_argument("--include-archived", action="store_true")
+    p_requeue.add_argument("--dry-run", action="store_true")
+    return parser
+
+
+async def _cli(args) -> None:
+    filters = _filters_from_args(args)
+    if args.command == "summary":
+        print(json.dumps(await summarize_failed(filters, "archive" if args.archive else "live"), indent=2))
+    elif args.command == "list":
+        page = await list_failed(filters, args.limit, args.cursor, "archive" if args.archive else "live")
+        for item in page["items"]:
+            print(f"{item.get('public_id')}\ttries={item.get('tries')}\t{item.get('last_try')}\t{item.get('last_error')}")
+        print(f"next cursor: {page['next_cursor']}" if page["next_cursor"] else "(last page)")
+    elif args.command == "requeue":
+        def _progress(done: int, total: int) -> None:
+            print(f"\rrequeued {done}/{total}", end="", flush=True)
+        result = await requeue_failed(filters, args.max_items, args.rate, args.include_archived, args.dry_run, _progress)
+        print()
+        print(json.dumps(result, indent=2))
+
+
+async def main(argv=None):
+    args = _parser().parse_args(argv)
+    await connect_db()
+    try:
+        await _cli(args)
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
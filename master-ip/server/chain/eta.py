@@ -0,0 +1,130 @@
+# master-ip/server/chain/eta.py
+"""
+Anchoring ETA for newly enqueued items (`expected_anchor_by`).
+
+    eta = now + depth_ahead / throughput + confirmation_latency
+
+  * depth_ahead: queued + processing items in the item's lane and the lanes
+    leased before it (see chain/queue.py); a bulk item's wait is capped at its
+    lane's max wait, after which it is promoted;
+  * throughput: items anchored per second over the last ETA_WINDOW_SECONDS,
+    never below what one worker does when busy (BATCH_LIMIT per lease, one
+    lease per 1s pause + confirmation latency), because an idle queue only
+    shows the arrival rate;
+  * confirmation_latency: mean lease -> anchored time (`last_try` to
+    `anchored_at`) of the items anchored in that window.
+
+Throughput and latency come from one aggregation over anchor_queue and its
+archive, cached for ETA_REFRESH_SECONDS; only the depth count runs per call.
+The ETA is a hint for polling clients: estimate() never raises.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional
+
+from chain.utils import get_logger, iso_to_date
+from chain.queue import QUEUE_COLL, ARCHIVE_COLL, LANES, DEFAULT_LANE, LANE_MAX_WAIT_SECONDS, lane_query
+from app.db.mongodb import collection
+from app.constant import (
+    BATCH_LIMIT, ETA_WINDOW_SECONDS, ETA_REFRESH_SECONDS,
+    ETA_DEFAULT_LATENCY_SECONDS, ETA_SAFETY_FACTOR,
+)
+
+logger = get_logger("chain.eta")
+
+PENDING_STATUSES = ["queued", "processing"]
+
+
+@dataclass
+class ThroughputStats:
+    anchored: int                # items anchored within the window
+    window_seconds: float
+    latency_seconds: float       # mean lease -> anchored
+    refreshed_at: float          # time.monotonic()
+
+    @property
+    def throughput(self) -> float:
+        """Items/s, floored at one busy worker's rate."""
+        observed = self.anchored / self.window_seconds if self.window_seconds > 0 else 0.0
+        nominal = BATCH_LIMIT / (1 + self.latency_seconds)
+        return max(observed, nominal)
+
+
+async def _window_stats(window_seconds: int) -> Dict:
+    since = (datetime.now(timezone.utc) - timedelta(seconds=window_seconds)).isoformat()
+    recent = [
+        {"$match": {"status": "anchored", "anchored_at": {"$gte": since}}},
+        {"$project": {"latency_ms": {"$subtract": [iso_to_date("$anchored_at"), iso_to_date("$last_try")]}}},
+    ]
+    pipeline = recent + [
+        {"$unionWith": {"coll": ARCHIVE_COLL, "pipeline": recent}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "avg_latency_ms": {"$avg": "$latency_ms"}}},
+    ]
+    rows = await collection(QUEUE_COLL).aggregate(pipeline).to_list(length=1)
+    return rows[0] if rows else {}
+
+
+class EtaEstimator:
+    """Caches window stats; estimate() adds the live depth count."""
+
+    def __init__(self, window_seconds: int = ETA_WINDOW_SECONDS, refresh_seconds: int = ETA_REFRESH_SECONDS):
+        self.window_seconds = max(window_seconds, 1)
+        self.refresh_seconds = refresh_seconds
+        self.stats: Optional[ThroughputStats] = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, force: bool = False) -> ThroughputStats:
+        async with self._lock:
+            now = time.monotonic()
+            if not force and self.stats and now - self.stats.refreshed_at < self.refresh_seconds:
+                return self.stats
+            row = await _window_stats(self.window_seconds)
+            latency_ms = row.get("avg_latency_ms")
+            self.stats = ThroughputStats(
+                anchored=row.get("count", 0),
+                window_seconds=self.window_seconds,
+                latency_seconds=latency_ms / 1000 if latency_ms is not None else ETA_DEFAULT_LATENCY_SECONDS,
+                refreshed_at=now,
+            )
+            return self.stats
+
+    async def depth_ahead(self, lane: str = DEFAULT_LANE) -> int:
+        ahead = LANES[:LANES.index(lane) + 1] if lane in LANES else LANES
+        return await collection(QUEUE_COLL).count_documents({
+            "status": {"$in": PENDING_STATUSES},
+            "$or": [lane_query(l) for l in ahead],
+        })
+
+    async def estimate_seconds(self, lane: str = DEFAULT_LANE) -> float:
+        stats = await self.refresh()
+        depth = await self.depth_ahead(lane)
+        wait = depth / stats.throughput
+        max_wait = LANE_MAX_WAIT_SECONDS.get(lane)
+        if max_wait is not None:
+            wait = min(wait, max_wait)
+        return (wait + stats.latency_seconds) * ETA_SAFETY_FACTOR
+
+    async def estimate(self, lane: str = DEFAULT_LANE, timeout: float = 2) -> Optional[str]:
+        """ISO timestamp the next item enqueued in `lane` should be anchored by, or None if unknown."""
+        try:
+            seconds = await asyncio.wait_for(self.estimate_seconds(lane), timeout=timeout)
+        except Exception as e:
+            logger.warning(f"ETA estimate unavailable: {e}")
+            return None
+        eta = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+        return eta.replace(microsecond=0).isoformat()
+
+
+_estimator: Optional[EtaEstimator] = None
+
+def get_estimator() -> EtaEstimator:
+    global _estimator
+    if _estimator is None:
+        _estimator = EtaEstimator()
+    return _estimator
+
+
+async def estimate_anchor_by(lane: str = DEFAULT_LANE) -> Optional[str]:
+    return await get_estimator().estimate(lane)
@@ -0,0 +1,115 @@
+# master-ip/server/chain/import_budget.py
+"""
+Import-time budget check for the process entry points.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+with the chain/signer settings unset, which checks three things:
+
+  * importing it has no side effects that need configuration (clients and
+    keys are built on first use or in startup hooks, not at import);
+  * its cumulative import time stays under the budget (IMPORT_BUDGET_MS_*);
+  * none of the forbidden packages (the ML stack: torch, transformers,
+    numpy, ...) is pulled into its import graph. The batcher never embeds
+    anything, and the API only loads the models when the first embedding is
+    requested; the batcher also leaves PIL / qrcode until a certificate is
+    rendered.
+
+    python -m chain.import_budget              # all entry points
+    python -m chain.import_budget chain.batcher
+    python -m pytest tests/test_import_budget.py
+
+Exits non-zero on any violation, so it can gate CI or an image build.
+"""
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+ML_PACKAGES = ("torch", "transformers", "sentence_transformers", "tokenizers", "safetensors", "pinecone", "numpy")
+# Image stack for certificates: loaded by the batcher only when it renders one
+IMAGE_PACKAGES = ("PIL", "qrcode")
+
+# Settings that must not be needed to import anything
+CONFIG_VARS = (
+    "WEB3_RPC_URL", "WEB3_RPC_URLS", "ANCHOR_CONTRACT_ADDRESS", "ANCHORER_PRIVATE_KEY", "ANCHORER_PRIVATE_KEYS",
+    "SIGNER_KEY_PATH", "PLATFORM_PUBKEY_PATH",
+)
+
+# module -> (budget in ms, forbidden top-level packages)
+BUDGETS: Dict[str, Tuple[int, Sequence[str]]] = {
+    "chain.batcher": (int(os.getenv("IMPORT_BUDGET_MS_BATCHER", "3000")), ML_PACKAGES + IMAGE_PACKAGES),
+    "app.main": (int(os.getenv("IMPORT_BUDGET_MS_API", "4000")), ML_PACKAGES),
+}
+
+# master-ip/server: the entry points are imported from here whatever the caller's cwd
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time:       self [us] |  cumulative | imported package"
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)$")
+
+
+@dataclass
+class ImportReport:
+    module: str
+    cumulative_ms: float = 0.0
+    imported: List[str] = field(default_factory=list)
+    slowest: List[Tuple[float, str]] = field(default_factory=list)
+    error: str = ""
+
+
+def measure(module: str) -> ImportReport:
+    """Imports `module` in a clean interpreter and parses its -X importtime trace."""
+    env = {k: v for k, v in os.environ.items() if k not in CONFIG_VARS}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, cwd=ROOT,
+    )
+    report = ImportReport(module)
+    tops = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative_us, indent, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        report.imported.append(name)
+        if indent == 1:   # a top-level import of this interpreter
+            report.cumulative_ms += cumulative_us / 1000
+            tops.append((cumulative_us / 1000, name))
+    report.slowest = sorted(tops, reverse=True)[:5]
+    if proc.returncode != 0:
+        report.error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+    return report
+
+
+def check(module: str, budget_ms: int, forbidden: Sequence[str]) -> List[str]:
+    """Returns the violations for one module (empty if it is within budget)."""
+    report = measure(module)
+    if report.error:
+        return [f"{module}: import failed without chain/signer settings: {report.error}"]
+    problems = []
+    leaked = sorted({n.split(".")[0] for n in report.imported} & set(forbidden))
+    if leaked:
+        problems.append(f"{module}: imports {', '.join(leaked)}")
+    if report.cumulative_ms > budget_ms:
+        slowest = ", ".join(f"{name} {ms:.0f}ms" for ms, name in report.slowest)
+        problems.append(f"{module}: import took {report.cumulative_ms:.0f}ms (budget {budget_ms}ms; slowest: {slowest})")
+    print(f"{module}: {report.cumulative_ms:.0f}ms / {budget_ms}ms, {len(report.imported)} modules"
+          + ("" if problems else " - ok"))
+    return problems
+
+
+def main(argv: Sequence[str]) -> int:
+    modules = list(argv) or list(BUDGETS)
+    problems = []
+    for module in modules:
+        budget_ms, forbidden = BUDGETS.get(module, (BUDGETS["chain.batcher"][0], ML_PACKAGES))
+        problems.extend(check(module, budget_ms, forbidden))
+    for p in problems:
+        print(f"FAIL {p}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,276 @@
+# master-ip/server/chain/indexer.py
+"""
+Local index of the contract's HashAnchored events.
+
+Instead of one isAnchored eth_call per item, the indexer scans HashAnchored
+logs with eth_getLogs in block ranges of INDEXER_BLOCK_RANGE, keeps the last
+fully processed block as a checkpoint in Mongo, and writes each range with
+bulk updates:
+  * `anchor_events`: one document per anchored hash (the index itself);
+  * `craftids` / `anchor_queue`: status, tx hash, block and timestamp of every
+    matching item, so records anchored by a lost or retried tx reconcile too.
+
+Only blocks at least CONFIRMATION_DEPTH deep are indexed. lookup() answers
+"is this hash anchored?" from the index plus, for the few blocks past the
+checkpoint, one eth_getLogs filtered on the hashes asked about. An index that
+does not reach back to INDEXER_START_BLOCK (started from the head) cannot
+tell "not anchored" from "anchored before the index", so lookup() then checks
+the hashes it did not find with isAnchored.
+
+Runs inside the batcher (see chain/batcher.py) or on its own:
+
+    python -m chain.indexer
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from chain.utils import get_logger, utc_now_iso
+from chain.queue import QUEUE_COLL
+from chain.web3_client import get_block_number, get_anchor_logs, is_anchored_many
+from app.db.mongodb import collection, connect_db, close_db
+from app.constant import (
+    CONFIRMATION_DEPTH, INDEXER_START_BLOCK, INDEXER_BLOCK_RANGE,
+    INDEXER_POLL_INTERVAL, INDEXER_MAX_TAIL_BLOCKS,
+)
+
+logger = get_logger("chain.indexer")
+
+ANCHOR_EVENTS_COLL = "anchor_events"
+INDEXER_STATE_COLL = "chain_indexer"
+CHECKPOINT_ID = "hash_anchored"
+
+
+def normalize_hash(hash_hex: str) -> Optional[str]:
+    """public_hash format (lowercase hex, no 0x), or None if not a valid bytes32."""
+    try:
+        h = (hash_hex[2:] if hash_hex.startswith("0x") else hash_hex).lower()
+        return h if len(bytes.fromhex(h)) == 32 else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def _anchored_at(event: Dict) -> str:
+    return datetime.fromtimestamp(event["timestamp"], timezone.utc).isoformat()
+
+
+def _chain_status(event: Dict) -> Dict:
+    """Same shape as chain/anchor_cache.py persists, so /verify is a cache hit."""
+    return {
+        "anchored": True,
+        "timestamp": event["timestamp"],
+        "block_number": event["block_number"],
+        "public_hash": event["public_hash"],
+        "checked_at": utc_now_iso(),
+    }
+
+
+async def record_events(events: List[Dict]) -> None:
+    """
+    Writes a range of HashAnchored events: one bulk_write each on
+    anchor_events, craftids and anchor_queue. Idempotent, so re-scanning a
+    range after a crash is harmless.
+    """
+    if not events:
+        return
+    event_ops, craft_ops, queue_ops = [], [], []
+    indexed_at = utc_now_iso()
+    for e in events:
+        h = e["public_hash"]
+        anchored_at = _anchored_at(e)
+        event_ops.append(UpdateOne({"_id": h}, {"$set": {**e, "indexed_at": indexed_at}}, upsert=True))
+
+        # Items not yet recorded as anchored take the on-chain record...
+        craft_ops.append(UpdateOne(
+            {"public_hash": h, "status": {"$ne": "anchored"}},
+            {"$set": {"status": "anchored", "tx_hash": e["tx_hash"], "anchored_at": anchored_at}}
+        ))
+        queue_ops.append(UpdateOne(
+            {"public_hash": h, "status": {"$ne": "anchored"}},
+            {"$set": {"status": "anchored", "tx_hash": e["tx_hash"], "anchored_at": anchored_at,
+                      "locked_until": None, "lease_token": None}}
+        ))
+        # ...and every single-anchored item gets its block and verification status
+        craft_ops.append(UpdateOne(
+            {"public_hash": h, "merkle": {"$exists": False}},
+            {"$set": {"block_number": e["block_number"], "chain_status": _chain_status(e)}}
+        ))
+        queue_ops.append(UpdateOne({"public_hash": h}, {"$set": {"block_number": e["block_number"]}}))
+
+    await collection(ANCHOR_EVENTS_COLL).bulk_write(event_ops, ordered=False)
+    await collection("craftids").bulk_write(craft_ops, ordered=False)
+    await collection(QUEUE_COLL).bulk_write(queue_ops, ordered=False)
+
+
+async def ensure_indexes() -> None:
+    """Reconciliation updates match on public_hash; lease transitions and /status on public_id."""
+    await collection("craftids").create_index("public_hash")
+    await collection(QUEUE_COLL).create_index("public_hash")
+    await collection(QUEUE_COLL).create_index("public_id")
+
+
+async def indexed_anchors(hash_hexes: List[str]) -> Dict[str, Dict]:
+    """Index-only lookup (one $in query, no RPC): {public_hash: record} for the hashes indexed so far."""
+    hashes = [h for h in map(normalize_hash, hash_hexes) if h]
+    if not hashes:
+        return {}
+    cursor = collection(ANCHOR_EVENTS_COLL).find(
+        {"_id": {"$in": hashes}},
+        {"_id": 0, "public_hash": 1, "public_id": 1, "tx_hash": 1, "block_number": 1, "timestamp": 1},
+    )
+    return {d["public_hash"]: d async for d in cursor}
+
+
+class AnchorIndexer:
+    """Scans HashAnchored logs forward from the Mongo checkpoint."""
+
+    def __init__(self, block_range: int = INDEXER_BLOCK_RANGE):
+        self.block_range = max(block_range, 1)
+        self.last_block: Optional[int] = None
+        self.from_block: Optional[int] = None   # first indexed block (None: unknown)
+        self.last_sync: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def checkpoint(self) -> int:
+        """
+        Last block whose events are all indexed. On the first run it is
+        INDEXER_START_BLOCK - 1 or, with no start block configured, the
+        current confirmed head (saved at once, so a restart resumes from it).
+        The first indexed block is kept with the checkpoint (see covers_history).
+        """
+        doc = await collection(INDEXER_STATE_COLL).find_one({"_id": CHECKPOINT_ID})
+        if doc:
+            self.last_block = int(doc["last_block"])
+            self.from_block = doc.get("from_block")
+        elif INDEXER_START_BLOCK >= 0:
+            self.last_block = INDEXER_START_BLOCK - 1
+            self.from_block = INDEXER_START_BLOCK
+            logger.info(f"No index checkpoint; indexing from INDEXER_START_BLOCK {INDEXER_START_BLOCK}.")
+        else:
+            start = max(await get_block_number() - max(CONFIRMATION_DEPTH, 1) + 1, 0)
+            logger.warning(
+                f"No index checkpoint and INDEXER_START_BLOCK unset; indexing from the confirmed head, block {start}. "
+                "Anchors from earlier blocks are not indexed: set INDEXER_START_BLOCK to the contract's deployment block to include them."
+            )
+            self.from_block = start
+            await self._save_checkpoint(start - 1)
+        return self.last_block
+
+    @property
+    def covers_history(self) -> bool:
+        """
+        Whether every anchor is in the index (once synced): it must start at
+        or before INDEXER_START_BLOCK. False when started from the head, or for
+        a checkpoint saved before its first block was recorded.
+        """
+        return INDEXER_START_BLOCK >= 0 and self.from_block is not None and self.from_block <= INDEXER_START_BLOCK
+
+    async def _save_checkpoint(self, block: int) -> None:
+        # $max: workers indexing concurrently never move the checkpoint backwards
+        await collection(INDEXER_STATE_COLL).update_one(
+            {"_id": CHECKPOINT_ID},
+            {"$max": {"last_block": block}, "$set": {"updated_at": utc_now_iso()},
+             "$setOnInsert": {"from_block": self.from_block}},
+            upsert=True,
+        )
+        self.last_block = block
+
+    async def sync(self) -> int:
+        """
+        Indexes every confirmed block past the checkpoint. A range the provider
+        rejects (too wide / too many results) is retried at half the size.
+        Returns the number of events indexed.
+        """
+        async with self._lock:
+            head = await get_block_number()
+            safe = head - max(CONFIRMATION_DEPTH, 1) + 1
+            start = await self.checkpoint() + 1
+            span = self.block_range
+            indexed = 0
+            while start <= safe:
+                end = min(start + span - 1, safe)
+                try:
+                    events = await get_anchor_logs(start, end)
+                except Exception as e:
+                    if span == 1:
+                        raise
+                    span = max(span // 2, 1)
+                    logger.warning(f"eth_getLogs {start}-{end} failed ({e}); retrying with {span}-block ranges.")
+                    continue
+                await record_events(events)
+                await self._save_checkpoint(end)
+                indexed += len(events)
+                start = end + 1
+            self.last_sync = time.monotonic()
+            if indexed:
+                logger.info(f"Indexed {indexed} HashAnchored events up to block {self.last_block}.")
+            return indexed
+
+    async def lookup(self, hash_hexes: List[str]) -> Dict[str, Dict]:
+        """
+        Anchoring records for the given hashes: {public_hash: {"tx_hash",
+        "block_number", "timestamp", "public_id"}}; hashes not anchored are
+        absent. One Mongo query for the index, plus one eth_getLogs for the
+        blocks past the checkpoint, or one isAnchored batch for the hashes not
+        found if the index lags more than INDEXER_MAX_TAIL_BLOCKS or does not
+        cover the contract's history. Raises on RPC errors.
+        """
+        hashes = list(dict.fromkeys(h for h in map(normalize_hash, hash_hexes) if h))
+        if not hashes:
+            return {}
+        found = await indexed_anchors(hashes)
+        missing = [h for h in hashes if h not in found]
+        if not missing:
+            return found
+
+        last_block = self.last_block if self.last_block is not None else await self.checkpoint()
+        head = await get_block_number()
+        if self.covers_history and head - last_block <= INDEXER_MAX_TAIL_BLOCKS:
+            for e in await get_anchor_logs(last_block + 1, None, missing):
+                found.setdefault(e["public_hash"], {k: e[k] for k in ("public_hash", "public_id", "tx_hash", "block_number", "timestamp")})
+        else:
+            if self.covers_history:
+                logger.warning(f"Index is {head - last_block} blocks behind; checking {len(missing)} hashes with isAnchored.")
+            else:
+                # Anchors before the index's first block are not in it; only the contract knows them
+                logger.debug(f"Index starts at block {self.from_block}; checking {len(missing)} hashes with isAnchored.")
+            for h, (anchored, ts) in zip(missing, await is_anchored_many(missing)):
+                if anchored:
+                    found[h] = {"public_hash": h, "public_id": None, "tx_hash": None, "block_number": None, "timestamp": ts}
+        return found
+
+    async def run(self, interval: int = INDEXER_POLL_INTERVAL) -> None:
+        """Syncs every `interval` seconds until cancelled; errors are logged and retried."""
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Index sync failed: {e}. Retrying in {interval}s.")
+            await asyncio.sleep(interval)
+
+
+_indexer: Optional[AnchorIndexer] = None
+
+def get_indexer() -> AnchorIndexer:
+    global _indexer
+    if _indexer is None:
+        _indexer = AnchorIndexer()
+    return _indexer
+
+
+async def main():
+    await connect_db()
+    try:
+        await ensure_indexes()
+        await get_indexer().run()
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+# master-ip/server/chain/merkle.py
+"""
+SHA-256 Merkle trees for batched anchoring.
+
+Leaves are the 32-byte public hashes. Leaf and internal nodes are domain
+separated (0x00 / 0x01 prefixes) so an internal node can never be passed off
+as a leaf. An odd node at the end of a level is promoted unchanged.
+"""
+import hashlib
+from typing import Dict, List, Tuple
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def _strip0x(h: str) -> str:
+    return h[2:] if h.startswith("0x") else h
+
+
+def leaf_node(leaf_hex: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(_strip0x(leaf_hex))).digest()
+
+
+def _parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_tree(leaves_hex: List[str]) -> Tuple[str, List[List[Dict]]]:
+    """
+    Builds the tree over `leaves_hex` (in order).
+    Returns (root_hex, proofs) where proofs[i] is the inclusion proof of leaf i:
+    a list of {"sibling": hex, "position": "left"|"right"} from leaf to root.
+    """
+    if not leaves_hex:
+        raise ValueError("Cannot build a Merkle tree with no leaves")
+
+    level = [leaf_node(h) for h in leaves_hex]
+    # positions[i] = index of leaf i's ancestor in the current level
+    positions = list(range(len(level)))
+    proofs: List[List[Dict]] = [[] for _ in leaves_hex]
+
+    while len(level) > 1:
+        for leaf_idx, pos in enumerate(positions):
+            sibling = pos ^ 1
+            if sibling < len(level):
+                proofs[leaf_idx].append({
+                    "sibling": level[sibling].hex(),
+                    "position": "left" if sibling < pos else "right",
+                })
+            positions[leaf_idx] = pos // 2
+
+        nxt = []
+        for i in range(0, len(level), 2):
+            if i + 1 < len(level):
+                nxt.append(_parent(level[i], level[i + 1]))
+            else:
+                nxt.append(level[i])  # promote odd node
+        level = nxt
+
+    return level[0].hex(), proofs
+
+
+def compute_root(leaf_hex: str, proof: List[Dict]) -> str:
+    """Folds an inclusion proof from the leaf up; returns the implied root hex."""
+    node = leaf_node(leaf_hex)
+    for step in proof:
+        sibling = bytes.fromhex(_strip0x(step["sibling"]))
+        if step["position"] == "left":
+            node = _parent(sibling, node)
+        elif step["position"] == "right":
+            node = _parent(node, sibling)
+        else:
+            raise ValueError(f"Invalid proof step position: {step['position']}")
+    return node.hex()
+
+
+def verify_proof(leaf_hex: str, proof: List[Dict], root_hex: str) -> bool:
+    """True if `proof` proves `leaf_hex` is included under `root_hex`."""
+    try:
+        return compute_root(leaf_hex, proof) == _strip0x(root_hex).lower()
+    except (KeyError, TypeError, ValueError):
+        return False
@@ -0,0 +1,243 @@
+# master-ip/server/chain/metrics.py
+"""
+In-process counters, gauges and histograms for the anchoring pipeline,
+rendered in the Prometheus text exposition format (0.0.4).
+
+The batcher serves them on http://0.0.0.0:BATCHER_METRICS_PORT/metrics (see
+start_metrics_server); queue gauges are refreshed from one aggregation over
+anchor_queue on a timer (refresh_every), so a scrape only renders the values
+already held. No client library needed: the format is a few lines of text
+per sample.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from chain.utils import get_logger
+
+logger = get_logger("chain.metrics")
+
+LabelValues = Tuple[str, ...]
+
+# Seconds-scale default buckets (RPC / receipt latency)
+DEFAULT_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        if not self._values and not self.labelnames:
+            return [f"{self.name} 0"]
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> (per-bucket counts, sum, count)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> List[str]:
+        out = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                out.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            out.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            out.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+def counter(name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labels))
+
+def gauge(name: str, help_text: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labels))
+
+def histogram(name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labels, buckets))
+
+
+# --- Anchoring pipeline metrics ---
+
+QUEUE_ENQUEUED = counter("anchor_queue_enqueued_total", "Items enqueued for anchoring.")
+QUEUE_LEASED = counter("anchor_queue_leased_total", "Items leased by this worker.")
+QUEUE_LEASES = counter("anchor_queue_leases_total", "Lease calls by this worker, by whether they returned items.", ["result"])
+QUEUE_COMPLETED = counter("anchor_queue_completed_total", "Items recorded as anchored.")
+QUEUE_FAILED = counter("anchor_queue_failed_total", "Item failures recorded, by kind.", ["kind"])
+QUEUE_DEPTH = gauge("anchor_queue_depth", "Items in anchor_queue by status.", ["status"])
+QUEUE_OLDEST_AGE = gauge("anchor_queue_oldest_queued_age_seconds", "Age of the oldest queued item.")
+
+ITEM_TRIES = histogram("anchor_item_tries", "Attempts an item took until it was anchored.", buckets=(1, 2, 3, 4, 5, 10))
+CREATE_TO_ANCHOR = histogram(
+    "anchor_create_to_anchor_seconds", "Time from enqueue to recorded anchor.",
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+RECEIPT_LATENCY = histogram("anchor_receipt_latency_seconds", "Broadcast to confirmed receipt.")
+GAS_PER_ITEM = histogram(
+    "anchor_gas_used_per_item", "Gas used per anchored item, by anchoring path.", ["mode"],
+    buckets=(5_000, 10_000, 20_000, 40_000, 60_000, 80_000, 120_000, 200_000),
+)
+BATCHER_LEASE_SIZE = gauge("batcher_lease_size", "Items requested per lease (adaptive controller).")
+BATCHER_IN_FLIGHT_LIMIT = gauge("batcher_in_flight_limit", "Anchoring txs this worker keeps in flight at once.")
+BATCHER_LEASE_PAUSE = gauge("batcher_lease_pause_seconds", "Pause between non-empty leases.")
+ADAPTIVE_DECISIONS = counter("batcher_adaptive_decisions_total", "Adaptive controller decisions, by action.", ["action"])
+TXS_SENT = counter("anchor_txs_total", "Anchoring transactions confirmed, by anchoring path.", ["mode"])
+
+RPC_REQUESTS = counter("rpc_requests_total", "JSON-RPC requests by endpoint host and outcome.", ["endpoint", "outcome"])
+RPC_EWMA_LATENCY = gauge("rpc_ewma_latency_seconds", "EWMA request latency per endpoint (routing signal).", ["endpoint"])
+RPC_ERROR_RATE = gauge("rpc_error_rate", "EWMA request failure rate per endpoint (routing signal).", ["endpoint"])
+RPC_HEDGED = counter("rpc_hedged_requests_total", "Reads raced on a second endpoint, by which one answered first.", ["winner"])
+
+
+def observe_gas(gas_used: Optional[int], items: int, mode: str) -> None:
+    """Counts a confirmed anchoring tx and spreads its gasUsed over the `items` it anchored."""
+    TXS_SENT.inc(mode=mode)
+    if gas_used is None:
+        return
+    for _ in range(max(items, 1)):
+        GAS_PER_ITEM.observe(gas_used / max(items, 1), mode=mode)
+
+
+# --- HTTP endpoint ---
+
+async def refresh_every(fn: Callable[[], Awaitable[None]], interval: float) -> None:
+    """Runs the gauge refresh `fn` every `interval` seconds until cancelled; errors are logged."""
+    while True:
+        try:
+            await fn()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Metrics refresh {getattr(fn, '__name__', fn)} failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def start_metrics_server(port: int) -> Optional[asyncio.AbstractServer]:
+    """
+    Serves GET /metrics on `port` (0 disables) from the registry as it is;
+    gauges that need a query are kept fresh by refresh_every(). Returns the
+    server, or None if disabled or the port is taken.
+    """
+    if not port:
+        return None
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain headers; nothing in them matters here
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", REGISTRY.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    try:
+        server = await asyncio.start_server(handle, "0.0.0.0", port)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint unavailable on port {port}: {e}")
+        return None
+    logger.info(f"Serving Prometheus metrics on :{port}/metrics")
+    return server
@@ -1,115 +1,463 @@
 import os
+import uuid
 import asyncio
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional
-from pymongo import ReturnDocument # Import needed
+from typing import List, Dict, Optional, Tuple
+from pymongo import ReturnDocument, UpdateOne # Import needed
 from app.db.mongodb import collection
+from chain.utils import iso_to_date
+from chain.wakeup import notify_local_wakeup
+from chain.metrics import QUEUE_ENQUEUED, QUEUE_LEASED, QUEUE_LEASES, QUEUE_COMPLETED, QUEUE_FAILED
 # Make sure to import from constants.py (plural)
-from app.constant import VISIBILITY_TIMEOUT_SECONDS, MAX_RETRIES
+from app.constant import (
+    VISIBILITY_TIMEOUT_SECONDS, MAX_RETRIES,
+    QUEUE_INTERACTIVE_MAX_WAIT_SECONDS, QUEUE_BULK_MAX_WAIT_SECONDS, QUEUE_FAIR_QUANTUM_SECONDS,
+)
 
 QUEUE_COLL = os.getenv("ANCHOR_QUEUE_COLL", "anchor_queue")
+# Terminal items moved out of QUEUE_COLL by chain/archive.py
+ARCHIVE_COLL = os.getenv("ANCHOR_QUEUE_ARCHIVE_COLL", "anchor_queue_archive")
+# Per-source virtual clocks for fair scheduling
+SOURCES_COLL = os.getenv("ANCHOR_QUEUE_SOURCES_COLL", "anchor_queue_sources")
+
+# --- Scheduling ---
+# Lanes in strict priority order; items without a lane (enqueued before lanes) count as interactive
+LANES = ("interactive", "bulk")
+DEFAULT_LANE = "interactive"
+DEFAULT_SOURCE = "default"
+LANE_MAX_WAIT_SECONDS = {
+    "interactive": QUEUE_INTERACTIVE_MAX_WAIT_SECONDS,
+    "bulk": QUEUE_BULK_MAX_WAIT_SECONDS,
+}
+
+def lane_deadline(lane: str, start: datetime) -> datetime:
+    """When an item of `lane` waiting since `start` gets promoted ahead of every lane."""
+    return start + timedelta(seconds=LANE_MAX_WAIT_SECONDS.get(lane, QUEUE_BULK_MAX_WAIT_SECONDS))
+
+def lane_query(lane: str) -> Dict:
+    return {"lane": {"$in": [lane, None]}} if lane == DEFAULT_LANE else {"lane": lane}
+
+async def ensure_queue_indexes() -> None:
+    """Compound indexes behind every lease_batch pick, so claims are index scans whatever the backlog."""
+    coll = collection(QUEUE_COLL)
+    await coll.create_index([("status", 1), ("lane", 1), ("sched_key", 1)])  # fair order within a lane
+    await coll.create_index([("status", 1), ("deadline", 1)])                # promotion
+    await coll.create_index([("status", 1), ("locked_until", 1)])            # expired leases
+    await coll.create_index("lease_token")
+
+async def _next_sched_key(source: str, now: datetime) -> float:
+    """
+    Start-time fair queuing: an item starts at max(now, its source's virtual
+    clock), which then advances by QUEUE_FAIR_QUANTUM_SECONDS. A source that
+    enqueues 5,000 items pushes its own clock hours ahead, so a new source's
+    first item sorts ahead of nearly all of them. One atomic round trip.
+    """
+    ts = now.timestamp()
+    doc = await collection(SOURCES_COLL).find_one_and_update(
+        {"_id": source},
+        [{"$set": {
+            "vtime": {"$add": [{"$max": [{"$ifNull": ["$vtime", 0]}, ts]}, QUEUE_FAIR_QUANTUM_SECONDS]},
+            "updated_at": now,
+        }}],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["vtime"] - QUEUE_FAIR_QUANTUM_SECONDS
 
 async def enqueue_item(doc: Dict) -> None:
     """
     doc must contain: public_id, public_hash, timestamp
+    Optional: lane ("interactive" default, or "bulk") and source (the client /
+    importer the item is fair-shared under).
     """
+    now = datetime.now(timezone.utc)
     doc2 = dict(doc)
+    lane = doc2.get("lane") or DEFAULT_LANE
+    if lane not in LANES:
+        raise ValueError(f"Unknown queue lane '{lane}' (use one of {', '.join(LANES)})")
+    doc2["lane"] = lane
+    doc2["source"] = doc2.get("source") or DEFAULT_SOURCE
+    doc2.setdefault("sched_key", await _next_sched_key(doc2["source"], now))
+    doc2.setdefault("deadline", lane_deadline(lane, now))
     doc2.setdefault("status", "queued")
     doc2.setdefault("tries", 0)
-    doc2.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+    doc2.setdefault("created_at", now.isoformat())
     doc2.setdefault("locked_until", None) # For visibility timeout
     doc2.setdefault("last_error", None)
     doc2.setdefault("last_try", None)
+    doc2.setdefault("lease_token", None)
     await collection(QUEUE_COLL).insert_one(doc2)
+    QUEUE_ENQUEUED.inc()
+    notify_local_wakeup() # Batchers without a change stream wake on this
 
-async def fetch_one_and_lock() -> Optional[Dict]:
+def _claimable(now: datetime) -> Dict:
+    return {"status": "queued", "locked_until": {"$not": {"$gt": now}}}
+
+def _expired_lease(now: datetime) -> Dict:
+    return {"status": "processing", "locked_until": {"$lt": now}}
+
+def _lease_filter(now: datetime) -> Dict:
+    """
+    Items that are queued, or processing under an expired lease. A queued item
+    with a future locked_until is held back until then (rate-limited DLQ
+    releases, see chain/dlq.py).
+    """
+    return {"$or": [_claimable(now), _expired_lease(now)]}
+
+def _pick_stages(now: datetime) -> List[Tuple[Dict, List]]:
+    """
+    (query, sort) in claim order, each served by one compound index:
+    expired leases, then items past their deadline (any lane, most overdue
+    first), then each lane in priority order by fair-share key.
+    """
+    stages = [
+        (_expired_lease(now), [("locked_until", 1)]),
+        ({**_claimable(now), "deadline": {"$lte": now}}, [("deadline", 1)]),
+    ]
+    for lane in LANES:
+        stages.append(({**_claimable(now), **lane_query(lane)}, [("sched_key", 1)]))
+    return stages
+
+async def _pick(coll, now: datetime, limit: int) -> List[Dict]:
+    """
+    Up to `limit` items in claim order, in one round trip: each stage is a
+    `$unionWith` sub-pipeline ($match/$sort/$limit, served by its own index),
+    so the server returns at most len(stages) * limit candidates tagged with
+    their stage and sort key. The merge (stage order, then key; an item that
+    matches several stages counts once, at its first) happens here. The
+    stages are not folded into one $match + $sort because each orders by a
+    different field; the number of stages is fixed (2 + len(LANES)).
+    """
+    branches = []
+    for i, (query, sort) in enumerate(_pick_stages(now)):
+        key = sort[0][0]
+        branches.append([
+            {"$match": query},
+            {"$sort": dict(sort)},
+            {"$limit": limit},
+            {"$addFields": {"_stage": i, "_key": f"${key}"}},
+        ])
+    pipeline = branches[0] + [{"$unionWith": {"coll": QUEUE_COLL, "pipeline": b}} for b in branches[1:]]
+    candidates = await coll.aggregate(pipeline).to_list(length=None)
+    candidates.sort(key=lambda d: (d["_stage"], d.get("_key") is not None, d.get("_key") or 0))
+    picked, seen = [], set()
+    for d in candidates:
+        if d["_id"] in seen:
+            continue
+        seen.add(d["_id"])
+        d.pop("_stage")
+        d.pop("_key", None)
+        picked.append(d)
+        if len(picked) >= limit:
+            break
+    return picked
+
+async def count_claimable(limit: int = 0) -> int:
+    """Queued items a lease could take now (capped at `limit` if > 0, to bound the count)."""
+    return await collection(QUEUE_COLL).count_documents(_claimable(datetime.now(timezone.utc)), limit=limit)
+
+def _leased(public_id: str, lease_token: str) -> Dict:
+    """
+    Guard for state transitions: only the current lease holder may move an
+    item, so a worker whose lease expired cannot overwrite the outcome of
+    the worker that took the item over.
     """
-    Atomically fetches one item, marks it as processing, and sets a visibility timeout.
-    Returns the item or None if queue is empty or items are locked.
+    if not lease_token:
+        raise ValueError(f"A lease token is required to update queue item {public_id}")
+    return {"public_id": public_id, "status": "processing", "lease_token": lease_token}
+
+async def lease_batch(limit: int, worker_id: Optional[str] = None) -> List[Dict]:
+    """
+    Leases up to `limit` items under one new lease token: marks them
+    processing, sets the visibility timeout and increments tries. Items are
+    picked in scheduling order (see _pick_stages): expired leases, overdue
+    items, then interactive before bulk, fair-shared across sources.
+    Two round trips: one aggregation picks the items (see _pick), one guarded
+    update_many claims them. When every pick is claimed the leased items are
+    the picked documents with the claim applied; only if a concurrent batcher
+    took some in between are they read back by token (items lost to it are
+    simply not returned).
+    Every returned item carries its `lease_token` (and `leased_by`).
     """
     coll = collection(QUEUE_COLL)
     now = datetime.now(timezone.utc)
-    lock_until_time = now + timedelta(seconds=VISIBILITY_TIMEOUT_SECONDS)
-
-    # Query for items that are queued OR processing but timed out
-    query = {
-        "status": {"$in": ["queued", "requeued"]}, # Or just "queued" if you don't use "requeued" status
-        "$or": [
-            {"locked_until": {"$lt": now}},
-            {"locked_until": None}
-        ]
-    }
-    
-    # Correct query: Find items that are "queued" OR "processing" but timed out
-    query_robust = {
-        "$or": [
-            {"status": "queued"},
-            {"status": "processing", "locked_until": {"$lt": now}}
-        ]
-    }
+    lease_filter = _lease_filter(now)
+
+    picked = await _pick(coll, now, limit)
+    if not picked:
+        QUEUE_LEASES.inc(result="empty")
+        return []
 
-    # Atomically find one matching item and update it
-    updated_doc = await coll.find_one_and_update(
-        query_robust,
+    lease_token = uuid.uuid4().hex
+    claim = {
+        "status": "processing",
+        "lease_token": lease_token,
+        "leased_by": worker_id,
+        "locked_until": now + timedelta(seconds=VISIBILITY_TIMEOUT_SECONDS),
+        "last_try": now.isoformat()
+    }
+    result = await coll.update_many(
+        {"$and": [{"_id": {"$in": [d["_id"] for d in picked]}}, lease_filter]}, # Re-checked so two batchers never share an item
         {
-            "$set": {
-                "status": "processing",
-                "locked_until": lock_until_time,
-                "last_try": now.isoformat()
-            },
+            "$set": claim,
             "$inc": {"tries": 1} # Increment tries on every attempt
-        },
-        sort=[("created_at", 1)], # Process oldest first
-        return_document=ReturnDocument.AFTER # Return the updated document
+        }
     )
-    return updated_doc # Returns None if no document matched the query
+    if result.modified_count == 0:
+        QUEUE_LEASES.inc(result="empty")
+        return []
+    if result.modified_count == len(picked):
+        items = [{**d, **claim, "tries": (d.get("tries") or 0) + 1} for d in picked]
+        items.sort(key=lambda d: d.get("created_at") or "")
+    else:
+        items = await coll.find({"lease_token": lease_token}).sort("created_at", 1).to_list(length=limit)
+    QUEUE_LEASES.inc(result="items")
+    QUEUE_LEASED.inc(len(items))
+    return items
 
-async def mark_done(public_id: str, tx_hash: str, anchored_at_iso: str) -> None:
-    """Marks an item as done if it was in processing state."""
-    await collection(QUEUE_COLL).update_one(
-        {"public_id": public_id, "status": "processing"}, # Ensure we only update items we locked
-        {"$set": {"status": "anchored", "tx_hash": tx_hash, "anchored_at": anchored_at_iso, "locked_until": None}}
-    )
+async def extend_lease(lease_token: str, public_id: Optional[str] = None) -> int:
+    """
+    Pushes the visibility timeout of a lease (or of one of its items) out by
+    VISIBILITY_TIMEOUT_SECONDS. Returns how many items are still held: 0 means
+    the lease expired and another worker may own them now.
+    """
+    query = {"lease_token": lease_token, "status": "processing"}
+    if public_id is not None:
+        query["public_id"] = public_id
+    lock_until_time = datetime.now(timezone.utc) + timedelta(seconds=VISIBILITY_TIMEOUT_SECONDS)
+    result = await collection(QUEUE_COLL).update_many(query, {"$set": {"locked_until": lock_until_time}})
+    return result.matched_count
 
-async def mark_failed(public_id: str, reason: str, is_permanent: bool = False) -> None:
-    """Increments tries and marks as failed if max retries reached or if permanent."""
-    coll = collection(QUEUE_COLL)
-    now_iso = datetime.now(timezone.utc).isoformat()
+async def release_lease(lease_token: str) -> int:
+    """
+    Hands the items still held under a lease back to the queue without
+    counting an attempt (the lease's tries increment is undone). Used when a
+    worker gives a lease up before doing anything with it. Returns how many
+    items were released.
+    """
+    result = await collection(QUEUE_COLL).update_many(
+        {"lease_token": lease_token, "status": "processing"},
+        {"$set": {"status": "queued", "lease_token": None, "locked_until": None}, "$inc": {"tries": -1}}
+    )
+    return result.modified_count
 
-    # Find the item to get current tries count
-    item = await coll.find_one({"public_id": public_id, "status": "processing"})
-    if not item:
-        print(f"Warning: Could not find item {public_id} in processing state to mark as failed.")
+async def record_merkle_pending(lease_token: str, entries: List[Dict]) -> None:
+    """
+    Stores each leaf's Merkle position on its queue item before the root is
+    broadcast, so a re-lease after a timeout or crash can still record the
+    proof if that root made it on-chain.
+    Each entry: {"public_id", "merkle": {"root", "proof", "leaf_index", "leaf_count"}}.
+    """
+    if not entries:
         return
+    await collection(QUEUE_COLL).bulk_write(
+        [UpdateOne(_leased(e["public_id"], lease_token), {"$set": {"merkle": e["merkle"]}}) for e in entries],
+        ordered=False,
+    )
+
+async def record_merkle_tx(lease_token: str, root: str, tx_hash: str) -> None:
+    """Adds the broadcast tx hash to the pending Merkle positions of a lease's root."""
+    await collection(QUEUE_COLL).update_many(
+        {"lease_token": lease_token, "merkle.root": root},
+        {"$set": {"merkle.tx_hash": tx_hash}}
+    )
+
+async def fetch_one_and_lock() -> Optional[Dict]:
+    """
+    Leases a single item (next in scheduling order). Returns the item or None if queue is empty or items are locked.
+    """
+    items = await lease_batch(1)
+    return items[0] if items else None
 
-    current_tries = item.get("tries", 0) # Tries was already incremented by fetch_one_and_lock
-    
-    update_doc = {
+def _done_update(tx_hash: str, anchored_at_iso: str, gas_used: Optional[float] = None) -> Dict:
+    fields = {"status": "anchored", "tx_hash": tx_hash, "anchored_at": anchored_at_iso,
+              "locked_until": None, "lease_token": None}
+    if gas_used is not None:
+        fields["gas_used"] = gas_used
+    return {"$set": fields}
+
+def _failed_update(reason: str, is_permanent: bool, now_iso: str) -> List[Dict]:
+    """
+    Pipeline update deciding retry vs. DLQ server-side from the stored tries
+    (already incremented by the lease), so a failure is a single round trip.
+    """
+    to_failed = True if is_permanent else {"$gte": ["$tries", MAX_RETRIES]}
+    return [{
         "$set": {
-            "last_error": reason,
+            "last_error": {"$literal": reason},
             "last_try": now_iso,
-             # Unlock immediately on failure to allow retry
-            "locked_until": None 
+            # Unlock immediately on failure to allow retry
+            "locked_until": None,
+            "lease_token": None,
+            "status": {"$cond": [to_failed, "failed", "queued"]},
         }
-    }
+    }]
 
-    if is_permanent or current_tries >= MAX_RETRIES:
-        # Max retries reached or permanent error, mark as permanently failed (DLQ)
-        update_doc["$set"]["status"] = "failed"
-        print(f"Item {public_id} reached max retries ({current_tries}/{MAX_RETRIES}) or had permanent error. Moving to 'failed' state.")
-    else:
-        # Still retryable, set back to queued
-        update_doc["$set"]["status"] = "queued"
-        print(f"Item {public_id} failed, attempt {current_tries}/{MAX_RETRIES}. Re-queueing.")
+async def complete_many(lease_token: str, done: List[Dict]) -> None:
+    """
+    Records anchored items of one lease: one bulk_write on the queue (guarded
+    by the lease token) and one on craftids.
+    Each entry: {"public_id", "tx_hash", "anchored_at", optional "gas_used" (this
+    item's share of the tx), optional "craftid": {extra fields to $set}}.
+    """
+    if not done:
+        return
+    queue_ops = []
+    craft_ops = []
+    for d in done:
+        queue_ops.append(UpdateOne(_leased(d["public_id"], lease_token), _done_update(d["tx_hash"], d["anchored_at"], d.get("gas_used"))))
+        fields = {"status": "anchored", "tx_hash": d["tx_hash"], "anchored_at": d["anchored_at"]}
+        fields.update(d.get("craftid") or {})
+        # Never overwrite the anchoring record of a craftid that is already anchored
+        craft_ops.append(UpdateOne({"public_id": d["public_id"], "status": {"$ne": "anchored"}}, {"$set": fields}))
+    await collection(QUEUE_COLL).bulk_write(queue_ops, ordered=False)
+    await collection("craftids").bulk_write(craft_ops, ordered=False)
+    QUEUE_COMPLETED.inc(len(done))
+
+async def fail_many(lease_token: str, failures: List[Dict]) -> None:
+    """
+    Records failed items of one lease: one bulk_write on the queue (retry or
+    DLQ decided server-side) and one on craftids for permanent failures.
+    Each entry: {"public_id", "reason", optional "is_permanent"}.
+    """
+    if not failures:
+        return
+    now_iso = datetime.now(timezone.utc).isoformat()
+    queue_ops = []
+    craft_ops = []
+    for f in failures:
+        permanent = bool(f.get("is_permanent"))
+        queue_ops.append(UpdateOne(_leased(f["public_id"], lease_token), _failed_update(f["reason"], permanent, now_iso)))
+        if permanent:
+            # Never mark failed a craftid another worker has anchored meanwhile
+            craft_ops.append(UpdateOne(
+                {"public_id": f["public_id"], "status": {"$ne": "anchored"}},
+                {"$set": {"status": "failed", "last_error": f["reason"]}}
+            ))
+    await collection(QUEUE_COLL).bulk_write(queue_ops, ordered=False)
+    if craft_ops:
+        await collection("craftids").bulk_write(craft_ops, ordered=False)
+    QUEUE_FAILED.inc(len(craft_ops), kind="permanent")
+    QUEUE_FAILED.inc(len(failures) - len(craft_ops), kind="retryable")
 
+async def mark_done(public_id: str, tx_hash: str, anchored_at_iso: str, lease_token: str) -> None:
+    """Marks an item as done if it is still processing under our lease."""
+    await collection(QUEUE_COLL).update_one(
+        _leased(public_id, lease_token), # Ensure we only update items we locked
+        _done_update(tx_hash, anchored_at_iso)
+    )
 
-    await coll.update_one(
-        {"public_id": public_id, "status": "processing"}, # Only update if still processing
-        update_doc
+async def mark_failed(public_id: str, reason: str, lease_token: str, is_permanent: bool = False) -> None:
+    """Re-queues the item, or moves it to 'failed' if max retries reached or if permanent. One round trip."""
+    now_iso = datetime.now(timezone.utc).isoformat()
+    item = await collection(QUEUE_COLL).find_one_and_update(
+        _leased(public_id, lease_token), # Only update if still processing under our lease
+        _failed_update(reason, is_permanent, now_iso),
+        projection={"status": 1, "tries": 1},
+        return_document=ReturnDocument.AFTER
     )
+    if not item:
+        print(f"Warning: Could not find item {public_id} in processing state to mark as failed.")
+        return
+
+    current_tries = item.get("tries", 0)
+    if item["status"] == "failed":
+        print(f"Item {public_id} reached max retries ({current_tries}/{MAX_RETRIES}) or had permanent error. Moved to 'failed' state.")
+    else:
+        print(f"Item {public_id} failed, attempt {current_tries}/{MAX_RETRIES}. Re-queued.")
 
-async def fetch_failed_items(limit: int = 10) -> List[Dict]:
-     """Optional Helper for DLQ Inspection."""
+async def fetch_failed_items(limit: int = 10, include_archived: bool = True) -> List[Dict]:
+     """
+     Optional Helper for DLQ Inspection: the most recently tried failed items,
+     from the live queue and (unless include_archived=False) the archive.
+     Archived items carry `archived_at`.
+     """
      coll = collection(QUEUE_COLL)
      cursor = coll.find({"status": "failed"}).sort("last_try", -1).limit(limit)
-     return await cursor.to_list(length=limit)
\ No newline at end of file
+     items = await cursor.to_list(length=limit)
+     if include_archived:
+         archived = collection(ARCHIVE_COLL).find({"status": "failed"}).sort("last_try", -1).limit(limit)
+         items += await archived.to_list(length=limit)
+         items.sort(key=lambda d: d.get("last_try") or "", reverse=True)
+     return items[:limit]
+
+async def queue_summary(latency_sample: int = 1000) -> Dict:
+    """
+    Queue health from a single aggregation over anchor_queue ($facet):
+    depth and oldest item per status, the tries distribution, and
+    create->anchor latency / gas per item over the last `latency_sample`
+    anchored items. Anchored items are usually archived already, so the
+    recent ones are pulled in from the archive ($unionWith) for the latency
+    facet only; depth and tries cover the live queue.
+    """
+    live_only = {"$match": {"archived_at": {"$exists": False}}}
+    pipeline = [{
+        "$unionWith": {
+            "coll": ARCHIVE_COLL,
+            "pipeline": [
+                {"$match": {"status": "anchored"}},
+                {"$sort": {"anchored_at": -1}},
+                {"$limit": latency_sample},
+            ],
+        }
+    }, {
+        "$facet": {
+            "by_status": [
+                live_only,
+                {"$group": {"_id": "$status", "count": {"$sum": 1}, "oldest_created_at": {"$min": "$created_at"},
+                            "avg_tries": {"$avg": "$tries"}, "max_tries": {"$max": "$tries"}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "tries": [
+                live_only,
+                {"$group": {"_id": "$tries", "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "anchored": [
+                {"$match": {"status": "anchored"}},
+                {"$sort": {"anchored_at": -1}},
+                {"$limit": latency_sample},
+                {"$project": {
+                    "gas_used": 1,
+                    "latency_ms": {"$subtract": [iso_to_date("$anchored_at"), iso_to_date("$created_at")]},
+                }},
+                {"$group": {"_id": None, "count": {"$sum": 1},
+                            "avg_latency_ms": {"$avg": "$latency_ms"}, "max_latency_ms": {"$max": "$latency_ms"},
+                            "avg_gas_used": {"$avg": "$gas_used"}}},
+            ],
+        }
+    }]
+    result = await collection(QUEUE_COLL).aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {"by_status": [], "tries": [], "anchored": []}
+
+    now = datetime.now(timezone.utc)
+    by_status = {}
+    for row in facets["by_status"]:
+        oldest = row.get("oldest_created_at")
+        age = None
+        if isinstance(oldest, str):
+            try:
+                age = round((now - datetime.fromisoformat(oldest)).total_seconds(), 1)
+            except ValueError:
+                pass
+        by_status[row["_id"] or "unknown"] = {
+            "count": row["count"],
+            "oldest_created_at": oldest,
+            "oldest_age_seconds": age,
+            "avg_tries": round(row["avg_tries"], 2) if row.get("avg_tries") is not None else None,
+            "max_tries": row.get("max_tries"),
+        }
+    anchored = facets["anchored"][0] if facets["anchored"] else {}
+    to_seconds = lambda ms: round(ms / 1000, 1) if ms is not None else None
+    return {
+        "total": sum(s["count"] for s in by_status.values()),
+        "by_status": by_status,
+        "tries": {str(row["_id"]): row["count"] for row in facets["tries"]},
+        "recent_anchored": {
+            "sample": anchored.get("count", 0),
+            "avg_create_to_anchor_seconds": to_seconds(anchored.get("avg_latency_ms")),
+            "max_create_to_anchor_seconds": to_seconds(anchored.get("max_latency_ms")),
+            "avg_gas_used_per_item": round(anchored["avg_gas_used"]) if anchored.get("avg_gas_used") is not None else None,
+        },
+        "generated_at": now.isoformat(),
+    }
@@ -9,11 +9,16 @@ from cryptography.exceptions import InvalidSignature
 SIGNER_KEY_PATH = os.getenv("SIGNER_KEY_PATH")
 PLATFORM_PUBKEY_PATH = os.getenv("PLATFORM_PUBKEY_PATH")
 
-# Add checks to fail fast if the environment variables are missing
-if not SIGNER_KEY_PATH:
-    raise EnvironmentError("SIGNER_KEY_PATH environment variable not set.")
-if not PLATFORM_PUBKEY_PATH:
-    raise EnvironmentError("PLATFORM_PUBKEY_PATH environment variable not set.")
+def check_signer_config() -> None:
+    """
+    Fails fast if the environment variables are missing. Called by the key
+    loaders and the API's startup hook, so importing this module has no
+    side effects.
+    """
+    if not SIGNER_KEY_PATH:
+        raise EnvironmentError("SIGNER_KEY_PATH environment variable not set.")
+    if not PLATFORM_PUBKEY_PATH:
+        raise EnvironmentError("PLATFORM_PUBKEY_PATH environment variable not set.")
 
 # Cache for the loaded keys
 _priv_key_cache = None
@@ -26,6 +31,7 @@ def _load_private_key():
     global _priv_key_cache
     if _priv_key_cache:
         return _priv_key_cache
+    check_signer_config()
     
     try:
         # This will now correctly open /run/secrets/sign_priv.pem in Cloud Run
@@ -62,6 +68,7 @@ def _load_public_key():
     global _pub_key_cache
     if _pub_key_cache:
         return _pub_key_cache
+    check_signer_config()
     
     try:
         with open(PLATFORM_PUBKEY_PATH, "rb") as pem_file:
@@ -3,6 +3,7 @@ import asyncio
 import logging
 from datetime import datetime, timezone
 import time
+from typing import Dict
 
 # ---------- Logging ----------
 def get_logger(name: str = "chain") -> logging.Logger:
@@ -27,6 +28,10 @@ def sleep(seconds: float):
     """Async-friendly sleep helper."""
     return asyncio.sleep(seconds)
 
+def iso_to_date(field: str) -> Dict:
+    """Aggregation expression parsing an ISO timestamp string field ("$field") to a date; null if unparsable."""
+    return {"$dateFromString": {"dateString": field, "onError": None, "onNull": None}}
+
 # ---------- Retry ----------
 async def with_retries(coro_func, *args, retries=3, delay=3, backoff=2, logger=None, **kwargs):
     """
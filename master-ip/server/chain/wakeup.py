@@ -0,0 +1,142 @@
+# master-ip/server/chain/wakeup.py
+"""
+Wakes the batcher as soon as something is enqueued, instead of letting new
+items wait out the poll interval.
+
+Two triggers, both optional:
+  * a Mongo change stream on anchor_queue inserts (needs a replica set / Atlas);
+    the resume token is kept so a dropped stream reconnects without missing
+    inserts, and a lost token forces a catch-up poll;
+  * a local stand-in for deployments without change streams: enqueue_item sends
+    a one-byte UDP datagram to 127.0.0.1:QUEUE_WAKEUP_PORT (the API and the
+    batcher share a container, see entrypoint.sh).
+
+run_loop keeps polling as a fallback; a wakeup only cuts its sleep short.
+"""
+import asyncio
+import socket
+from typing import List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from chain.utils import get_logger
+from app.db.mongodb import collection
+from app.constant import QUEUE_WAKEUP_MODE, QUEUE_WAKEUP_PORT
+
+logger = get_logger("chain.wakeup")
+
+# Server error codes: change streams unsupported (standalone) / resume token too old
+CHANGE_STREAM_UNSUPPORTED = 40573
+CHANGE_STREAM_HISTORY_LOST = 286
+RECONNECT_MAX_DELAY = 60
+
+
+def notify_local_wakeup() -> None:
+    """Fire-and-forget loopback datagram to a batcher on this host. Never raises."""
+    if QUEUE_WAKEUP_MODE not in ("auto", "local"):
+        return
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b"1", ("127.0.0.1", QUEUE_WAKEUP_PORT))
+    except OSError:
+        pass  # No batcher listening; it will pick the item up on its next poll
+
+
+class _WakeupProtocol(asyncio.DatagramProtocol):
+    def __init__(self, wakeup: "QueueWakeup"):
+        self.wakeup = wakeup
+
+    def datagram_received(self, data, addr):
+        self.wakeup.notify("local")
+
+
+class QueueWakeup:
+    """Event the batcher sleeps on between polls; set by either trigger."""
+
+    def __init__(self, coll_name: str, mode: str = QUEUE_WAKEUP_MODE):
+        self.coll_name = coll_name
+        self.mode = mode
+        self.resume_token = None
+        self.change_stream_active = False
+        self._event = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._transport: Optional[asyncio.DatagramTransport] = None
+
+    def notify(self, source: str) -> None:
+        if not self._event.is_set():
+            logger.debug(f"Queue wakeup ({source})")
+        self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Sleeps up to `timeout` seconds; True if woken by a trigger."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            woke = True
+        except asyncio.TimeoutError:
+            woke = False
+        self._event.clear()
+        return woke
+
+    async def start(self) -> None:
+        if self.mode in ("auto", "local"):
+            await self._start_local_listener()
+        if self.mode in ("auto", "change_stream"):
+            self._tasks.append(asyncio.create_task(self._watch_inserts()))
+        if self.mode == "poll":
+            logger.info("Queue wakeup disabled; polling only.")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def _start_local_listener(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: _WakeupProtocol(self), local_addr=("127.0.0.1", QUEUE_WAKEUP_PORT),
+                # Several workers on one host share the port; the kernel hands each datagram to one of them
+                reuse_port=hasattr(socket, "SO_REUSEPORT"),
+            )
+            logger.info(f"Listening for local enqueue wakeups on udp://127.0.0.1:{QUEUE_WAKEUP_PORT}")
+        except OSError as e:
+            # e.g. the port is taken by another process
+            logger.warning(f"Local wakeup listener unavailable ({e}); relying on change stream/polling.")
+
+    async def _watch_inserts(self) -> None:
+        """Change stream on queue inserts, reconnecting from the last resume token."""
+        delay = 1
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with collection(self.coll_name).watch(pipeline, resume_after=self.resume_token) as stream:
+                    if not self.change_stream_active:
+                        logger.info(f"Watching {self.coll_name} inserts via change stream.")
+                    self.change_stream_active = True
+                    delay = 1
+                    async for _ in stream:
+                        self.resume_token = stream.resume_token
+                        self.notify("change_stream")
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.warning("Change streams need a replica set; falling back to local wakeups and polling.")
+                    self.change_stream_active = False
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # Inserts since the token may be gone from the oplog: start fresh and poll once now
+                    logger.warning("Change stream resume token expired; restarting stream and polling.")
+                    self.resume_token = None
+                    self.notify("resume_lost")
+                    continue
+                logger.warning(f"Change stream error: {e}. Reconnecting in {delay}s.")
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted: {e}. Reconnecting in {delay}s.")
+            self.change_stream_active = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
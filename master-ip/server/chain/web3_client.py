@@ -1,32 +1,63 @@
 import os
 import time
-from web3 import Web3
+import asyncio
+import aiohttp
+from eth_account import Account
+from hexbytes import HexBytes
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3
 try:
-    # Try newer web3.py import path (v6+)
+    # web3.py v7+: one POA middleware for sync and async
     from web3.middleware import ExtraDataToPOAMiddleware
-    geth_poa_middleware = ExtraDataToPOAMiddleware
+    async_geth_poa_middleware = ExtraDataToPOAMiddleware
 except ImportError:
-    # Fallback to older import path (v5)
-    from web3.middleware import geth_poa_middleware
-from web3.exceptions import TransactionNotFound
-from typing import Tuple
+    # web3.py v6
+    from web3.middleware import async_geth_poa_middleware
+from web3.exceptions import TransactionNotFound, ContractLogicError, BadFunctionCallOutput
+from collections import deque
+from urllib.parse import urlparse
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from chain.utils import get_logger
+from chain.metrics import RECEIPT_LATENCY, RPC_REQUESTS, RPC_EWMA_LATENCY, RPC_ERROR_RATE, RPC_HEDGED
+
+from app.constant import (
+    WEB3_RECEIPT_TIMEOUT, MAX_IN_FLIGHT_TXS,
+    CONFIRMATION_DEPTH, RECEIPT_POLL_INTERVAL, RECEIPT_POLL_MAX_INTERVAL,
+    RPC_TIMEOUT_SECONDS, RPC_POOL_SIZE, RPC_KEEPALIVE_SECONDS,
+    RPC_EWMA_ALPHA, RPC_MAX_CONSECUTIVE_ERRORS, RPC_COOLDOWN_SECONDS, RPC_HEDGING, RPC_HEDGE_DELAY_SECONDS,
+    SIGNER_HEALTH_INTERVAL, SIGNER_MIN_BALANCE_WEI, SIGNER_STUCK_SECONDS, SIGNER_MAX_SEND_ERRORS,
+    FEE_CACHE_SECONDS, FEE_HISTORY_BLOCKS, FEE_PRIORITY_PERCENTILE, MIN_PRIORITY_FEE_WEI, MAX_FEE_PER_GAS_WEI,
+    FEE_BUMP_PERCENT, STUCK_TX_SECONDS, MAX_FEE_BUMPS, RECEIPT_NONCE_CHECK_MAX_FAILURES,
+    GAS_ESTIMATE_MARGIN, GAS_CACHE_SECONDS,
+    ANCHOR_BATCH_FUNCTIONS, ANCHOR_BATCH_MAX,
+)
+
+logger = get_logger("chain.web3_client")
 
 RPC = os.getenv("WEB3_RPC_URL")
+# Optional extra endpoints (comma-separated) for reads and failover; WEB3_RPC_URL stays the preferred write endpoint
+RPC_URLS = list(dict.fromkeys([RPC] + [u.strip() for u in os.getenv("WEB3_RPC_URLS", "").split(",") if u.strip()]))
 CONTRACT_ADDR = os.getenv("ANCHOR_CONTRACT_ADDRESS")
 ANCHORER_PRIVATE_KEY_PATH = os.getenv("ANCHORER_PRIVATE_KEY") # Renamed for clarity
+# Optional pool of anchorer key files (comma-separated paths); overrides ANCHORER_PRIVATE_KEY
+ANCHORER_PRIVATE_KEY_PATHS = [p.strip() for p in os.getenv("ANCHORER_PRIVATE_KEYS", "").split(",") if p.strip()]
 CHAIN_ID = int(os.getenv("CHAIN_ID", "80002"))  # Amoy default
 
 # --- Fail-fast Checks ---
-if not RPC:
-    raise EnvironmentError("WEB3_RPC_URL environment variable not set.")
-if not CONTRACT_ADDR:
-    raise EnvironmentError("ANCHOR_CONTRACT_ADDRESS environment variable not set.")
-if not ANCHORER_PRIVATE_KEY_PATH:
-    # Changed variable name in error message
-    raise EnvironmentError("ANCHORER_PRIVATE_KEY environment variable (containing the path) not set.")
+# Run when the first client is built (or from startup hooks), not at import:
+# importing this module must stay cheap and side-effect free.
+def check_chain_config() -> None:
+    """Raises EnvironmentError if the chain settings are missing."""
+    if not RPC:
+        raise EnvironmentError("WEB3_RPC_URL environment variable not set.")
+    if not CONTRACT_ADDR:
+        raise EnvironmentError("ANCHOR_CONTRACT_ADDRESS environment variable not set.")
+    if not ANCHORER_PRIVATE_KEY_PATH and not ANCHORER_PRIVATE_KEY_PATHS:
+        # Changed variable name in error message
+        raise EnvironmentError("ANCHORER_PRIVATE_KEY environment variable (containing the path) not set.")
 # --- End Checks ---
 
-# Minimal ABI for CraftAnchor (anchor + isAnchored view)
+# Minimal ABI for CraftAnchor (anchor/anchorBatch/anchorRoot + isAnchored/isAnchoredBatch/getAnchorRecords/isRootAnchored views)
 CRAFT_ANCHOR_ABI = [
     # ... (ABI remains the same) ...
     {
@@ -42,41 +73,349 @@ CRAFT_ANCHOR_ABI = [
       "outputs":[{"internalType":"bool","name":"","type":"bool"},{"internalType":"uint256","name":"","type":"uint256"}],
       "stateMutability":"view",
       "type":"function"
+    },
+    {
+      "inputs":[{"internalType":"bytes32[]","name":"hashes","type":"bytes32[]"},{"internalType":"string[]","name":"publicIds","type":"string[]"}],
+      "name":"anchorBatch",
+      "outputs":[{"internalType":"uint256","name":"anchored","type":"uint256"}],
+      "stateMutability":"nonpayable",
+      "type":"function"
+    },
+    {
+      "inputs":[{"internalType":"bytes32[]","name":"hashes","type":"bytes32[]"}],
+      "name":"isAnchoredBatch",
+      "outputs":[{"internalType":"bool[]","name":"exists","type":"bool[]"},{"internalType":"uint256[]","name":"timestamps","type":"uint256[]"}],
+      "stateMutability":"view",
+      "type":"function"
+    },
+    {
+      "inputs":[{"internalType":"bytes32[]","name":"hashes","type":"bytes32[]"}],
+      "name":"getAnchorRecords",
+      "outputs":[{"internalType":"string[]","name":"publicIds","type":"string[]"},{"internalType":"uint256[]","name":"timestamps","type":"uint256[]"},{"internalType":"bool[]","name":"exists","type":"bool[]"}],
+      "stateMutability":"view",
+      "type":"function"
+    },
+    {
+      "inputs":[{"internalType":"bytes32","name":"root","type":"bytes32"},{"internalType":"uint256","name":"leafCount","type":"uint256"}],
+      "name":"anchorRoot",
+      "outputs":[],
+      "stateMutability":"nonpayable",
+      "type":"function"
+    },
+    {
+      "inputs":[{"internalType":"bytes32","name":"root","type":"bytes32"}],
+      "name":"isRootAnchored",
+      "outputs":[{"internalType":"bool","name":"","type":"bool"},{"internalType":"uint256","name":"","type":"uint256"}],
+      "stateMutability":"view",
+      "type":"function"
+    },
+    {
+      "anonymous":False,
+      "inputs":[
+        {"indexed":True,"internalType":"bytes32","name":"hash","type":"bytes32"},
+        {"indexed":False,"internalType":"string","name":"publicId","type":"string"},
+        {"indexed":False,"internalType":"uint256","name":"timestamp","type":"uint256"},
+        {"indexed":True,"internalType":"address","name":"anchor","type":"address"}
+      ],
+      "name":"HashAnchored",
+      "type":"event"
     }
 ]
 
-# Initialize Web3 with POA middleware (required for Polygon)
-WEB3 = Web3(Web3.HTTPProvider(RPC))
-WEB3.middleware_onion.inject(geth_poa_middleware, layer=0)
+# topic0 of HashAnchored logs (chain/indexer.py scans for these)
+HASH_ANCHORED_TOPIC = Web3.to_hex(Web3.keccak(text="HashAnchored(bytes32,string,uint256,address)"))
+
+# "eth-tester://" runs an in-process test chain (see chain/devchain.py)
+ETH_TESTER_RPC = "eth-tester://"
+
+# --- RPC endpoint pool ---
+
+RPC_LATENCY_SAMPLE = 200   # latencies kept per endpoint for its p95
+RPC_P95_MIN_SAMPLES = 20
+
+
+class RpcEndpoint:
+    """One JSON-RPC URL with its own AsyncWeb3 client and routing stats (EWMA latency / error rate)."""
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name                           # host only: provider URLs often embed API keys
+        self.w3 = AsyncWeb3(_make_provider(url, self))
+        # POA middleware (required for Polygon)
+        self.w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.latencies: Deque[float] = deque(maxlen=RPC_LATENCY_SAMPLE)
+
+    def record(self, seconds: float, ok: bool, cancelled: bool = False) -> None:
+        """
+        Feeds one request. A request cancelled by a faster hedge still counts
+        its elapsed time as latency (a lower bound), not as an error.
+        """
+        a = RPC_EWMA_ALPHA
+        if ok:
+            self.ewma_latency = seconds if self.ewma_latency is None else a * seconds + (1 - a) * self.ewma_latency
+            self.latencies.append(seconds)
+            self.consecutive_errors = 0
+        else:
+            self.consecutive_errors += 1
+            if self.consecutive_errors >= RPC_MAX_CONSECUTIVE_ERRORS:
+                if self.healthy:
+                    logger.warning(f"RPC endpoint {self.name} failed {self.consecutive_errors} calls in a row; "
+                                   f"skipping it for {RPC_COOLDOWN_SECONDS}s")
+                self.cooldown_until = time.monotonic() + RPC_COOLDOWN_SECONDS
+        self.error_rate = a * (0.0 if ok else 1.0) + (1 - a) * self.error_rate
+        RPC_REQUESTS.inc(endpoint=self.name, outcome="cancelled" if cancelled else "ok" if ok else "error")
+        RPC_EWMA_LATENCY.set(self.ewma_latency or 0, endpoint=self.name)
+        RPC_ERROR_RATE.set(round(self.error_rate, 4), endpoint=self.name)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    @property
+    def score(self) -> float:
+        """Lower is better; endpoints without samples score 0 so they get measured."""
+        return (self.ewma_latency or 0.0) * (1 + 4 * self.error_rate)
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < RPC_P95_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.name,
+            "healthy": self.healthy,
+            "ewma_latency": self.ewma_latency,
+            "p95": self.p95(),
+            "error_rate": round(self.error_rate, 4),
+        }
+
+
+class _TimedHTTPProvider(AsyncHTTPProvider):
+    """AsyncHTTPProvider reporting every request's latency / transport failure to its pool endpoint."""
+
+    def __init__(self, endpoint_uri: str, pool_endpoint: RpcEndpoint, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self._pool_endpoint = pool_endpoint
+
+    async def make_request(self, method, params):
+        start = time.monotonic()
+        try:
+            response = await super().make_request(method, params)
+        except asyncio.CancelledError:
+            self._pool_endpoint.record(time.monotonic() - start, ok=True, cancelled=True)
+            raise
+        except Exception:
+            self._pool_endpoint.record(time.monotonic() - start, ok=False)
+            raise
+        # JSON-RPC errors (reverts, bad params) are answers too: the endpoint is fine
+        self._pool_endpoint.record(time.monotonic() - start, ok=True)
+        return response
+
+
+def _make_provider(url: str = RPC, pool_endpoint: Optional[RpcEndpoint] = None):
+    if url == ETH_TESTER_RPC:
+        from web3.providers.eth_tester import AsyncEthereumTesterProvider
+        return AsyncEthereumTesterProvider()
+    kwargs: Dict[str, Any] = {"request_kwargs": {"timeout": aiohttp.ClientTimeout(total=RPC_TIMEOUT_SECONDS)}}
+    if len(RPC_URLS) > 1:
+        # The pool fails over to another endpoint instead of retrying the same one
+        kwargs["exception_retry_configuration"] = None
+    if pool_endpoint is None:
+        return AsyncHTTPProvider(url, **kwargs)
+    return _TimedHTTPProvider(url, pool_endpoint, **kwargs)
+
+
+class RpcPool:
+    """
+    Routes JSON-RPC traffic over WEB3_RPC_URL + WEB3_RPC_URLS: reads go to the
+    healthy endpoint with the lowest EWMA latency (weighted by its error
+    rate), writes (raw txs, pending nonces) to the preferred WEB3_RPC_URL
+    unless it is cooling down after RPC_MAX_CONSECUTIVE_ERRORS failures.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.endpoints: List[RpcEndpoint] = []
+        for i, url in enumerate(urls):
+            name = urlparse(url).hostname or f"endpoint{i}"
+            if any(ep.name == name for ep in self.endpoints):
+                name = f"{name}#{i}"
+            self.endpoints.append(RpcEndpoint(url, name))
+
+    def ranked(self) -> List[RpcEndpoint]:
+        """Healthy endpoints best first, then the ones cooling down (soonest back first)."""
+        healthy = sorted((ep for ep in self.endpoints if ep.healthy), key=lambda ep: ep.score)
+        cooling = sorted((ep for ep in self.endpoints if not ep.healthy), key=lambda ep: ep.cooldown_until)
+        return healthy + cooling
+
+    def read(self) -> RpcEndpoint:
+        return self.ranked()[0]
+
+    def write(self) -> RpcEndpoint:
+        preferred = self.endpoints[0]
+        return preferred if preferred.healthy else self.read()
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [ep.status() for ep in self.endpoints]
+
+
+_rpc_pool: Optional[RpcPool] = None
+
+def get_rpc_pool() -> RpcPool:
+    """The endpoint pool, built (and the chain settings checked) on first use."""
+    global _rpc_pool
+    if _rpc_pool is None:
+        check_chain_config()
+        _rpc_pool = RpcPool([RPC] if RPC == ETH_TESTER_RPC else RPC_URLS)
+    return _rpc_pool
+
+def _default_w3() -> AsyncWeb3:
+    """The preferred endpoint's client: default contract binding, ABI codec, eth-tester requests."""
+    return get_rpc_pool().endpoints[0].w3
+
+def __getattr__(name: str):
+    # `web3_client.WEB3` still works, without building the pool at import
+    if name == "WEB3":
+        return _default_w3()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- Keep-alive HTTP session (shared by the provider and raw JSON-RPC batches) ---
+_http_session: Optional[aiohttp.ClientSession] = None
+_http_session_loop = None
+
+async def _get_http_session() -> aiohttp.ClientSession:
+    """One pooled keep-alive aiohttp session per event loop."""
+    global _http_session, _http_session_loop
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        connector = aiohttp.TCPConnector(limit=RPC_POOL_SIZE, keepalive_timeout=RPC_KEEPALIVE_SECONDS)
+        _http_session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Content-Type": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=RPC_TIMEOUT_SECONDS),
+        )
+        _http_session_loop = loop
+        if RPC != ETH_TESTER_RPC:
+            for ep in get_rpc_pool().endpoints:
+                await ep.w3.provider.cache_async_session(_http_session)
+    return _http_session
+
+
+async def _w3(write: bool = False) -> AsyncWeb3:
+    """
+    An AsyncWeb3 client with the pooled HTTP session in place: the fastest
+    healthy endpoint's for reads, the preferred endpoint's for writes.
+    """
+    if RPC != ETH_TESTER_RPC:
+        await _get_http_session()
+    pool = get_rpc_pool()
+    return (pool.write() if write else pool.read()).w3
+
+
+async def _with_failover(call: Callable[[RpcEndpoint], Awaitable[Any]], attempts: int = 2) -> Any:
+    """call(endpoint) on the best endpoint, retried once on the runner-up if it raises."""
+    error: Optional[Exception] = None
+    for ep in get_rpc_pool().ranked()[:max(attempts, 1)]:
+        try:
+            return await call(ep)
+        except Exception as e:
+            error = e
+    raise error
+
+
+async def _hedged(call: Callable[[RpcEndpoint], Awaitable[Any]]) -> Any:
+    """
+    Hedged read: call(endpoint) on the best endpoint; if it has not answered
+    within that endpoint's p95 latency (RPC_HEDGE_DELAY_SECONDS until enough
+    samples), the same call is raced on the runner-up and the first success
+    wins (the loser is cancelled). A fast failure fails over instead.
+    """
+    ranked = get_rpc_pool().ranked()
+    if not RPC_HEDGING or len(ranked) < 2:
+        return await _with_failover(call)
+    first, second = ranked[0], ranked[1]
+    primary = asyncio.ensure_future(call(first))
+    pending = {primary}
+    try:
+        try:
+            return await asyncio.wait_for(asyncio.shield(primary), first.p95() or RPC_HEDGE_DELAY_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            pending.clear()
+            return await call(second)
+        backup = asyncio.ensure_future(call(second))
+        pending.add(backup)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    RPC_HEDGED.inc(winner="primary" if task is primary else "backup")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def close_chain_client() -> None:
+    """Closes the pooled HTTP session (call on shutdown)."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
 
 # --- NEW: Function to load the private key from file ---
-_anchor_key_cache = None
+_anchor_key_cache: Dict[str, str] = {}
 
-def _load_anchor_private_key():
-    """Loads the anchorer private key from the file path."""
-    global _anchor_key_cache
-    if _anchor_key_cache:
-        return _anchor_key_cache
+def _load_anchor_private_key(path: Optional[str] = None):
+    """Loads an anchorer private key from its file path (default: ANCHORER_PRIVATE_KEY)."""
+    path = path or ANCHORER_PRIVATE_KEY_PATH
+    if path in _anchor_key_cache:
+        return _anchor_key_cache[path]
 
     try:
-        with open(ANCHORER_PRIVATE_KEY_PATH, "r") as key_file:
+        with open(path, "r") as key_file:
             # Read the key, remove leading/trailing whitespace/newlines
             key_content = key_file.read().strip()
-            _anchor_key_cache = key_content
-            return _anchor_key_cache
+            _anchor_key_cache[path] = key_content
+            return key_content
     except FileNotFoundError:
-        raise FileNotFoundError(f"Anchorer private key file not found at path: {ANCHORER_PRIVATE_KEY_PATH}")
+        raise FileNotFoundError(f"Anchorer private key file not found at path: {path}")
     except (OSError, TypeError) as e:
         raise EnvironmentError(
             f"Failed to open anchorer private key file. "
-            f"Ensure ANCHORER_PRIVATE_KEY env var points to a valid FILE PATH. Error: {e}"
+            f"Ensure ANCHORER_PRIVATE_KEY(S) env var points to a valid FILE PATH. Error: {e}"
         )
     except Exception as e:
-         raise ValueError(f"Failed to read anchorer private key from {ANCHORER_PRIVATE_KEY_PATH}: {e}")
+         raise ValueError(f"Failed to read anchorer private key from {path}: {e}")
 # --- END NEW FUNCTION ---
 
-def _get_contract():
-    return WEB3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDR), abi=CRAFT_ANCHOR_ABI)
+_contracts: Dict[int, Any] = {}   # id(AsyncWeb3 client) -> contract
+_contract_addr = None
+
+def _get_contract(w3: Optional[AsyncWeb3] = None):
+    """
+    Contract object bound to `w3` (default: the preferred endpoint's client),
+    built once per client (rebuilt only if CONTRACT_ADDR changes).
+    """
+    global _contract_addr
+    w3 = w3 or _default_w3()
+    if _contract_addr != CONTRACT_ADDR:
+        _contracts.clear()
+        _contract_addr = CONTRACT_ADDR
+    contract = _contracts.get(id(w3))
+    if contract is None:
+        contract = w3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDR), abi=CRAFT_ANCHOR_ABI)
+        _contracts[id(w3)] = contract
+    return contract
 
 def _to_bytes32(hex_str: str) -> bytes:
     h = hex_str[2:] if hex_str.startswith("0x") else hex_str
@@ -89,78 +428,1060 @@ def _to_bytes32(hex_str: str) -> bytes:
         raise ValueError(f"Invalid public_hash provided to _to_bytes32: '{hex_str[:10]}...' - {e}") from e
 
 
-def anchor_hash_on_chain(hash_hex: str, public_id: str, wait_for_receipt: bool = True, timeout: int = 120) -> str:
-    """
-    Sends anchor(hash, public_id) tx and returns tx_hash hex string.
-    """
-    contract = _get_contract()
+_anchor_accounts: Dict[str, Any] = {}
+
+def _get_anchor_account(path: Optional[str] = None):
+    """Returns the LocalAccount for an anchorer key file, derived once per file."""
+    path = path or ANCHORER_PRIVATE_KEY_PATH
+    if path in _anchor_accounts:
+        return _anchor_accounts[path]
     # --- FIX: Load key content from file ---
-    anchor_key = _load_anchor_private_key()
+    anchor_key = _load_anchor_private_key(path)
     try:
-        acct = WEB3.eth.account.from_key(anchor_key)
+        _anchor_accounts[path] = Account.from_key(anchor_key)
     except ValueError as e:
          # Handle case where the key content itself is invalid hex
          raise ValueError(f"Invalid anchorer private key format loaded from file: {e}") from e
     # --- END FIX ---
+    return _anchor_accounts[path]
+
+
+# --- Nonce management ---
+
+class NonceManager:
+    """
+    Hands out nonces for one signer locally instead of calling
+    get_transaction_count before every tx, so up to `max_in_flight`
+    transactions can be pending at once. The local counter is resynced from
+    the `pending` block tag at start and after any send error.
+    """
+
+    def __init__(self, address: str, max_in_flight: int = MAX_IN_FLIGHT_TXS):
+        self.address = address
+        self.max_in_flight = max_in_flight
+        self._lock = asyncio.Lock()              # serializes reserve + broadcast (no nonce gaps)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._next_nonce: Optional[int] = None
+        self.in_flight: Dict[str, int] = {}      # tx hash -> nonce
+
+    async def _resync(self) -> None:
+        w3 = await _w3(write=True)
+        self._next_nonce = await w3.eth.get_transaction_count(self.address, "pending")
+
+    async def send(self, build_and_send: Callable[[int], Awaitable[str]]) -> str:
+        """
+        Reserves an in-flight slot and the next nonce, then awaits
+        build_and_send(nonce) -> tx_hash. The slot is held until
+        release(tx_hash) is called by whoever confirms the tx.
+        """
+        await self._slots.acquire()
+        try:
+            async with self._lock:
+                if self._next_nonce is None:
+                    await self._resync()
+                nonce = self._next_nonce
+                try:
+                    tx_hash = await build_and_send(nonce)
+                except Exception:
+                    # Nonce may or may not have been consumed (e.g. "nonce too low"); ask the node
+                    self._next_nonce = None
+                    raise
+                self._next_nonce = nonce + 1
+                self.in_flight[tx_hash] = nonce
+                return tx_hash
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, tx_hash: str, resync: bool = False) -> None:
+        """Frees the slot of a confirmed, failed or abandoned tx."""
+        if self.in_flight.pop(tx_hash, None) is not None:
+            self._slots.release()
+        if resync:
+            self._next_nonce = None
+
+
+# --- Signer pool ---
+
+class Signer:
+    """One anchorer account: its own nonce stream and in-flight limit, plus health."""
+
+    def __init__(self, account):
+        self.account = account
+        self.address = account.address
+        self.nonces = NonceManager(account.address)
+        self.balance_wei: Optional[int] = None
+        self.unhealthy_reason: Optional[str] = None
+        self.send_errors = 0                       # consecutive broadcast failures
+        self._mined_nonce: Optional[int] = None    # "latest" nonce at the last check
+        self._mined_nonce_since = time.monotonic()
+
+    @property
+    def healthy(self) -> bool:
+        return self.unhealthy_reason is None and self.send_errors < SIGNER_MAX_SEND_ERRORS
+
+    @property
+    def free_slots(self) -> int:
+        return self.nonces.max_in_flight - len(self.nonces.in_flight)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "reason": self.unhealthy_reason or (f"{self.send_errors} send errors" if not self.healthy else None),
+            "balance_wei": self.balance_wei,
+            "in_flight": len(self.nonces.in_flight),
+        }
+
+
+class _SentTx:
+    """A broadcast tx and its same-nonce replacements (newest last)."""
+    __slots__ = ("signer", "tx", "hashes", "bumps")
+
+    def __init__(self, signer: "Signer", tx: Dict[str, Any], tx_hash: str):
+        self.signer = signer
+        self.tx = tx
+        self.hashes = [tx_hash]
+        self.bumps = 0
+
+
+class SignerPool:
+    """
+    Shards transactions across several anchorer keys, each with its own
+    NonceManager, so submission is no longer serialized through one nonce
+    sequence. Every SIGNER_HEALTH_INTERVAL seconds balances and latest/pending
+    nonces of all signers are read in one JSON-RPC batch; a signer below
+    SIGNER_MIN_BALANCE_WEI, or whose pending txs have not advanced its mined
+    nonce for SIGNER_STUCK_SECONDS, is skipped until a later check clears it.
+    A signer with SIGNER_MAX_SEND_ERRORS consecutive broadcast errors is
+    skipped until its next successful check.
+    """
+
+    def __init__(self, accounts: List[Any]):
+        if not accounts:
+            raise EnvironmentError("No anchorer keys configured.")
+        self.signers = [Signer(a) for a in accounts]
+        self._by_tx: Dict[str, _SentTx] = {}  # original tx hash -> sent tx
+        self._rr = 0
+        self._last_check = 0.0
+        self._check_lock = asyncio.Lock()
+
+    async def check_health(self, force: bool = False) -> None:
+        async with self._check_lock:
+            if not force and time.monotonic() - self._last_check < SIGNER_HEALTH_INTERVAL:
+                return
+            calls = []
+            for s in self.signers:
+                calls += [
+                    ("eth_getBalance", [s.address, "latest"]),
+                    ("eth_getTransactionCount", [s.address, "latest"]),
+                    ("eth_getTransactionCount", [s.address, "pending"]),
+                ]
+            # Pending nonces as seen by the endpoint txs are sent to
+            results = await _rpc_batch(calls, write=True)
+            now = time.monotonic()
+            for i, s in enumerate(self.signers):
+                balance, mined, pending = results[3 * i: 3 * i + 3]
+                if any(isinstance(r, Exception) for r in (balance, mined, pending)):
+                    s.unhealthy_reason = "health check failed"
+                    continue
+                s.balance_wei, mined, pending = _to_int(balance), _to_int(mined), _to_int(pending)
+                if mined != s._mined_nonce:
+                    s._mined_nonce, s._mined_nonce_since = mined, now
+                if s.balance_wei < SIGNER_MIN_BALANCE_WEI:
+                    reason = f"balance {s.balance_wei} wei below minimum"
+                elif pending > mined and now - s._mined_nonce_since > SIGNER_STUCK_SECONDS:
+                    reason = f"{pending - mined} txs stuck since nonce {mined}"
+                else:
+                    reason = None
+                if reason != s.unhealthy_reason:
+                    if reason:
+                        logger.warning(f"Signer {s.address}: unhealthy ({reason})")
+                    else:
+                        logger.info(f"Signer {s.address}: healthy")
+                s.unhealthy_reason = reason
+                if reason is None:
+                    s.send_errors = 0
+            self._last_check = now
+
+    async def pick(self) -> Signer:
+        """The healthy signer with the most free in-flight slots (round-robin on ties)."""
+        try:
+            await self.check_health()
+        except Exception as e:
+            # Keep routing on the last known health rather than stopping submission
+            logger.warning(f"Signer health check failed: {e}")
+        healthy = [s for s in self.signers if s.healthy]
+        if not healthy:
+            raise RuntimeError("No healthy anchorer signer available: " +
+                               "; ".join(f"{s.address}: {s.status()['reason']}" for s in self.signers))
+        self._rr = (self._rr + 1) % len(healthy)
+        ordered = healthy[self._rr:] + healthy[:self._rr]
+        return max(ordered, key=lambda s: s.free_slots)
+
+    async def send(self, build_tx: Callable[[Any, int], Awaitable[Dict[str, Any]]]) -> str:
+        """
+        Picks a signer, reserves its next nonce and broadcasts
+        build_tx(account, nonce) signed with that account. Returns tx_hash hex.
+        """
+        signer = await self.pick()
+        sent: Dict[str, Any] = {}
+
+        async def _build_and_send(nonce: int) -> str:
+            sent["tx"] = await build_tx(signer.account, nonce)
+            return await _sign_and_send(signer.account, sent["tx"])
+
+        try:
+            tx_hash = await signer.nonces.send(_build_and_send)
+        except Exception:
+            signer.send_errors += 1
+            raise
+        signer.send_errors = 0
+        self._by_tx[tx_hash] = _SentTx(signer, sent["tx"], tx_hash)
+        return tx_hash
 
+    async def replace(self, tx_hash: str) -> Optional[str]:
+        """
+        Re-broadcasts a stuck tx with the same nonce and bumped fees. Returns the
+        replacement's hash, or None if the tx is unknown or out of bumps.
+        """
+        sent = self._by_tx.get(tx_hash)
+        if sent is None:
+            return None
+        if sent.bumps >= MAX_FEE_BUMPS:
+            # Out of bumps: re-broadcast the newest version so a node that dropped it picks it up again
+            await _sign_and_send(sent.signer.account, sent.tx)
+            return None
+        fees = bump_fees(sent.tx, await get_fee_oracle().fees(refresh=True))
+        tx = {**sent.tx, **fees}
+        new_hash = await _sign_and_send(sent.signer.account, tx)
+        sent.tx = tx
+        sent.bumps += 1
+        sent.hashes.append(new_hash)
+        return new_hash
+
+    async def nonce_state(self, tx_hash: str) -> Optional[str]:
+        """
+        What happened to the nonce of a sent tx, from one JSON-RPC batch:
+        "mined" (a version of it is in a block), "replaced" (the nonce was used
+        by some other tx), "dropped" (unmined and no node knows any version)
+        or "pending". None if the tx was not sent through this pool.
+        """
+        sent = self._by_tx.get(tx_hash)
+        if sent is None:
+            return None
+        calls = [("eth_getTransactionCount", [sent.signer.address, "latest"])]
+        calls += [("eth_getTransactionByHash", [h]) for h in sent.hashes]
+        results = await _rpc_batch(calls, write=True)
+        for r in results:
+            if isinstance(r, Exception):
+                raise r
+        mined_nonce, versions = _to_int(results[0]), results[1:]
+        if any(v and v.get("blockNumber") is not None for v in versions):
+            return "mined"
+        if mined_nonce > _to_int(sent.tx["nonce"]):
+            return "replaced"
+        return "pending" if any(versions) else "dropped"
+
+    def release(self, tx_hash: str, resync: bool = False) -> None:
+        sent = self._by_tx.pop(tx_hash, None)
+        if sent is not None:
+            sent.signer.nonces.release(tx_hash, resync=resync)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [s.status() for s in self.signers]
+
+
+_signer_pool: Optional[SignerPool] = None
+
+def get_signer_pool() -> SignerPool:
+    global _signer_pool
+    if _signer_pool is None:
+        check_chain_config()
+        paths = ANCHORER_PRIVATE_KEY_PATHS or [ANCHORER_PRIVATE_KEY_PATH]
+        _signer_pool = SignerPool([_get_anchor_account(p) for p in paths])
+    return _signer_pool
+
+
+# --- Fees and gas ---
+
+class FeeOracle:
+    """
+    EIP-1559 fees from eth_feeHistory over the last FEE_HISTORY_BLOCKS blocks,
+    cached for FEE_CACHE_SECONDS: priority fee = median of the
+    FEE_PRIORITY_PERCENTILE rewards (at least MIN_PRIORITY_FEE_WEI), max fee =
+    2 x next base fee + priority fee. Falls back to a legacy gasPrice on
+    chains without feeHistory.
+    """
+
+    def __init__(self):
+        self._fees: Optional[Dict[str, int]] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def fees(self, refresh: bool = False) -> Dict[str, int]:
+        async with self._lock:
+            if not refresh and self._fees and time.monotonic() - self._fetched_at < FEE_CACHE_SECONDS:
+                return self._fees
+            w3 = await _w3()
+            try:
+                history = await w3.eth.fee_history(FEE_HISTORY_BLOCKS, "latest", [FEE_PRIORITY_PERCENTILE])
+                next_base_fee = int(history["baseFeePerGas"][-1])
+                tips = sorted(int(r[0]) for r in history.get("reward") or [] if r)
+                tip = max(tips[len(tips) // 2] if tips else 0, MIN_PRIORITY_FEE_WEI)
+                fees = {"maxPriorityFeePerGas": tip, "maxFeePerGas": 2 * next_base_fee + tip}
+            except Exception as e:
+                logger.warning(f"eth_feeHistory unavailable ({e}); using legacy gasPrice")
+                fees = {"gasPrice": int(await w3.eth.gas_price)}
+            self._fees = _cap_fees(fees)
+            self._fetched_at = time.monotonic()
+            return self._fees
+
+
+def _cap_fees(fees: Dict[str, int]) -> Dict[str, int]:
+    if not MAX_FEE_PER_GAS_WEI:
+        return fees
+    capped = {k: min(v, MAX_FEE_PER_GAS_WEI) for k, v in fees.items()}
+    if "maxPriorityFeePerGas" in capped:
+        capped["maxPriorityFeePerGas"] = min(capped["maxPriorityFeePerGas"], capped["maxFeePerGas"])
+    return capped
+
+
+def bump_fees(tx: Dict[str, Any], current: Dict[str, int]) -> Dict[str, int]:
+    """
+    Fees for a same-nonce replacement: every fee field of `tx` raised by
+    FEE_BUMP_PERCENT (nodes require >= 10%) or to the current oracle value,
+    whichever is higher.
+    """
+    bumped = {}
+    for field in ("maxFeePerGas", "maxPriorityFeePerGas", "gasPrice"):
+        if field in tx:
+            old = int(tx[field])
+            bumped[field] = max(old * (100 + FEE_BUMP_PERCENT) // 100 + 1, int(current.get(field, 0)))
+    return _cap_fees(bumped)
+
+
+_fee_oracle: Optional[FeeOracle] = None
+
+def get_fee_oracle() -> FeeOracle:
+    global _fee_oracle
+    if _fee_oracle is None:
+        _fee_oracle = FeeOracle()
+    return _fee_oracle
+
+
+# (fn name, calldata length) -> (gas limit, cached at)
+_gas_cache: Dict[Tuple[str, int], Tuple[int, float]] = {}
+# Functions whose gas depends on contract state, not just calldata: anchorBatch
+# skips hashes that are already anchored, so each call is estimated afresh
+_UNCACHED_GAS_FUNCTIONS = {"anchorBatch"}
+
+async def _estimate_gas(fn_call, sender: str) -> int:
+    """
+    Gas limit from estimate_gas (+GAS_ESTIMATE_MARGIN). Calls of the same
+    function with the same calldata size cost the same, so one estimate
+    serves all of them for GAS_CACHE_SECONDS (except _UNCACHED_GAS_FUNCTIONS).
+    Raises ValueError if the call would revert: nothing is sent then.
+    """
+    key = (fn_call.fn_name, len(fn_call._encode_transaction_data()))
+    cacheable = fn_call.fn_name not in _UNCACHED_GAS_FUNCTIONS
+    cached = _gas_cache.get(key) if cacheable else None
+    if cached and time.monotonic() - cached[1] < GAS_CACHE_SECONDS:
+        return cached[0]
     try:
-        bytes32_hash = _to_bytes32(hash_hex)
-    except ValueError as e:
-        # Propagate error if hash_hex is invalid before sending tx
-        raise e
-
-    tx = contract.functions.anchor(bytes32_hash, public_id).build_transaction({
-        "from": acct.address,
-        "nonce": WEB3.eth.get_transaction_count(acct.address),
-        "chainId": CHAIN_ID,
-        "gas": 200000 # Consider making gas configurable or estimating it
-        # You might need to add gasPrice or maxFeePerGas/maxPriorityFeePerGas for non-legacy networks
-    })
+        estimate = await fn_call.estimate_gas({"from": sender})
+    except ContractLogicError as e:
+        raise ValueError(f"{fn_call.fn_name} would revert: {e}") from e
+    except Exception as e:
+        # Some nodes report reverts as plain RPC errors; anything else (RPC down) stays temporary
+        if "revert" in str(e).lower():
+            raise ValueError(f"{fn_call.fn_name} would revert: {e}") from e
+        raise
+    gas = int(estimate * GAS_ESTIMATE_MARGIN)
+    if cacheable:
+        _gas_cache[key] = (gas, time.monotonic())
+    return gas
 
-    # --- FIX: Use loaded key content for signing ---
-    signed = WEB3.eth.account.sign_transaction(tx, anchor_key)
-    # --- END FIX ---
 
+async def _sign_and_send(acct, tx: Dict[str, Any]) -> str:
+    """Broadcasts `tx` signed by `acct`; returns the 0x-prefixed tx hash (what JSON-RPC params need)."""
+    signed = acct.sign_transaction(tx)
     raw_tx = getattr(signed, 'raw_transaction', None) or getattr(signed, 'rawTransaction')
-    tx_hash = WEB3.eth.send_raw_transaction(raw_tx)
-    tx_hash_hex = tx_hash.hex()
+    w3 = await _w3(write=True)
+    return _tx_hash_hex(await w3.eth.send_raw_transaction(raw_tx))
 
-    if wait_for_receipt:
-        start = time.time()
-        while True:
+
+# --- Submission (broadcast only) ---
+
+async def submit_contract_tx(fn_call) -> str:
+    """
+    Signs and broadcasts a contract function call with a healthy anchorer key
+    from the signer pool using its locally managed nonce, EIP-1559 fees from
+    the fee oracle and a gas estimate; returns tx_hash hex without
+    waiting for a receipt. Raises ValueError, before sending, if the call
+    would revert. Confirm with confirm_tx(), which also frees the
+    signer's in-flight slot and replaces the tx if it gets stuck.
+    """
+    pool = get_signer_pool()
+    # Gas and fees are read outside the nonce lock
+    gas = await _estimate_gas(fn_call, pool.signers[0].address)
+    fees = await get_fee_oracle().fees()
+
+    async def _build_tx(acct, nonce: int) -> Dict[str, Any]:
+        return await fn_call.build_transaction({
+            "from": acct.address,
+            "nonce": nonce,
+            "chainId": CHAIN_ID,
+            "gas": gas,
+            **fees,
+        })
+
+    tx_hash = await pool.send(_build_tx)
+    get_receipt_tracker().track(tx_hash)
+    return tx_hash
+
+
+async def submit_anchor(hash_hex: str, public_id: str) -> str:
+    """Broadcasts anchor(hash, public_id); returns tx_hash hex."""
+    contract = _get_contract(await _w3(write=True))
+    # Raises ValueError (permanent) before anything is sent if hash_hex is invalid
+    bytes32_hash = _to_bytes32(hash_hex)
+    return await submit_contract_tx(contract.functions.anchor(bytes32_hash, public_id))
+
+
+async def submit_anchor_batch(hash_hexes: List[str], public_ids: List[str]) -> str:
+    """Broadcasts anchorBatch(hashes, public_ids) for up to ANCHOR_BATCH_MAX items; returns tx_hash hex."""
+    if not hash_hexes or len(hash_hexes) != len(public_ids):
+        raise ValueError("anchorBatch needs one public_id per hash")
+    if len(hash_hexes) > ANCHOR_BATCH_MAX:
+        raise ValueError(f"anchorBatch takes at most {ANCHOR_BATCH_MAX} hashes")
+    contract = _get_contract(await _w3(write=True))
+    hashes = [_to_bytes32(h) for h in hash_hexes]
+    fn_call = contract.functions.anchorBatch(hashes, list(public_ids))
+    return await submit_contract_tx(fn_call)
+
+
+async def submit_anchor_root(root_hex: str, leaf_count: int) -> str:
+    """Broadcasts anchorRoot(root, leaf_count) for a Merkle batch; returns tx_hash hex."""
+    contract = _get_contract(await _w3(write=True))
+    bytes32_root = _to_bytes32(root_hex)
+    return await submit_contract_tx(contract.functions.anchorRoot(bytes32_root, leaf_count))
+
+
+# --- Confirmation ---
+
+class TxNotMinedError(TimeoutError):
+    """
+    The receipt wait timed out and the tx's nonce is settled without it:
+    used by another tx (replaced) or unknown to the node (dropped).
+    Only then is it safe to send the work again.
+    """
+
+    def __init__(self, message: str, dropped: bool):
+        super().__init__(message)
+        self.dropped = dropped
+
+
+class _Tracked:
+    __slots__ = ("future", "submitted_at", "broadcast_at", "hashes", "mined")
+
+    def __init__(self, future: asyncio.Future, submitted_at: float, tx_hash: str):
+        self.future = future
+        self.submitted_at = submitted_at
+        self.broadcast_at = submitted_at   # last (re)broadcast
+        self.hashes = [tx_hash]            # original + same-nonce replacements
+        self.mined = False                 # some version has a receipt (waiting for depth)
+
+
+class ReceiptTracker:
+    """
+    One async confirmation loop for every outstanding tx of this process.
+    Each time the chain head moves (or at least every RECEIPT_POLL_MAX_INTERVAL
+    seconds) all pending receipts are fetched in a single JSON-RPC batch, and
+    the futures of txs that are `depth` blocks deep are resolved. A tx still
+    unmined STUCK_TX_SECONDS after its last broadcast is replaced (same nonce,
+    bumped fees) and whichever version is mined resolves it. The loop only
+    runs while something is pending.
+    """
+
+    def __init__(self, depth: int = CONFIRMATION_DEPTH):
+        self.depth = max(1, depth)
+        self._loop = asyncio.get_running_loop()
+        self._pending: Dict[str, _Tracked] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_head: Optional[int] = None
+        self.latencies: Deque[float] = deque(maxlen=1000)  # submit -> confirmed, seconds
+
+    def track(self, tx_hash_hex: str) -> asyncio.Future:
+        """Registers a just-broadcast tx (idempotent) and returns its future."""
+        entry = self._pending.get(tx_hash_hex)
+        if entry is None:
+            entry = _Tracked(self._loop.create_future(), time.monotonic(), tx_hash_hex)
+            self._pending[tx_hash_hex] = entry
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+        return entry.future
+
+    async def wait(self, tx_hash_hex: str, timeout: int = WEB3_RECEIPT_TIMEOUT):
+        """
+        Returns the receipt once the tx (or a replacement of it) has `depth`
+        confirmations. Raises on revert (status 0).
+
+        Every `timeout` seconds without a receipt the tx's nonce is checked.
+        While it is still pending (or a version is mined but not deep enough)
+        the wait goes on and the tracker keeps fee-bumping the same nonce:
+        giving up then would let the caller send the work again while the
+        original can still be mined. TxNotMinedError is raised only once the
+        nonce was used by another tx or every version was dropped; a plain
+        TimeoutError if the tx was not sent through the signer pool or its
+        nonce could not be checked RECEIPT_NONCE_CHECK_MAX_FAILURES times in a row.
+        """
+        future = self.track(tx_hash_hex)
+        check_failures = 0
+        try:
+            while True:
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                try:
+                    state = await get_signer_pool().nonce_state(tx_hash_hex)
+                except Exception as e:
+                    check_failures += 1
+                    if check_failures >= RECEIPT_NONCE_CHECK_MAX_FAILURES:
+                        raise TimeoutError(
+                            f"tx receipt timeout for {tx_hash_hex}: nonce check failed {check_failures} times ({e})")
+                    logger.warning(f"Nonce check for {tx_hash_hex[:10]}... failed ({e}); still waiting")
+                    continue
+                check_failures = 0
+                if state is None:
+                    raise TimeoutError(f"tx receipt timeout after {timeout}s for {tx_hash_hex}")
+                if state in ("replaced", "dropped"):
+                    raise TxNotMinedError(
+                        f"tx {tx_hash_hex} not mined after {timeout}s: nonce {state}", dropped=state == "dropped")
+                logger.warning(f"Tx {tx_hash_hex[:10]}... still {state} after {timeout}s; keeping its nonce and waiting")
+        finally:
+            self._pending.pop(tx_hash_hex, None)
+
+    def latency_stats(self) -> Dict[str, float]:
+        """count / avg / p50 / p95 / max confirmation latency over the last 1000 txs."""
+        if not self.latencies:
+            return {"count": 0}
+        ordered = sorted(self.latencies)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {
+            "count": len(ordered),
+            "avg": sum(ordered) / len(ordered),
+            "p50": pick(0.5),
+            "p95": pick(0.95),
+            "max": ordered[-1],
+        }
+
+    async def _run(self) -> None:
+        interval = RECEIPT_POLL_INTERVAL
+        last_fetch = 0.0
+        while self._pending:
+            await asyncio.sleep(interval)
+            if not self._pending:
+                break
+            try:
+                head = await (await _w3()).eth.block_number
+                now = time.monotonic()
+                if head != self._last_head or now - last_fetch >= RECEIPT_POLL_MAX_INTERVAL:
+                    self._last_head = head
+                    last_fetch = now
+                    await self._poll()
+                await self._replace_stuck()
+                interval = RECEIPT_POLL_INTERVAL
+            except Exception as e:
+                # RPC hiccup: back off, outstanding waits keep their own timeouts
+                interval = min(interval * 2, RECEIPT_POLL_MAX_INTERVAL)
+                logger.warning(f"Receipt poll failed ({e}); retrying in {interval:.0f}s")
+
+    async def _poll(self) -> None:
+        entries = list(self._pending.items())
+        hashes = [(tx_hash_hex, h) for tx_hash_hex, entry in entries for h in entry.hashes]
+        head, receipts = await get_receipts_batch([h for _, h in hashes])
+        for entry in self._pending.values():
+            entry.mined = False
+        for (tx_hash_hex, _), receipt in zip(hashes, receipts):
+            entry = self._pending.get(tx_hash_hex)
+            if entry is None or entry.future.done() or not receipt or isinstance(receipt, Exception):
+                continue
+            if receipt.get("blockNumber") is None:
+                continue
+            entry.mined = True
+            status = _to_int(receipt.get("status", 1))
+            if status == 0:
+                entry.future.set_exception(Exception(f"Transaction {tx_hash_hex} failed (receipt status 0)"))
+                continue
+            if status != 1:
+                entry.future.set_exception(Exception(f"Transaction {tx_hash_hex} has unexpected status {status}"))
+                continue
+            block = _to_int(receipt["blockNumber"])
+            # A receipt can come from a block newer than the head we read; it is simply not deep enough yet
+            if head is None or head - block + 1 < self.depth:
+                continue
+            latency = time.monotonic() - entry.submitted_at
+            self.latencies.append(latency)
+            RECEIPT_LATENCY.observe(latency)
+            logger.info(f"Confirmed {tx_hash_hex[:10]}... in block {block} after {latency:.1f}s ({head - block + 1} conf)")
+            entry.future.set_result(receipt)
+
+
+    async def _replace_stuck(self) -> None:
+        """Fee-bumps txs with no receipt (for any version) since their last broadcast."""
+        now = time.monotonic()
+        for tx_hash_hex, entry in list(self._pending.items()):
+            if entry.future.done() or entry.mined:
+                continue
+            if now - entry.broadcast_at < STUCK_TX_SECONDS:
+                continue
             try:
-                receipt = WEB3.eth.get_transaction_receipt(tx_hash)
-                # Check receipt status for success (optional but recommended)
-                if receipt is None:
-                     # Still pending
-                     pass
-                elif receipt.status == 0:
-                     raise Exception(f"Transaction {tx_hash_hex} failed (receipt status 0)")
-                elif receipt.status == 1:
-                     return tx_hash_hex # Success!
-                else: # Should not happen
-                     raise Exception(f"Transaction {tx_hash_hex} has unexpected status {receipt.status}")
+                new_hash = await get_signer_pool().replace(tx_hash_hex)
+            except Exception as e:
+                # e.g. "nonce too low": a version was just mined; the next poll will see it
+                logger.warning(f"Fee-bump replacement of {tx_hash_hex[:10]}... failed: {e}")
+                entry.broadcast_at = now
+                continue
+            entry.broadcast_at = now
+            if new_hash:
+                entry.hashes.append(new_hash)
+                logger.info(f"Replaced stuck tx {tx_hash_hex[:10]}... with {new_hash[:10]}... (bumped fees)")
 
-            except TransactionNotFound:
-                pass # Keep waiting
 
-            if time.time() - start > timeout:
-                raise TimeoutError(f"tx receipt timeout after {timeout}s for {tx_hash_hex}")
-            time.sleep(2) # Wait before polling again
+_receipt_tracker: Optional[ReceiptTracker] = None
 
-    return tx_hash_hex # Return hash if not waiting for receipt
+def get_receipt_tracker() -> ReceiptTracker:
+    """Per event loop singleton (the batcher runs one loop; devchain may run several)."""
+    global _receipt_tracker
+    if _receipt_tracker is None or _receipt_tracker._loop is not asyncio.get_running_loop():
+        _receipt_tracker = ReceiptTracker()
+    return _receipt_tracker
 
 
-def is_anchored(hash_hex: str) -> Tuple[bool, int]:
+def mined_tx_hash(receipt, fallback: str) -> str:
+    """Hash of the version that was mined (a fee-bump replacement may have won)."""
+    try:
+        return _tx_hash_hex(receipt["transactionHash"])
+    except (KeyError, TypeError, ValueError):
+        return fallback
+
+
+async def confirm_tx(tx_hash_hex: str, timeout: int = WEB3_RECEIPT_TIMEOUT):
     """
-    Returns (anchored_bool, anchored_at_unix_ts_or_0)
+    Waits (via the shared receipt tracker) for a submitted tx and frees its
+    in-flight slot. Returns the receipt; use mined_tx_hash() for the hash to record.
+    The nonce stays reserved until the tx is mined, replaced or dropped (see
+    ReceiptTracker.wait), so a TimeoutError means the work was not anchored.
+    """
+    resync = False
+    try:
+        return await get_receipt_tracker().wait(tx_hash_hex, timeout)
+    except TxNotMinedError as e:
+        # A dropped tx leaves its nonce unused: let the next send re-read the pending nonce
+        resync = e.dropped
+        raise
+    except TimeoutError:
+        resync = True
+        raise
+    finally:
+        get_signer_pool().release(tx_hash_hex, resync=resync)
+
+
+async def anchor_hash_on_chain(hash_hex: str, public_id: str, wait_for_receipt: bool = True, timeout: int = WEB3_RECEIPT_TIMEOUT) -> str:
+    """
+    Sends anchor(hash, public_id) tx and returns tx_hash hex string.
+    """
+    tx_hash = await submit_anchor(hash_hex, public_id)
+    if wait_for_receipt:
+        receipt = await confirm_tx(tx_hash, timeout)
+        tx_hash = mined_tx_hash(receipt, tx_hash)
+    return tx_hash
+
+
+def receipt_gas_used(receipt) -> Optional[int]:
+    """gasUsed of a receipt (hex string from raw JSON-RPC, int from web3), or None."""
+    try:
+        return _to_int(receipt["gasUsed"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def anchored_in_receipt(receipt) -> List[str]:
+    """public_hashes (hex, no 0x) this receipt's tx anchored, from its HashAnchored logs."""
+    out = []
+    for log in (receipt or {}).get("logs") or []:
+        topics = log.get("topics") or []
+        if len(topics) == 3 and HexBytes(topics[0]) == HexBytes(HASH_ANCHORED_TOPIC):
+            out.append(_hex32(topics[1]))
+    return out
+
+
+async def anchor_batch_on_chain(hash_hexes: List[str], public_ids: List[str], timeout: int = WEB3_RECEIPT_TIMEOUT):
+    """
+    Sends one anchorBatch tx and waits for it. Returns (tx_hash, receipt);
+    anchored_in_receipt(receipt) tells which hashes this tx anchored (the rest
+    were already on-chain and skipped by the contract). Raises on a reverted tx.
+    """
+    tx_hash = await submit_anchor_batch(hash_hexes, public_ids)
+    receipt = await confirm_tx(tx_hash, timeout)
+    tx_hash = mined_tx_hash(receipt, tx_hash)
+    if receipt.get("status") is not None and _to_int(receipt["status"]) == 0:
+        raise RuntimeError(f"anchorBatch tx {tx_hash[:10]}... reverted")
+    return tx_hash, receipt
+
+
+async def anchor_root_on_chain(root_hex: str, leaf_count: int, wait_for_receipt: bool = True, timeout: int = WEB3_RECEIPT_TIMEOUT) -> str:
+    """
+    Sends anchorRoot(root, leaf_count) tx for a Merkle batch and returns tx_hash hex string.
+    """
+    tx_hash = await submit_anchor_root(root_hex, leaf_count)
+    if wait_for_receipt:
+        receipt = await confirm_tx(tx_hash, timeout)
+        tx_hash = mined_tx_hash(receipt, tx_hash)
+    return tx_hash
+
+
+async def is_anchored(hash_hex: str) -> Tuple[bool, int]:
+    """
+    Returns (anchored_bool, anchored_at_unix_ts_or_0). Hedged across two
+    endpoints when the fastest one is slow (see _hedged).
     """
-    contract = _get_contract()
     try:
         bytes32_hash = _to_bytes32(hash_hex)
     except ValueError as e:
         # If hash is invalid, it can't be anchored
-        print(f"Warning: Invalid hash passed to is_anchored: {e}") # Or use logger
+        logger.warning(f"Invalid hash passed to is_anchored: {e}")
+        return False, 0
+    await _w3()
+    anchored, ts = await _hedged(lambda ep: _get_contract(ep.w3).functions.isAnchored(bytes32_hash).call())
+    return anchored, int(ts)
+
+
+async def is_root_anchored(root_hex: str) -> Tuple[bool, int]:
+    """
+    Returns (anchored_bool, anchored_at_unix_ts_or_0) for a Merkle root.
+    """
+    try:
+        bytes32_root = _to_bytes32(root_hex)
+    except ValueError as e:
+        logger.warning(f"Invalid root passed to is_root_anchored: {e}")
         return False, 0
-    anchored, ts = contract.functions.isAnchored(bytes32_hash).call()
-    return anchored, int(ts)
\ No newline at end of file
+    contract = _get_contract(await _w3())
+    anchored, ts = await contract.functions.isRootAnchored(bytes32_root).call()
+    return anchored, int(ts)
+
+
+def _to_int(value) -> int:
+    """JSON-RPC quantities are hex strings over HTTP but may be ints in-process."""
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def _normalize_tx_hash(tx_hash_hex: str) -> Optional[str]:
+    """Returns a 0x-prefixed tx hash, or None for placeholders like "N/A (already anchored)"."""
+    h = tx_hash_hex[2:] if tx_hash_hex.startswith("0x") else tx_hash_hex
+    if len(h) != 64:
+        return None
+    return "0x" + h
+
+
+async def get_tx_block_number(tx_hash_hex: str) -> Optional[int]:
+    """
+    Returns the block number a mined tx was included in, or None if unknown/pending.
+    """
+    tx_hash = _normalize_tx_hash(tx_hash_hex)
+    if tx_hash is None:
+        return None
+    try:
+        w3 = await _w3()
+        receipt = await w3.eth.get_transaction_receipt(tx_hash)
+    except (TransactionNotFound, ValueError):
+        return None
+    if receipt is None:
+        return None
+    return int(receipt.blockNumber)
+
+
+# --- JSON-RPC batching ---
+
+async def _post_batch(ep: RpcEndpoint, payload: List[Dict[str, Any]], timeout: int) -> Any:
+    """POSTs one JSON-RPC batch to `ep`, feeding its latency / error stats."""
+    session = await _get_http_session()
+    start = time.monotonic()
+    try:
+        async with session.post(ep.url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            resp.raise_for_status()
+            body = await resp.json(content_type=None)
+    except asyncio.CancelledError:
+        ep.record(time.monotonic() - start, ok=True, cancelled=True)
+        raise
+    except Exception:
+        ep.record(time.monotonic() - start, ok=False)
+        raise
+    ep.record(time.monotonic() - start, ok=True)
+    return body
+
+
+async def _rpc_batch(calls: List[Tuple[str, list]], timeout: int = RPC_TIMEOUT_SECONDS,
+                     write: bool = False, hedge: bool = False) -> List[Any]:
+    """
+    Sends all (method, params) calls in a single JSON-RPC batch request: to
+    the preferred endpoint if `write`, else to the best read endpoint (failing
+    over once), raced on a second endpoint if `hedge` and the first is slow.
+    Returns results in call order; a per-call error is returned as an Exception instance.
+    """
+    if not calls:
+        return []
+    if RPC == ETH_TESTER_RPC:
+        # In-process test chain has no HTTP endpoint: run the calls one by one
+        out: List[Any] = []
+        for method, params in calls:
+            try:
+                out.append(await _default_w3().manager.coro_request(method, params))
+            except Exception as e:
+                out.append(RuntimeError(f"{method} failed: {e}"))
+        return out
+
+    payload = [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+        for i, (method, params) in enumerate(calls)
+    ]
+    send = lambda ep: _post_batch(ep, payload, timeout)
+    if write:
+        body = await send(get_rpc_pool().write())
+    elif hedge:
+        body = await _hedged(send)
+    else:
+        body = await _with_failover(send)
+    if not isinstance(body, list):
+        # Some providers answer a rejected batch with a single error object
+        raise RuntimeError(f"JSON-RPC batch rejected: {body.get('error') if isinstance(body, dict) else body}")
+
+    results: List[Any] = [RuntimeError("missing JSON-RPC response")] * len(calls)
+    for item in body:
+        idx = item.get("id")
+        if not isinstance(idx, int) or not 0 <= idx < len(calls):
+            continue
+        if item.get("error"):
+            results[idx] = RuntimeError(f"{calls[idx][0]} failed: {item['error']}")
+        else:
+            results[idx] = item.get("result")
+    return results
+
+
+async def _view_batch(calls: List[Tuple[str, str]]) -> List[Tuple[bool, int]]:
+    """
+    Runs (fn_name, hash_hex) calls of (bytes32) -> (bool, uint256) views in one
+    JSON-RPC batch. Invalid hashes are reported as (False, 0); RPC errors raise.
+    """
+    contract = _get_contract()
+    rpc_calls = []
+    positions = []
+    for i, (fn_name, hash_hex) in enumerate(calls):
+        try:
+            bytes32_hash = _to_bytes32(hash_hex)
+        except ValueError as e:
+            logger.warning(f"Invalid hash passed to {fn_name} batch: {e}")
+            continue
+        data = contract.get_function_by_name(fn_name)(bytes32_hash)._encode_transaction_data()
+        rpc_calls.append(("eth_call", [{"to": contract.address, "data": data}, "latest"]))
+        positions.append(i)
+
+    out: List[Tuple[bool, int]] = [(False, 0)] * len(calls)
+    for pos, result in zip(positions, await _rpc_batch(rpc_calls, hedge=True)):
+        if isinstance(result, Exception):
+            raise result
+        anchored, ts = _default_w3().codec.decode(["bool", "uint256"], HexBytes(result))
+        out[pos] = (bool(anchored), int(ts))
+    return out
+
+
+async def is_anchored_batch(hash_hexes: List[str]) -> List[Tuple[bool, int]]:
+    """
+    Batched is_anchored: one JSON-RPC request carrying an eth_call per hash.
+    Returns (anchored_bool, anchored_at_unix_ts_or_0) per input, in order.
+    """
+    return await _view_batch([("isAnchored", h) for h in hash_hexes])
+
+
+_batch_functions: Optional[bool] = None
+
+async def has_batch_functions() -> bool:
+    """
+    Whether the deployed contract has anchorBatch / isAnchoredBatch /
+    getAnchorRecords (ANCHOR_BATCH_FUNCTIONS=auto probes it once).
+    """
+    global _batch_functions
+    if ANCHOR_BATCH_FUNCTIONS in ("on", "true", "1"):
+        return True
+    if ANCHOR_BATCH_FUNCTIONS in ("off", "false", "0"):
+        return False
+    if _batch_functions is None:
+        try:
+            await _get_contract(await _w3()).functions.isAnchoredBatch([]).call()
+            _batch_functions = True
+        except (ContractLogicError, BadFunctionCallOutput):
+            # An older deployment: unknown selector reverts / returns nothing
+            logger.warning("Contract has no batch functions; falling back to per-item calls.")
+            _batch_functions = False
+    return _batch_functions
+
+
+def _chunks(items: List[Any], size: int = ANCHOR_BATCH_MAX) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _valid_bytes32(hash_hexes: List[str]) -> Tuple[List[int], List[bytes]]:
+    positions, hashes = [], []
+    for i, h in enumerate(hash_hexes):
+        try:
+            hashes.append(_to_bytes32(h))
+            positions.append(i)
+        except (AttributeError, ValueError) as e:
+            logger.warning(f"Invalid hash passed to batch lookup: {e}")
+    return positions, hashes
+
+
+async def is_anchored_many(hash_hexes: List[str]) -> List[Tuple[bool, int]]:
+    """
+    (anchored_bool, anchored_at_unix_ts_or_0) per hash via the contract's
+    isAnchoredBatch view: one eth_call per ANCHOR_BATCH_MAX hashes. Uses the
+    JSON-RPC batch of isAnchored calls on contracts without it.
+    """
+    if not hash_hexes:
+        return []
+    if not await has_batch_functions():
+        return await is_anchored_batch(hash_hexes)
+    await _w3()
+    positions, hashes = _valid_bytes32(hash_hexes)
+    out: List[Tuple[bool, int]] = [(False, 0)] * len(hash_hexes)
+    for pos_chunk, chunk in zip(_chunks(positions), _chunks(hashes)):
+        exists, timestamps = await _hedged(lambda ep: _get_contract(ep.w3).functions.isAnchoredBatch(chunk).call())
+        for pos, anchored, ts in zip(pos_chunk, exists, timestamps):
+            out[pos] = (bool(anchored), int(ts))
+    return out
+
+
+async def get_anchor_records(hash_hexes: List[str]) -> List[Dict[str, Any]]:
+    """
+    {"public_id", "timestamp", "exists"} per hash via the contract's
+    getAnchorRecords view, one eth_call per ANCHOR_BATCH_MAX hashes.
+    Requires a contract with the batch functions.
+    """
+    contract = _get_contract(await _w3())
+    positions, hashes = _valid_bytes32(hash_hexes)
+    out: List[Dict[str, Any]] = [{"public_id": None, "timestamp": 0, "exists": False} for _ in hash_hexes]
+    for pos_chunk, chunk in zip(_chunks(positions), _chunks(hashes)):
+        public_ids, timestamps, exists = await contract.functions.getAnchorRecords(chunk).call()
+        for pos, public_id, ts, ok in zip(pos_chunk, public_ids, timestamps, exists):
+            out[pos] = {"public_id": public_id or None, "timestamp": int(ts), "exists": bool(ok)}
+    return out
+
+
+async def lookup_anchors_batch(hash_hexes: List[str], root_hexes: List[str]) -> Tuple[List[Tuple[bool, int]], List[Tuple[bool, int]]]:
+    """
+    isAnchored for every hash and isRootAnchored for every Merkle root, all in
+    a single JSON-RPC batch. Returns (hash_results, root_results) in input order.
+    """
+    results = await _view_batch([("isAnchored", h) for h in hash_hexes] + [("isRootAnchored", r) for r in root_hexes])
+    return results[:len(hash_hexes)], results[len(hash_hexes):]
+
+
+async def get_receipts_batch(tx_hash_hexes: List[str]) -> Tuple[Optional[int], List[Any]]:
+    """
+    eth_blockNumber plus one eth_getTransactionReceipt per hash, all in a single
+    JSON-RPC batch. Returns (head_block, receipts); a receipt is None while
+    pending and an Exception instance if that call failed.
+    """
+    calls = [("eth_blockNumber", [])]
+    positions = []
+    for i, tx_hash_hex in enumerate(tx_hash_hexes):
+        tx_hash = _normalize_tx_hash(tx_hash_hex or "")
+        if tx_hash:
+            calls.append(("eth_getTransactionReceipt", [tx_hash]))
+            positions.append(i)
+
+    results = await _rpc_batch(calls)
+    head = None if isinstance(results[0], Exception) else _to_int(results[0])
+    receipts: List[Any] = [None] * len(tx_hash_hexes)
+    for pos, receipt in zip(positions, results[1:]):
+        receipts[pos] = receipt
+    return head, receipts
+
+
+async def get_tx_block_numbers(tx_hash_hexes: List[str]) -> List[Optional[int]]:
+    """
+    Batched get_tx_block_number: one JSON-RPC request for all receipts.
+    Returns None for placeholders, pending or unknown transactions.
+    """
+    calls = []
+    positions = []
+    for i, tx_hash_hex in enumerate(tx_hash_hexes):
+        tx_hash = _normalize_tx_hash(tx_hash_hex or "")
+        if tx_hash:
+            calls.append(("eth_getTransactionReceipt", [tx_hash]))
+            positions.append(i)
+
+    out: List[Optional[int]] = [None] * len(tx_hash_hexes)
+    for pos, receipt in zip(positions, await _rpc_batch(calls)):
+        if receipt and not isinstance(receipt, Exception) and receipt.get("blockNumber") is not None:
+            out[pos] = _to_int(receipt["blockNumber"])
+    return out
+
+
+# --- HashAnchored logs ---
+
+def _hex32(value) -> str:
+    """Lowercase 64-char hex without 0x (the public_hash format), from a topic or hash in any form."""
+    h = HexBytes(value).hex()
+    return h[2:] if h.startswith("0x") else h
+
+
+def _tx_hash_hex(value) -> str:
+    """0x-prefixed tx hash from HexBytes / bytes / str (hexbytes 1.x keeps the 0x in .hex(), 2.x drops it)."""
+    return "0x" + _hex32(value)
+
+
+async def get_block_number() -> int:
+    w3 = await _w3()
+    return int(await w3.eth.block_number)
+
+
+def _decode_hash_anchored(log: Dict[str, Any]) -> Dict[str, Any]:
+    public_id, ts = _default_w3().codec.decode(["string", "uint256"], HexBytes(log["data"]))
+    topics = log["topics"]
+    return {
+        "public_hash": _hex32(topics[1]),
+        "public_id": public_id,
+        "timestamp": int(ts),
+        "anchor": Web3.to_checksum_address(HexBytes(topics[2])[-20:]),
+        "tx_hash": _tx_hash_hex(log["transactionHash"]),
+        "block_number": _to_int(log["blockNumber"]),
+        "log_index": _to_int(log["logIndex"]),
+    }
+
+
+async def get_anchor_logs(from_block: int, to_block: Optional[int] = None, hash_hexes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    HashAnchored events of the contract in [from_block, to_block] (to_block None
+    = latest) with one eth_getLogs call, optionally only for the given hashes.
+    Returns decoded events ({"public_hash", "public_id", "timestamp", "anchor",
+    "tx_hash", "block_number", "log_index"}) in chain order. RPC errors raise,
+    e.g. when the provider rejects the range as too wide.
+    """
+    topics: List[Any] = [HASH_ANCHORED_TOPIC]
+    if hash_hexes is not None:
+        if not hash_hexes:
+            return []
+        topics.append(["0x" + _to_bytes32(h).hex() for h in hash_hexes])
+    w3 = await _w3()
+    logs = await w3.eth.get_logs({
+        "address": _get_contract().address,
+        "fromBlock": from_block,
+        "toBlock": "latest" if to_block is None else to_block,
+        "topics": topics,
+    })
+    events = [_decode_hash_anchored(log) for log in logs or [] if not log.get("removed")]
+    events.sort(key=lambda e: (e["block_number"], e["log_index"]))
+    return events
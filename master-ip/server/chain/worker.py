@@ -0,0 +1,78 @@
+# master-ip/server/chain/worker.py
+"""
+Identity and throughput reporting for one batcher worker.
+
+Several workers (processes, or pods) can run against the same queue; each has
+a distinct WORKER_ID that is stamped on the items it leases and on its row in
+the `batcher_workers` collection, which it refreshes every
+WORKER_REPORT_INTERVAL seconds with its counters and items/min.
+"""
+import os
+import socket
+import time
+from typing import Dict
+
+from chain.utils import get_logger, utc_now_iso
+from app.db.mongodb import collection
+from app.constant import WORKER_REPORT_INTERVAL
+
+logger = get_logger("chain.worker")
+
+WORKERS_COLL = "batcher_workers"
+WORKER_ID = os.getenv("BATCHER_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkerStats:
+    """Per-worker counters; report() logs and persists them at most once per interval."""
+
+    def __init__(self, worker_id: str = WORKER_ID):
+        self.worker_id = worker_id
+        self.started = time.monotonic()
+        self.started_at = utc_now_iso()
+        self.leased = 0
+        self.anchored = 0
+        self.failed = 0
+        self._last_report = self.started
+        self._anchored_at_last_report = 0
+
+    def record(self, leased: int, anchored: int, failed: int) -> None:
+        self.leased += leased
+        self.anchored += anchored
+        self.failed += failed
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        uptime = max(now - self.started, 1e-9)
+        window = max(now - self._last_report, 1e-9)
+        return {
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "started_at": self.started_at,
+            "leased": self.leased,
+            "anchored": self.anchored,
+            "failed": self.failed,
+            "items_per_min": round(self.anchored * 60 / uptime, 2),
+            "recent_items_per_min": round((self.anchored - self._anchored_at_last_report) * 60 / window, 2),
+        }
+
+    async def report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < WORKER_REPORT_INTERVAL:
+            return
+        snap = self.snapshot()
+        logger.info(
+            f"[{self.worker_id}] anchored {snap['anchored']} | failed {snap['failed']} | "
+            f"{snap['recent_items_per_min']}/min recent, {snap['items_per_min']}/min overall"
+        )
+        self._last_report = now
+        self._anchored_at_last_report = self.anchored
+        try:
+            await collection(WORKERS_COLL).update_one(
+                {"_id": self.worker_id},
+                {"$set": {**snap, "last_seen": utc_now_iso()}},
+                upsert=True,
+            )
+        except Exception as e:
+            # Reporting must never stop the worker
+            logger.warning(f"Failed to persist worker stats: {e}")
@@ -3,11 +3,24 @@
 # Exit immediately if a command exits with a non-zero status
 set -e
 
-# Start the chain batcher in the background
-echo "Starting chain batcher in background..."
-python -m chain.batcher &
+# Start the chain batcher workers in the background (BATCHER_WORKERS, default 1).
+# Each gets a distinct worker id; leases keep them off each other's items.
+# Worker i serves Prometheus metrics on BATCHER_METRICS_PORT + i - 1.
+BATCHER_WORKERS=${BATCHER_WORKERS:-1}
+BATCHER_METRICS_PORT=${BATCHER_METRICS_PORT:-9102}
+echo "Starting $BATCHER_WORKERS chain batcher worker(s) in background..."
+for i in $(seq 1 "$BATCHER_WORKERS"); do
+    metrics_port=0
+    if [ "$BATCHER_METRICS_PORT" != "0" ]; then
+        metrics_port=$((BATCHER_METRICS_PORT + i - 1))
+    fi
+    BATCHER_WORKER_ID="$(hostname)-batcher-$i" BATCHER_METRICS_PORT="$metrics_port" python -m chain.batcher &
+done
 
-# Start the Uvicorn web server in the foreground
-# This is the main process that will keep the container alive
-echo "Starting Uvicorn web server in foreground..."
-uvicorn app.main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+# Start the web server in the foreground
+# This is the main process that will keep the container alive.
+# app.server loads the models once, then forks WEB_WORKERS uvicorn workers
+# that share them (see app/server.py).
+WEB_WORKERS=${WEB_WORKERS:-1}
+echo "Starting web server with $WEB_WORKERS worker(s) in foreground..."
+python -m app.server --host 0.0.0.0 --port 8000 --workers "$WEB_WORKERS"
\ No newline at end of file
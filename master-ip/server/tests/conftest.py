@@ -0,0 +1,47 @@
+# master-ip/server/tests/conftest.py
+"""
+Puts master-ip/server on sys.path so `app` and `chain` import from any cwd.
+
+Tests that need MongoDB use the `mongo` fixture: it runs a coroutine against
+a throwaway database on TEST_MONGO_URI (a replica set is not needed) and is
+skipped when that is unset or unreachable.
+"""
+import asyncio
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_MONGO_URI = os.getenv("TEST_MONGO_URI")
+
+
+@pytest.fixture
+def mongo():
+    """run(fn): awaits fn() with app.db.mongodb pointed at a fresh database, dropped afterwards."""
+    if not TEST_MONGO_URI:
+        pytest.skip("TEST_MONGO_URI not set")
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.db import mongodb
+
+    def run(fn):
+        async def _run():
+            client = AsyncIOMotorClient(TEST_MONGO_URI, serverSelectionTimeoutMS=3000)
+            try:
+                await client.admin.command("ping")
+            except Exception as e:
+                client.close()
+                pytest.skip(f"MongoDB at TEST_MONGO_URI unreachable: {e}")
+            name = f"test_{uuid.uuid4().hex[:12]}"
+            mongodb._client, mongodb._db = client, client[name]
+            try:
+                return await fn()
+            finally:
+                await client.drop_database(name)
+                client.close()
+                mongodb._client = mongodb._db = None
+        return asyncio.run(_run())
+
+    return run
@@ -0,0 +1,115 @@
+# master-ip/server/tests/test_adaptive_controller.py
+"""AIMD decisions of chain.batcher.AdaptiveController, with the queue depth, latencies and signer pool faked."""
+import asyncio
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+from chain import batcher
+from chain.batcher import AdaptiveController
+
+
+@pytest.fixture
+def signals(monkeypatch):
+    """Mutable inputs of the controller: queue depth, confirmation latencies, signer count."""
+    state = SimpleNamespace(depth=0, latencies=deque(), signers=2)
+
+    async def count_claimable(limit=0):
+        if isinstance(state.depth, Exception):
+            raise state.depth
+        return state.depth
+
+    monkeypatch.setattr(batcher, "count_claimable", count_claimable)
+    monkeypatch.setattr(batcher, "get_receipt_tracker", lambda: SimpleNamespace(latencies=state.latencies))
+    monkeypatch.setattr(batcher, "get_signer_pool", lambda: SimpleNamespace(signers=[object()] * state.signers))
+    monkeypatch.setattr(batcher, "BATCH_LIMIT_MIN", 1)
+    monkeypatch.setattr(batcher, "BATCH_LIMIT_MAX", 50)
+    monkeypatch.setattr(batcher, "BATCHER_CONCURRENCY_MIN", 1)
+    monkeypatch.setattr(batcher, "BATCHER_CONCURRENCY_MAX", 16)
+    monkeypatch.setattr(batcher, "MAX_IN_FLIGHT_TXS", 4)
+    monkeypatch.setattr(batcher, "LEASE_PAUSE_MAX_SECONDS", 30.0)
+    monkeypatch.setattr(batcher, "ADAPTIVE_TARGET_LATENCY_SECONDS", 30.0)
+    monkeypatch.setattr(batcher, "ADAPTIVE_MAX_ERROR_RATE", 0.2)
+    return state
+
+
+def _controller(lease_size=8, in_flight=4, pause=1.0):
+    c = AdaptiveController(enabled=True)
+    c.lease_size, c.in_flight, c.pause = lease_size, in_flight, pause
+    return c
+
+
+def _knobs(c):
+    return c.lease_size, c.in_flight, c.pause
+
+
+def test_backlog_grows_additively(signals):
+    signals.depth = 100
+    c = _controller()
+    asyncio.run(c.update(leased=8, failed=0))
+    assert _knobs(c) == (10, 5, 0.5)
+
+
+def test_high_latency_halves(signals):
+    signals.depth = 100
+    signals.latencies.extend([45.0] * 5)
+    c = _controller()
+    asyncio.run(c.update(leased=8, failed=0))
+    assert _knobs(c) == (4, 2, 2.0)
+
+
+def test_error_rate_is_smoothed_before_it_halves(signals):
+    signals.depth = 100
+    c = _controller()
+
+    async def run():
+        await c.update(leased=8, failed=4)   # EWMA 0.15: still healthy
+        assert c.lease_size > 8
+        await c.update(leased=8, failed=4)   # EWMA 0.255: congested
+    asyncio.run(run())
+    assert c.error_rate > 0.2
+    assert (c.lease_size, c.in_flight) == (5, 2)
+
+
+def test_relaxes_a_raised_pause_without_backlog(signals):
+    c = _controller(pause=8.0)
+    asyncio.run(c.update(leased=2, failed=0))
+    assert _knobs(c) == (8, 4, 4.0)
+
+
+def test_holds_when_healthy_and_idle(signals):
+    c = _controller()
+    asyncio.run(c.update(leased=2, failed=0))
+    assert _knobs(c) == (8, 4, 1.0)
+
+
+def test_bounds(signals):
+    signals.depth = 10_000
+    signals.signers = 1
+    c = _controller(lease_size=50, in_flight=4, pause=0.0)
+    asyncio.run(c.update(leased=50, failed=0))
+    # One signer holds MAX_IN_FLIGHT_TXS txs: in-flight is capped there, lease size at BATCH_LIMIT_MAX
+    assert _knobs(c) == (50, 4, 0.0)
+
+    signals.latencies.extend([300.0] * 5)
+    c = _controller(lease_size=1, in_flight=1, pause=30.0)
+    asyncio.run(c.update(leased=1, failed=1))
+    assert _knobs(c) == (1, 1, 30.0)
+
+
+def test_unknown_depth_does_not_grow(signals):
+    signals.depth = RuntimeError("mongo down")
+    c = _controller()
+    asyncio.run(c.update(leased=8, failed=0))
+    assert _knobs(c) == (8, 4, 1.0)
+
+
+def test_disabled_or_empty_lease_is_ignored(signals):
+    signals.depth = 100
+    c = _controller()
+    asyncio.run(c.update(leased=0, failed=0))
+    assert _knobs(c) == (8, 4, 1.0)
+    c.enabled = False
+    asyncio.run(c.update(leased=8, failed=8))
+    assert _knobs(c) == (8, 4, 1.0) and c.error_rate == 0.0
@@ -0,0 +1,30 @@
+# master-ip/server/tests/test_devchain.py
+"""
+The eth-tester round trip of chain/devchain.py (single, Merkle and anchorBatch
+anchoring against a freshly deployed CraftAnchor). Skipped without the dev
+requirements (chain/requirements-dev.txt) or when solc cannot be installed.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_eth_tester_round_trip():
+    pytest.importorskip("eth_tester")
+    pytest.importorskip("solcx")
+    from chain.devchain import SOLC_VERSION, ensure_solc
+
+    try:
+        ensure_solc()
+    except Exception as e:
+        pytest.skip(f"solc {SOLC_VERSION} unavailable: {e}")
+    # Own interpreter: devchain must configure web3_client before anything imports it
+    proc = subprocess.run(
+        [sys.executable, "-m", "chain.devchain"], cwd=ROOT, capture_output=True, text=True, timeout=600,
+    )
+    assert proc.returncode == 0, proc.stderr[-4000:]
+    assert "eth-tester round trip OK" in proc.stderr + proc.stdout
@@ -0,0 +1,63 @@
+# master-ip/server/tests/test_dlq.py
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from chain.dlq import ERROR_CLASSES, _decode_cursor, _encode_cursor, failed_filter
+
+
+def test_no_filters():
+    assert failed_filter() == {"status": "failed"}
+
+
+@pytest.mark.parametrize("error_class", sorted(ERROR_CLASSES))
+def test_error_class_matches_batcher_prefix(error_class):
+    query = failed_filter(error_class=error_class)
+    assert query["$and"] == [{"last_error": {"$regex": ERROR_CLASSES[error_class]}}]
+
+
+def test_temporary_excludes_every_other_class():
+    clause = failed_filter(error_class="temporary")["$and"][0]["last_error"]["$not"]
+    assert clause.match("Receipt timeout after 120s") is not None
+    assert clause.match("Permanent failure: reverted") is not None
+    assert clause.match("RPC 503 from provider") is None
+
+
+def test_unknown_error_class():
+    with pytest.raises(ValueError):
+        failed_filter(error_class="flaky")
+
+
+def test_error_text_is_escaped_and_case_insensitive():
+    query = failed_filter(error="nonce (too) low")
+    assert query["$and"] == [{"last_error": {"$regex": r"nonce\ \(too\)\ low", "$options": "i"}}]
+
+
+def test_age_and_tries_ranges():
+    query = failed_filter(older_than_hours=1, newer_than_hours=24, min_tries=2, max_tries=5)
+    assert query["tries"] == {"$gte": 2, "$lte": 5}
+    lt, gte = datetime.fromisoformat(query["last_try"]["$lt"]), datetime.fromisoformat(query["last_try"]["$gte"])
+    assert gte < lt < datetime.now(timezone.utc)
+    assert abs((lt - gte).total_seconds() - 23 * 3600) < 5
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    last_try = "2026-01-02T03:04:05+00:00"
+    cursor = _encode_cursor({"_id": oid, "last_try": last_try})
+    assert _decode_cursor(cursor) == {"$or": [
+        {"last_try": {"$lt": last_try}},
+        {"last_try": last_try, "_id": {"$lt": oid}},
+    ]}
+
+
+def test_cursor_without_last_try():
+    oid = ObjectId()
+    assert _decode_cursor(_encode_cursor({"_id": oid}))["$or"][1] == {"last_try": "", "_id": {"$lt": oid}}
+
+
+@pytest.mark.parametrize("cursor", ["", "no-separator", "2026-01-01|not-an-object-id"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        _decode_cursor(cursor)
@@ -0,0 +1,11 @@
+# master-ip/server/tests/test_import_budget.py
+"""The entry points import fast, without settings and without the ML / image stacks (chain/import_budget.py)."""
+import pytest
+
+from chain.import_budget import BUDGETS, check
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_entry_point_within_import_budget(module):
+    budget_ms, forbidden = BUDGETS[module]
+    assert check(module, budget_ms, forbidden) == []
@@ -0,0 +1,69 @@
+# master-ip/server/tests/test_indexer.py
+"""
+AnchorIndexer.lookup() with the index, the chain head, eth_getLogs and
+isAnchored faked: a hash missing from an index that does not reach back to
+INDEXER_START_BLOCK must be checked on the contract, not reported as new.
+"""
+import asyncio
+
+import pytest
+
+from chain import indexer
+
+OLD, NEW, FRESH = "aa" * 32, "bb" * 32, "cc" * 32
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """Anchors on the fake chain: OLD before the index started, NEW inside it; FRESH is not anchored."""
+    calls = {"logs": [], "is_anchored": []}
+    new_event = {"public_hash": NEW, "public_id": "CID-NEW", "tx_hash": "0x" + "01" * 32, "block_number": 990, "timestamp": 2}
+
+    async def indexed_anchors(hashes):
+        return {}
+
+    async def get_block_number():
+        return 1000
+
+    async def get_anchor_logs(from_block, to_block=None, hash_hexes=None):
+        calls["logs"].append(from_block)
+        return [new_event] if from_block <= 990 and NEW in hash_hexes else []
+
+    async def is_anchored_many(hashes):
+        calls["is_anchored"].append(list(hashes))
+        return [(h in (OLD, NEW), 1 if h == OLD else 2 if h == NEW else 0) for h in hashes]
+
+    monkeypatch.setattr(indexer, "indexed_anchors", indexed_anchors)
+    monkeypatch.setattr(indexer, "get_block_number", get_block_number)
+    monkeypatch.setattr(indexer, "get_anchor_logs", get_anchor_logs)
+    monkeypatch.setattr(indexer, "is_anchored_many", is_anchored_many)
+    return calls
+
+
+def _indexer(from_block, last_block=980):
+    idx = indexer.AnchorIndexer()
+    idx.from_block, idx.last_block = from_block, last_block
+    return idx
+
+
+def test_index_from_the_head_checks_missing_hashes_on_chain(chain, monkeypatch):
+    monkeypatch.setattr(indexer, "INDEXER_START_BLOCK", -1)
+    found = asyncio.run(_indexer(from_block=900).lookup([OLD, NEW, FRESH]))
+    assert set(found) == {OLD, NEW}
+    assert found[OLD]["timestamp"] == 1
+    assert chain["is_anchored"] == [[OLD, NEW, FRESH]] and chain["logs"] == []
+
+
+def test_index_behind_the_start_block_checks_missing_hashes_on_chain(chain, monkeypatch):
+    # Checkpoint saved before INDEXER_START_BLOCK was set (or before from_block was recorded)
+    monkeypatch.setattr(indexer, "INDEXER_START_BLOCK", 100)
+    assert set(asyncio.run(_indexer(from_block=900).lookup([OLD, FRESH]))) == {OLD}
+    assert set(asyncio.run(_indexer(from_block=None).lookup([OLD, FRESH]))) == {OLD}
+    assert len(chain["is_anchored"]) == 2
+
+
+def test_full_index_only_scans_the_tail(chain, monkeypatch):
+    monkeypatch.setattr(indexer, "INDEXER_START_BLOCK", 100)
+    found = asyncio.run(_indexer(from_block=100).lookup([NEW, FRESH]))
+    assert set(found) == {NEW} and found[NEW]["tx_hash"] == "0x" + "01" * 32
+    assert chain["logs"] == [981] and chain["is_anchored"] == []
@@ -0,0 +1,70 @@
+# master-ip/server/tests/test_merkle.py
+import hashlib
+
+import pytest
+
+from chain.merkle import build_tree, compute_root, leaf_node, verify_proof
+
+
+def _leaves(n):
+    return [hashlib.sha256(f"leaf-{i}".encode()).hexdigest() for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 7, 8, 33])
+def test_every_proof_verifies(n):
+    leaves = _leaves(n)
+    root, proofs = build_tree(leaves)
+    assert len(proofs) == n
+    for leaf, proof in zip(leaves, proofs):
+        assert compute_root(leaf, proof) == root
+        assert verify_proof(leaf, proof, root)
+        assert verify_proof(leaf, proof, "0x" + root.upper())
+
+
+def test_single_leaf_root_is_the_leaf_node():
+    leaf = _leaves(1)[0]
+    root, proofs = build_tree([leaf])
+    assert root == leaf_node(leaf).hex()
+    assert proofs == [[]]
+
+
+def test_odd_node_is_promoted():
+    root, proofs = build_tree(_leaves(3))
+    # The third leaf has no sibling on the first level: one step (the left pair) to the root
+    assert len(proofs[2]) == 1 and proofs[2][0]["position"] == "left"
+    assert len(proofs[0]) == 2
+
+
+def test_root_depends_on_order_and_content():
+    leaves = _leaves(4)
+    root = build_tree(leaves)[0]
+    assert build_tree(leaves[::-1])[0] != root
+    assert build_tree(leaves[:3] + [_leaves(5)[4]])[0] != root
+
+
+def test_wrong_leaf_proof_or_root_fails():
+    leaves = _leaves(6)
+    root, proofs = build_tree(leaves)
+    assert not verify_proof(leaves[0], proofs[1], root)
+    assert not verify_proof(_leaves(7)[6], proofs[0], root)
+    assert not verify_proof(leaves[0], proofs[0], build_tree(leaves[:5])[0])
+
+
+def test_internal_node_is_not_a_leaf():
+    # Domain separation: the parent of leaves 0 and 1 cannot be proven as a leaf of a tree containing it
+    leaves = _leaves(4)
+    root, proofs = build_tree(leaves)
+    parent = proofs[2][0]["sibling"]
+    assert not verify_proof(parent, proofs[2][1:], root)
+
+
+def test_malformed_proof_is_rejected():
+    leaves = _leaves(2)
+    root, proofs = build_tree(leaves)
+    assert not verify_proof(leaves[0], [{"sibling": proofs[0][0]["sibling"], "position": "up"}], root)
+    assert not verify_proof(leaves[0], [{"position": "left"}], root)
+
+
+def test_no_leaves():
+    with pytest.raises(ValueError):
+        build_tree([])
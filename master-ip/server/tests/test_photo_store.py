@@ -0,0 +1,39 @@
+# master-ip/server/tests/test_photo_store.py
+"""Uploaded photos: chunked hashing of the spooled file and the GridFS round trip (see the `mongo` fixture)."""
+import hashlib
+from tempfile import SpooledTemporaryFile
+
+from app.utils import photo_store
+from app.utils.photo_store import PhotoUpload, hash_photo, iter_photo, open_photo, store_photo
+
+# Larger than the spool's memory limit and than several GridFS chunks
+CONTENT = bytes(range(256)) * (12 * 1024)
+
+
+def _spooled(content=CONTENT):
+    f = SpooledTemporaryFile(max_size=1024 * 1024)
+    f.write(content)
+    return f
+
+
+def test_hash_photo_reads_in_chunks_and_rewinds(monkeypatch):
+    monkeypatch.setattr(photo_store, "HASH_CHUNK_BYTES", 1000)
+    f = _spooled()
+    etag, size = hash_photo(f)
+    assert etag == '"' + hashlib.sha256(CONTENT).hexdigest()[:32] + '"'
+    assert size == len(CONTENT) and f.tell() == 0
+
+
+def test_photo_round_trip(mongo):
+    async def run():
+        f = _spooled()
+        etag, size = hash_photo(f)
+        f.read(10)   # store_photo rewinds
+        await store_photo("photo/CID-1", PhotoUpload(file=f, content_type="image/jpeg", etag=etag, size=size))
+        grid_out = await open_photo("photo/CID-1")
+        assert grid_out.length == len(CONTENT)
+        assert grid_out.metadata == {"content_type": "image/jpeg", "etag": etag}
+        chunks = [c async for c in iter_photo(grid_out)]
+        assert len(chunks) > 1 and b"".join(chunks) == CONTENT
+        assert await open_photo("photo/CID-2") is None
+    mongo(run)
@@ -0,0 +1,134 @@
+# master-ip/server/tests/test_queue.py
+"""Lease / complete / fail state transitions of chain/queue.py against a real MongoDB (see the `mongo` fixture)."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.constant import MAX_RETRIES
+from app.db.mongodb import collection
+from chain.queue import (
+    QUEUE_COLL, _leased, complete_many, enqueue_item, extend_lease, fail_many, lease_batch, mark_done, mark_failed,
+    release_lease,
+)
+
+
+def _item(i, **extra):
+    return {"public_id": f"CID-{i}", "public_hash": f"{i:064x}", "timestamp": 1700000000 + i, **extra}
+
+
+async def _stored(public_id):
+    return await collection(QUEUE_COLL).find_one({"public_id": public_id})
+
+
+def test_lease_claims_each_item_once(mongo):
+    async def run():
+        for i in range(5):
+            await enqueue_item(_item(i))
+        first = await lease_batch(3, worker_id="w1")
+        second = await lease_batch(3, worker_id="w2")
+        assert len(first) == 3 and len(second) == 2
+        assert not {d["public_id"] for d in first} & {d["public_id"] for d in second}
+        token = first[0]["lease_token"]
+        for d in first:
+            assert (d["status"], d["tries"], d["lease_token"], d["leased_by"]) == ("processing", 1, token, "w1")
+            stored = await _stored(d["public_id"])
+            assert (stored["status"], stored["tries"], stored["lease_token"]) == ("processing", 1, token)
+        assert await lease_batch(3) == []
+    mongo(run)
+
+
+def test_interactive_lane_first(mongo):
+    async def run():
+        for i in range(3):
+            await enqueue_item(_item(i, lane="bulk", source="importer"))
+        await enqueue_item(_item(9))
+        assert [d["public_id"] for d in await lease_batch(1)] == ["CID-9"]
+    mongo(run)
+
+
+def test_complete_and_fail(mongo):
+    async def run():
+        for i in range(4):
+            await enqueue_item(_item(i))
+        await collection("craftids").insert_one({"public_id": "CID-2", "status": "pending"})
+        items = await lease_batch(4)
+        token = items[0]["lease_token"]
+        now = datetime.now(timezone.utc).isoformat()
+        await complete_many(token, [{"public_id": "CID-0", "tx_hash": "0xabc", "anchored_at": now, "gas_used": 21000}])
+        await fail_many(token, [
+            {"public_id": "CID-1", "reason": "RPC 503"},
+            {"public_id": "CID-2", "reason": "Permanent failure: bad hash", "is_permanent": True},
+        ])
+        # Another lease's token moves nothing
+        await complete_many("not-the-lease", [{"public_id": "CID-3", "tx_hash": "0xdef", "anchored_at": now}])
+
+        done, retry, dead, held = [await _stored(f"CID-{i}") for i in range(4)]
+        assert (done["status"], done["tx_hash"], done["gas_used"], done["lease_token"]) == ("anchored", "0xabc", 21000, None)
+        assert (retry["status"], retry["last_error"], retry["lease_token"], retry["locked_until"]) == ("queued", "RPC 503", None, None)
+        assert dead["status"] == "failed"
+        assert (await collection("craftids").find_one({"public_id": "CID-2"}))["status"] == "failed"
+        assert (held["status"], held["lease_token"]) == ("processing", token)
+        # The retryable item is leasable again
+        assert [d["public_id"] for d in await lease_batch(4)] == ["CID-1"]
+    mongo(run)
+
+
+def test_fail_on_last_try_goes_to_dlq(mongo):
+    async def run():
+        await enqueue_item(_item(0, tries=MAX_RETRIES - 1))
+        [item] = await lease_batch(1)
+        assert item["tries"] == MAX_RETRIES
+        await fail_many(item["lease_token"], [{"public_id": "CID-0", "reason": "RPC 503"}])
+        assert (await _stored("CID-0"))["status"] == "failed"
+    mongo(run)
+
+
+def test_expired_lease_is_leased_again(mongo):
+    async def run():
+        await enqueue_item(_item(0))
+        [first] = await lease_batch(1)
+        assert await extend_lease(first["lease_token"]) == 1
+        await collection(QUEUE_COLL).update_one(
+            {"public_id": "CID-0"}, {"$set": {"locked_until": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+        [second] = await lease_batch(1)
+        assert second["tries"] == 2 and second["lease_token"] != first["lease_token"]
+        assert await extend_lease(first["lease_token"]) == 0
+    mongo(run)
+
+
+def test_release_lease_undoes_the_try(mongo):
+    async def run():
+        await enqueue_item(_item(0))
+        [item] = await lease_batch(1)
+        assert await release_lease(item["lease_token"]) == 1
+        stored = await _stored("CID-0")
+        assert (stored["status"], stored["tries"], stored["lease_token"]) == ("queued", 0, None)
+        assert len(await lease_batch(1)) == 1
+    mongo(run)
+
+
+def test_stale_lease_cannot_overwrite_the_new_holder(mongo):
+    async def run():
+        await enqueue_item(_item(0))
+        await collection("craftids").insert_one({"public_id": "CID-0", "status": "pending"})
+        [stale] = await lease_batch(1)
+        await collection(QUEUE_COLL).update_one(
+            {"public_id": "CID-0"}, {"$set": {"locked_until": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+        [current] = await lease_batch(1)
+        now = datetime.now(timezone.utc).isoformat()
+        await complete_many(current["lease_token"], [{"public_id": "CID-0", "tx_hash": "0xnew", "anchored_at": now}])
+
+        # The expired lease's late outcomes change nothing
+        await fail_many(stale["lease_token"], [{"public_id": "CID-0", "reason": "Permanent failure: late", "is_permanent": True}])
+        await mark_failed("CID-0", "late", stale["lease_token"])
+        await mark_done("CID-0", "0xold", now, stale["lease_token"])
+        stored = await _stored("CID-0")
+        assert (stored["status"], stored["tx_hash"]) == ("anchored", "0xnew")
+        assert (await collection("craftids").find_one({"public_id": "CID-0"}))["status"] == "anchored"
+    mongo(run)
+
+
+def test_lease_token_is_required():
+    for token in (None, ""):
+        with pytest.raises(ValueError):
+            _leased("CID-0", token)
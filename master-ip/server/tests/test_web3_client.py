@@ -0,0 +1,537 @@
+# master-ip/server/tests/test_web3_client.py
+"""
+Transaction submission and confirmation in chain/web3_client.py against a
+fake node: FakeNode stands in for the two seams web3_client talks to a node
+through, `_w3()` (raw tx broadcast, nonces) and `_rpc_batch()` (everything
+batched). Like a real node it rejects tx hashes without the 0x prefix.
+The RPC pool tests (failover, hedging, partial batches) go one level lower
+and answer the pooled HTTP session's POSTs per endpoint URL.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import rlp
+from eth_account import Account
+from hexbytes import HexBytes
+from web3 import Web3
+
+from chain import web3_client as wc
+
+
+class FakeEth:
+    def __init__(self, node: "FakeNode"):
+        self._node = node
+
+    @property
+    def block_number(self):
+        async def head():
+            return self._node.head
+        return head()
+
+    async def send_raw_transaction(self, raw):
+        return await self._node.send_raw_transaction(raw)
+
+    async def get_transaction_count(self, address, tag="latest"):
+        self._node.nonce_reads += 1
+        return self._node.nonce(address, tag)
+
+
+class FakeNode:
+    def __init__(self):
+        self.head = 100
+        self.mined_nonces = {}   # address -> "latest" transaction count
+        self.balances = {}
+        self.txs = {}            # 0x hash -> {"from", "nonce", "raw", "block"}
+        self.broadcasts = []     # 0x hashes in broadcast order
+        self.send_errors = []    # exceptions the next broadcasts raise
+        self.batch_error = None  # raised by every JSON-RPC batch while set
+        self.calls = []          # every batched method called
+        self.nonce_reads = 0     # get_transaction_count calls outside batches
+        self.eth = FakeEth(self)
+
+    async def send_raw_transaction(self, raw):
+        if self.send_errors:
+            raise self.send_errors.pop(0)
+        raw = bytes(raw)
+        tx_hash = "0x" + bytes(Web3.keccak(raw)).hex()
+        nonce = int.from_bytes(rlp.decode(raw[1:])[1], "big")
+        self.txs[tx_hash] = {"from": Account.recover_transaction(raw), "nonce": nonce, "raw": raw, "block": None}
+        self.broadcasts.append(tx_hash)
+        return HexBytes(tx_hash)   # what web3 returns; .hex() has no 0x with hexbytes 2.x
+
+    def nonce(self, address, tag):
+        mined = self.mined_nonces.get(address, 0)
+        if tag != "pending":
+            return mined
+        pending = [t["nonce"] + 1 for t in self.txs.values() if t["from"] == address and t["block"] is None]
+        return max([mined] + pending)
+
+    def mine(self, tx_hash):
+        tx = self.txs[tx_hash]
+        tx["block"] = self.head
+        self.mined_nonces[tx["from"]] = max(self.mined_nonces.get(tx["from"], 0), tx["nonce"] + 1)
+
+    def use_nonce_elsewhere(self, address, nonce):
+        """Another tx (not one of ours) took `nonce`: our versions can never be mined."""
+        for h, tx in list(self.txs.items()):
+            if tx["from"] == address and tx["nonce"] == nonce:
+                del self.txs[h]
+        self.mined_nonces[address] = max(self.mined_nonces.get(address, 0), nonce + 1)
+
+    def _answer(self, method, params):
+        if method in ("eth_getTransactionByHash", "eth_getTransactionReceipt"):
+            tx_hash = params[0]
+            if not (isinstance(tx_hash, str) and tx_hash.startswith("0x") and len(tx_hash) == 66):
+                return RuntimeError(f"{method} failed: invalid argument 0: hex string without 0x prefix")
+            tx = self.txs.get(tx_hash)
+            if tx is None:
+                return None
+            block = None if tx["block"] is None else hex(tx["block"])
+            if method == "eth_getTransactionByHash":
+                return {"hash": tx_hash, "nonce": hex(tx["nonce"]), "blockNumber": block}
+            if block is None:
+                return None
+            return {"transactionHash": tx_hash, "blockNumber": block, "status": "0x1", "gasUsed": "0x5208"}
+        if method == "eth_getTransactionCount":
+            return hex(self.nonce(params[0], params[1]))
+        if method == "eth_getBalance":
+            return hex(self.balances.get(params[0], 10**18))
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        return RuntimeError(f"{method} failed: method not found")
+
+    async def rpc_batch(self, calls, timeout=None, write=False, hedge=False):
+        if self.batch_error is not None:
+            raise self.batch_error
+        self.calls += [method for method, _ in calls]
+        return [self._answer(method, params) for method, params in calls]
+
+
+@pytest.fixture
+def node(monkeypatch):
+    fake = FakeNode()
+
+    async def _w3(write=False):
+        return SimpleNamespace(eth=fake.eth)
+
+    monkeypatch.setattr(wc, "_w3", _w3)
+    monkeypatch.setattr(wc, "_rpc_batch", fake.rpc_batch)
+    monkeypatch.setattr(wc, "RECEIPT_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(wc, "RECEIPT_POLL_MAX_INTERVAL", 0.05)
+    return fake
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A SignerPool of two fresh accounts, used as web3_client's pool."""
+    holder = {}
+
+    def make(accounts=None):
+        holder["pool"] = wc.SignerPool(accounts or [Account.create(), Account.create()])
+        return holder["pool"]
+
+    monkeypatch.setattr(wc, "get_signer_pool", lambda: holder["pool"])
+    return make
+
+
+def _tx(acct, nonce):
+    """A plain EIP-1559 self-transfer."""
+    return {"to": acct.address, "value": 0, "gas": 21000, "nonce": nonce, "chainId": 80002,
+            "maxFeePerGas": 50 * 10**9, "maxPriorityFeePerGas": 30 * 10**9}
+
+
+def _transfer():
+    """build_tx for SignerPool.send."""
+    async def build(acct, nonce):
+        return _tx(acct, nonce)
+    return build
+
+
+# --- 0x-prefixed hashes and receipt timeouts ---
+
+def test_sent_tx_hashes_are_0x_prefixed(node, pool):
+    async def run():
+        p = pool()
+        tx_hash = await p.send(_transfer())
+        assert tx_hash.startswith("0x") and len(tx_hash) == 66
+        assert await p.nonce_state(tx_hash) == "pending"
+        node.mine(tx_hash)
+        assert await p.nonce_state(tx_hash) == "mined"
+    asyncio.run(run())
+
+
+def test_mined_tx_hash_is_0x_prefixed():
+    h = "ab" * 32
+    assert wc.mined_tx_hash({"transactionHash": HexBytes("0x" + h)}, "fallback") == "0x" + h
+    assert wc.mined_tx_hash({"transactionHash": h}, "fallback") == "0x" + h
+    assert wc.mined_tx_hash({}, "fallback") == "fallback"
+
+
+def test_confirm_returns_the_receipt(node, pool):
+    async def run():
+        p = pool()
+        tx_hash = await p.send(_transfer())
+        wc.get_receipt_tracker().track(tx_hash)
+        node.mine(tx_hash)
+        receipt = await wc.confirm_tx(tx_hash, timeout=5)
+        assert wc.mined_tx_hash(receipt, "") == tx_hash
+        assert all(s.free_slots == s.nonces.max_in_flight for s in p.signers)
+    asyncio.run(run())
+
+
+def test_timeout_waits_while_pending_and_raises_once_replaced(node, pool):
+    async def run():
+        p = pool()
+        tx_hash = await p.send(_transfer())
+        signer = p._by_tx[tx_hash].signer
+        wait = asyncio.ensure_future(wc.confirm_tx(tx_hash, timeout=0.05))
+        await asyncio.sleep(0.3)
+        # Several timeout windows passed: still pending, so the nonce stays reserved
+        assert not wait.done() and signer.free_slots == signer.nonces.max_in_flight - 1
+        node.use_nonce_elsewhere(signer.address, 0)
+        with pytest.raises(wc.TxNotMinedError) as e:
+            await wait
+        assert not e.value.dropped
+        assert signer.free_slots == signer.nonces.max_in_flight
+        assert signer.nonces._next_nonce == 1   # the nonce was used: no resync needed
+    asyncio.run(run())
+
+
+def test_dropped_tx_raises_and_resyncs_the_nonce(node, pool):
+    async def run():
+        p = pool()
+        tx_hash = await p.send(_transfer())
+        signer = p._by_tx[tx_hash].signer
+        del node.txs[tx_hash]
+        with pytest.raises(wc.TxNotMinedError) as e:
+            await wc.confirm_tx(tx_hash, timeout=0.05)
+        assert e.value.dropped
+        assert signer.nonces._next_nonce is None
+    asyncio.run(run())
+
+
+def test_wait_gives_up_after_repeated_nonce_check_failures(node, pool, monkeypatch):
+    monkeypatch.setattr(wc, "RECEIPT_NONCE_CHECK_MAX_FAILURES", 3)
+
+    async def run():
+        p = pool()
+        tx_hash = await p.send(_transfer())
+        node.batch_error = ConnectionError("endpoint down")
+        with pytest.raises(TimeoutError) as e:
+            await asyncio.wait_for(wc.confirm_tx(tx_hash, timeout=0.02), 5)
+        assert not isinstance(e.value, wc.TxNotMinedError)
+        assert "failed 3 times" in str(e.value)
+    asyncio.run(run())
+
+
+# --- Nonce reservation ---
+
+def test_nonces_are_reserved_locally_and_resynced_after_a_failed_send(node, pool):
+    async def run():
+        p = pool([Account.create()])
+        signer = p.signers[0]
+        first, second = await p.send(_transfer()), await p.send(_transfer())
+        assert [node.txs[h]["nonce"] for h in (first, second)] == [0, 1]
+        assert node.nonce_reads == 1   # one resync at start, then counted locally
+        assert signer.free_slots == signer.nonces.max_in_flight - 2
+
+        node.send_errors.append(ValueError("nonce too low"))
+        with pytest.raises(ValueError):
+            await p.send(_transfer())
+        assert signer.nonces._next_nonce is None and signer.send_errors == 1
+        assert signer.free_slots == signer.nonces.max_in_flight - 2   # the failed send's slot is back
+
+        third = await p.send(_transfer())
+        assert node.nonce_reads == 2 and node.txs[third]["nonce"] == 2
+        assert signer.send_errors == 0
+    asyncio.run(run())
+
+
+def test_in_flight_limit_blocks_until_a_slot_is_released(node):
+    async def run():
+        acct = Account.create()
+        nonces = wc.NonceManager(acct.address, max_in_flight=1)
+        send = lambda nonce: wc._sign_and_send(acct, _tx(acct, nonce))
+        first = await nonces.send(send)
+        blocked = asyncio.ensure_future(nonces.send(send))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        nonces.release(first)
+        second = await asyncio.wait_for(blocked, 1)
+        assert nonces.in_flight == {second: 1}
+    asyncio.run(run())
+
+
+# --- Signer choice ---
+
+def test_low_balance_signer_is_skipped_until_topped_up(node, pool, monkeypatch):
+    monkeypatch.setattr(wc, "SIGNER_MIN_BALANCE_WEI", 10**16)
+
+    async def run():
+        poor, rich = Account.create(), Account.create()
+        node.balances[poor.address] = 10**15
+        p = pool([poor, rich])
+        hashes = [await p.send(_transfer()) for _ in range(3)]
+        assert {node.txs[h]["from"] for h in hashes} == {rich.address}
+        assert "below minimum" in p.signers[0].status()["reason"]
+
+        node.balances[poor.address] = 10**18
+        await p.check_health(force=True)
+        assert p.signers[0].healthy
+        # The signer with the most free slots goes next
+        assert node.txs[await p.send(_transfer())]["from"] == poor.address
+    asyncio.run(run())
+
+
+def test_no_healthy_signer_raises(node, pool, monkeypatch):
+    monkeypatch.setattr(wc, "SIGNER_MIN_BALANCE_WEI", 10**16)
+
+    async def run():
+        acct = Account.create()
+        node.balances[acct.address] = 0
+        p = pool([acct])
+        with pytest.raises(RuntimeError, match="No healthy anchorer signer"):
+            await p.send(_transfer())
+        assert not node.broadcasts
+    asyncio.run(run())
+
+
+# --- Fee bumping and replacement ---
+
+class FakeFeeOracle:
+    def __init__(self, fees):
+        self.current = fees
+
+    async def fees(self, refresh=False):
+        return self.current
+
+
+def test_replace_bumps_fees_on_the_same_nonce(node, pool, monkeypatch):
+    monkeypatch.setattr(wc, "MAX_FEE_BUMPS", 1)
+    monkeypatch.setattr(wc, "get_fee_oracle", lambda: FakeFeeOracle({"maxFeePerGas": 1, "maxPriorityFeePerGas": 1}))
+
+    async def run():
+        p = pool()
+        original = await p.send(_transfer())
+        old_fees = dict(p._by_tx[original].tx)
+        replacement = await p.replace(original)
+        assert replacement.startswith("0x") and replacement != original
+        assert node.txs[replacement]["nonce"] == node.txs[original]["nonce"]
+        new_fees = p._by_tx[original].tx
+        for field in ("maxFeePerGas", "maxPriorityFeePerGas"):
+            assert new_fees[field] * 100 >= old_fees[field] * (100 + wc.FEE_BUMP_PERCENT)
+        assert p._by_tx[original].hashes == [original, replacement]
+
+        # Out of bumps: the newest version is re-broadcast as is
+        assert await p.replace(original) is None
+        assert node.broadcasts[-1] == replacement
+    asyncio.run(run())
+
+
+def test_stuck_tx_is_replaced_and_the_replacement_confirms_it(node, pool, monkeypatch):
+    monkeypatch.setattr(wc, "STUCK_TX_SECONDS", 0.05)
+    monkeypatch.setattr(wc, "get_fee_oracle", lambda: FakeFeeOracle({}))
+
+    async def run():
+        p = pool()
+        original = await p.send(_transfer())
+        wait = asyncio.ensure_future(wc.confirm_tx(original, timeout=5))
+        while len(node.broadcasts) < 2:
+            await asyncio.sleep(0.01)
+        replacement = node.broadcasts[1]
+        node.mine(replacement)
+        receipt = await asyncio.wait_for(wait, 5)
+        assert wc.mined_tx_hash(receipt, original) == replacement
+        assert all(s.free_slots == s.nonces.max_in_flight for s in p.signers)
+    asyncio.run(run())
+
+
+# --- Receipt batches ---
+
+def test_receipt_poll_resolves_only_the_mined_txs(node):
+    async def run():
+        hashes = ["0x" + c * 64 for c in "abc"]
+        node.txs[hashes[0]] = {"from": "", "nonce": 0, "raw": b"", "block": 99}
+        node.txs[hashes[1]] = {"from": "", "nonce": 1, "raw": b"", "block": None}
+        # hashes[2] is unknown to the node
+        tracker = wc.ReceiptTracker(depth=2)
+        entries = [wc._Tracked(asyncio.get_running_loop().create_future(), 0.0, h) for h in hashes]
+        tracker._pending = dict(zip(hashes, entries))
+        await tracker._poll()
+        assert entries[0].future.result()["transactionHash"] == hashes[0]
+        assert not entries[1].future.done() and not entries[2].future.done()
+        assert node.calls == ["eth_blockNumber"] + ["eth_getTransactionReceipt"] * 3
+    asyncio.run(run())
+
+
+# --- RPC pool: batches, failover, hedging ---
+
+class FakeResponse:
+    def __init__(self, handler, payload):
+        self._handler, self._payload = handler, payload
+
+    async def __aenter__(self):
+        self._body = await self._handler(self._payload)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self, content_type=None):
+        return self._body
+
+
+class FakeSession:
+    """aiohttp session stand-in: each URL answers through its own handler(payload)."""
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.posts = []
+
+    def post(self, url, json, timeout=None):
+        self.posts.append(url)
+        return FakeResponse(self.handlers[url], json)
+
+
+def _answer_all(result):
+    async def handler(payload):
+        return [{"jsonrpc": "2.0", "id": c["id"], "result": result} for c in payload]
+    return handler
+
+
+@pytest.fixture
+def endpoints(monkeypatch):
+    """Two pooled endpoints, a.test (preferred) and b.test, behind a FakeSession."""
+    def make(handlers):
+        session = FakeSession(handlers)
+
+        async def _get_http_session():
+            return session
+
+        monkeypatch.setattr(wc, "_rpc_pool", wc.RpcPool(list(handlers)))
+        monkeypatch.setattr(wc, "_get_http_session", _get_http_session)
+        return session
+    return make
+
+
+def test_batch_with_missing_responses(endpoints):
+    async def partial(payload):
+        return [{"jsonrpc": "2.0", "id": 0, "result": "0x64"},
+                {"jsonrpc": "2.0", "id": 2, "error": {"code": -32000, "message": "boom"}}]
+
+    endpoints({"http://a.test": partial})
+
+    async def run():
+        head, receipts = await wc.get_receipts_batch(["0x" + "a" * 64, "0x" + "b" * 64, "N/A (already anchored)"])
+        assert head == 100
+        assert isinstance(receipts[0], RuntimeError) and "missing" in str(receipts[0])
+        assert isinstance(receipts[1], RuntimeError) and "boom" in str(receipts[1])
+        assert receipts[2] is None
+    asyncio.run(run())
+
+
+def test_reads_fail_over_after_an_endpoint_error(endpoints, monkeypatch):
+    monkeypatch.setattr(wc, "RPC_MAX_CONSECUTIVE_ERRORS", 1)
+
+    async def down(payload):
+        raise ConnectionError("connection refused")
+
+    session = endpoints({"http://a.test": down, "http://b.test": _answer_all("0x1")})
+
+    async def run():
+        assert await wc._rpc_batch([("eth_blockNumber", [])]) == ["0x1"]
+        assert session.posts == ["http://a.test", "http://b.test"]
+        a, b = wc._rpc_pool.endpoints
+        assert not a.healthy and a.error_rate > 0
+        # a.test is cooling down: the next read goes straight to b.test
+        await wc._rpc_batch([("eth_blockNumber", [])])
+        assert session.posts[-1] == "http://b.test"
+        assert wc._rpc_pool.write() is b
+    asyncio.run(run())
+
+
+def test_hedged_read_cancels_the_slower_call(endpoints, monkeypatch):
+    monkeypatch.setattr(wc, "RPC_HEDGING", True)
+    monkeypatch.setattr(wc, "RPC_HEDGE_DELAY_SECONDS", 0.02)
+    cancelled = []
+
+    async def slow(payload):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return await _answer_all("0xa")(payload)
+
+    session = endpoints({"http://a.test": slow, "http://b.test": _answer_all("0xb")})
+
+    async def run():
+        assert await asyncio.wait_for(wc._rpc_batch([("eth_blockNumber", [])], hedge=True), 2) == ["0xb"]
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+        assert session.posts == ["http://a.test", "http://b.test"]
+        a, _ = wc._rpc_pool.endpoints
+        assert a.error_rate == 0   # a hedged-away call is latency, not an error
+    asyncio.run(run())
+
+
+# --- Gas estimates ---
+
+class FakeFnCall:
+    """A contract function call whose estimate_gas answers from `estimates` (or raises them)."""
+
+    def __init__(self, fn_name, estimates, calldata=b"\x00" * 68):
+        self.fn_name = fn_name
+        self.estimates = list(estimates)
+        self.calldata = calldata
+        self.built = []
+
+    def _encode_transaction_data(self):
+        return self.calldata
+
+    async def estimate_gas(self, tx):
+        estimate = self.estimates.pop(0)
+        if isinstance(estimate, Exception):
+            raise estimate
+        return estimate
+
+    async def build_transaction(self, tx):
+        self.built.append(tx)
+        return {**tx, "to": tx["from"], "value": 0}
+
+
+def test_gas_estimates_are_cached_unless_state_dependent(monkeypatch):
+    monkeypatch.setattr(wc, "_gas_cache", {})
+    monkeypatch.setattr(wc, "GAS_ESTIMATE_MARGIN", 1.0)
+
+    async def run():
+        anchor = FakeFnCall("anchor", [50_000, 99_999])
+        assert [await wc._estimate_gas(anchor, "0x0") for _ in range(2)] == [50_000, 50_000]
+        # anchorBatch skips already-anchored hashes: the same calldata can cost much less
+        batch = FakeFnCall("anchorBatch", [400_000, 60_000])
+        assert [await wc._estimate_gas(batch, "0x0") for _ in range(2)] == [400_000, 60_000]
+    asyncio.run(run())
+
+
+def test_reverting_estimate_is_an_item_error_and_sends_nothing(node, pool, monkeypatch):
+    monkeypatch.setattr(wc, "_gas_cache", {})
+    monkeypatch.setattr(wc, "get_fee_oracle", lambda: FakeFeeOracle({}))
+
+    async def run():
+        pool()
+        fn_call = FakeFnCall("anchor", [wc.ContractLogicError("execution reverted: Hash already anchored")])
+        with pytest.raises(ValueError, match="anchor would revert"):
+            await wc.submit_contract_tx(fn_call)
+        fn_call = FakeFnCall("anchorBatch", [RuntimeError("{'code': 3, 'message': 'execution reverted: Empty batch'}")])
+        with pytest.raises(ValueError, match="anchorBatch would revert"):
+            await wc.submit_contract_tx(fn_call)
+        # Transport errors stay temporary
+        fn_call = FakeFnCall("anchor", [ConnectionError("endpoint down")])
+        with pytest.raises(ConnectionError):
+            await wc.submit_contract_tx(fn_call)
+        assert not node.broadcasts and fn_call.built == []
+    asyncio.run(run())